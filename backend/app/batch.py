@@ -0,0 +1,358 @@
+"""
+Chạy dự báo + phân cụm + phát hiện bất thường cho nhiều user từ file cục bộ, không qua HTTP.
+User được chia thành từng nhóm (chunk) chạy trên process pool; kết quả mỗi user là 1 dòng JSONL,
+ghi ngay khi nhóm xong. File checkpoint (<output>.ckpt) ghi lại user đã xong + vị trí cuối file output
+sau mỗi lần ghi, nên --resume bỏ qua user đã xong và cắt phần output ghi dở khi bị dừng giữa chừng.
+
+Đầu vào:
+- .jsonl: mỗi dòng 1 giao dịch có "userId" (+ id, money, type, typeName, dateTime như API),
+  hoặc 1 user {"userId": ..., "transactions": [...]}. Dòng giao dịch lỗi bị loại và báo trong "ingestion".
+- .parquet: mỗi dòng 1 giao dịch, cột userId + các cột như trên (alias hoặc tên field); kiểm tra chặt cả file.
+
+    python -m app.batch data/users.jsonl -o data/results.jsonl --workers 8 --engine ridge_ar
+    python -m app.batch data/users.parquet -o data/results.jsonl --resume
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+import pandas as pd
+
+from app.services.transaction_frame import ORJSON_AVAILABLE, FrameValidationError, decode_transaction_columns, loads_json
+
+if ORJSON_AVAILABLE:
+    import orjson
+
+USER_KEYS = ("userId", "user_id")
+
+# Mỗi process chỉ dùng 1 thread BLAS/OpenMP: song song theo user, tránh tranh CPU giữa các process
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "TF_NUM_INTRAOP_THREADS")
+
+
+def _dumps(record: Dict[str, Any]) -> bytes:
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(record, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(record, ensure_ascii=False, default=str).encode("utf-8")
+
+
+# ==============================================================================
+# 1. ĐỌC ĐẦU VÀO -> {user_id: list dict giao dịch (jsonl) | frame đã kiểm tra (parquet)}
+# ==============================================================================
+def _user_of(row: Dict[str, Any]) -> Optional[str]:
+    value = next((row[k] for k in USER_KEYS if row.get(k) is not None), None)
+    return None if value is None else str(value)
+
+
+def read_jsonl(path: str) -> Dict[str, List[Any]]:
+    users: Dict[str, List[Any]] = defaultdict(list)
+    with open(path, "rb") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                row = loads_json(line)
+            except ValueError:
+                raise SystemExit(f"{path}:{line_no}: invalid JSON")
+            user_id = _user_of(row) if isinstance(row, dict) else None
+            if user_id is None:
+                raise SystemExit(f"{path}:{line_no}: missing userId")
+            if isinstance(row.get("transactions"), list):
+                users[user_id].extend(row["transactions"])
+            else:
+                users[user_id].append(row)
+    return users
+
+
+def read_parquet(path: str) -> Dict[str, pd.DataFrame]:
+    table = pd.read_parquet(path)
+    user_key = next((k for k in USER_KEYS if k in table.columns), None)
+    if user_key is None:
+        raise SystemExit(f"{path}: missing userId column")
+    try:
+        frame = decode_transaction_columns({k: table[k] for k in table.columns})
+    except FrameValidationError as e:
+        raise SystemExit(f"{path}: invalid transactions {json.dumps(e.errors, default=str)}")
+    frame["user"] = table[user_key].astype(str).to_numpy()
+    return {user_id: group.drop(columns="user").reset_index(drop=True) for user_id, group in frame.groupby("user", sort=False)}
+
+
+def read_users(path: str, input_format: Optional[str] = None) -> Dict[str, Any]:
+    input_format = input_format or os.path.splitext(path)[1].lstrip(".").lower()
+    if input_format == "jsonl":
+        return read_jsonl(path)
+    if input_format == "parquet":
+        return read_parquet(path)
+    raise SystemExit(f"Unsupported input format '{input_format}' (jsonl, parquet)")
+
+
+# ==============================================================================
+# 2. JOB TRONG PROCESS CON (top-level để pickle được)
+# ==============================================================================
+def _init_worker():
+    # Log TensorFlow của từng process con làm rối progress
+    os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+
+
+def analyze_user(user_id: str, payload: Any, options: Dict[str, Any]) -> Dict[str, Any]:
+    """Như /analyze cho 1 user, tuần tự trong process hiện tại; lỗi của user được ghi vào kết quả thay vì dừng batch."""
+    from app.services.cluster_ids import shape_transaction_ids
+    from app.services.isolation_forest_service import isolation_forest_service
+    from app.services.kmeans_service import kmeans_service
+    from app.services.lstm_service import lstm_service
+    from app.services.raw_transactions import parse_raw_transactions
+
+    timings: Dict[str, float] = {}
+    record: Dict[str, Any] = {"userId": user_id}
+
+    def timed(stage, fn, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            timings[stage] = round((time.perf_counter() - start) * 1000, 2)
+
+    try:
+        if isinstance(payload, pd.DataFrame):
+            frame = payload
+        else:
+            frame, record["ingestion"] = timed("parse", parse_raw_transactions, payload)
+        record["totalTransactions"] = len(frame)
+        if frame.empty:
+            record.update(success=False, message="No valid transactions provided", timings=timings)
+            return record
+
+        prediction = timed(
+            "prediction", lstm_service.predict_trend,
+            user_id=user_id, transactions=None, prediction_days=options["prediction_days"],
+            frame=frame, engine=options["engine"]
+        )
+        clustering = timed(
+            "clustering", kmeans_service.cluster_spending,
+            user_id=user_id, transactions=None, n_clusters=options["n_clusters"], frame=frame
+        )
+        expense_frame = frame[frame['money'] < 0]
+        if expense_frame.empty:
+            anomaly = {"success": True, "anomalies": [], "message": "No expense transactions to analyze"}
+        else:
+            anomaly = timed(
+                "anomaly", isolation_forest_service.detect_anomalies,
+                user_id=user_id, transactions=None, sensitivity=options["sensitivity"], frame=expense_frame
+            ).model_dump(mode="json", by_alias=True)
+
+        mode = options["transaction_ids_mode"]
+        record.update(
+            success=True,
+            prediction=prediction.model_dump(mode="json", by_alias=True),
+            clustering=shape_transaction_ids(
+                clustering.model_dump(mode="json", by_alias=True), mode,
+                frame['id'].tolist() if mode == "ranges" else ()
+            ),
+            anomaly=anomaly
+        )
+    except Exception as e:
+        record.update(success=False, error=f"{type(e).__name__}: {e}")
+    record["timings"] = timings
+    return record
+
+
+def analyze_chunk(chunk: List[Tuple[str, Any]], options: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [analyze_user(user_id, payload, options) for user_id, payload in chunk]
+
+
+# ==============================================================================
+# 3. OUTPUT + CHECKPOINT
+# ==============================================================================
+class Checkpoint:
+    """
+    <output>.ckpt: mỗi dòng {"offset": kích thước output sau khi ghi, "users": [...]}.
+    Chỉ ghi sau khi output đã flush -> output cắt về offset cuối cùng luôn khớp danh sách user đã xong.
+    """
+
+    def __init__(self, output_path: str):
+        self.path = output_path + ".ckpt"
+
+    def load(self) -> Tuple[Set[str], int]:
+        completed, offset = set(), 0
+        if not os.path.exists(self.path):
+            return completed, offset
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break  # dòng ghi dở lúc bị dừng
+                completed.update(entry["users"])
+                offset = entry["offset"]
+        return completed, offset
+
+    def open(self, resume: bool):
+        self._file = open(self.path, "ab" if resume else "wb")
+
+    def commit(self, offset: int, users: List[str]):
+        self._file.write(json.dumps({"offset": offset, "users": users}).encode("utf-8") + b"\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def open_output(path: str, resume: bool, checkpoint: Checkpoint) -> Tuple[Any, Set[str]]:
+    completed: Set[str] = set()
+    if resume and os.path.exists(path):
+        completed, offset = checkpoint.load()
+        output = open(path, "r+b")
+        output.truncate(offset)
+        output.seek(offset)
+    else:
+        output = open(path, "wb")
+    checkpoint.open(resume and bool(completed))
+    return output, completed
+
+
+# ==============================================================================
+# 4. ĐIỀU PHỐI
+# ==============================================================================
+class Progress:
+    def __init__(self, total_users: int, total_transactions: int, every: float):
+        self.total_users, self.total_transactions, self.every = total_users, total_transactions, every
+        self.users = self.transactions = self.failed = 0
+        self.stage_ms: Dict[str, float] = defaultdict(float)
+        self.started = self._last = time.perf_counter()
+
+    def update(self, records: List[Dict[str, Any]], transactions: int):
+        self.users += len(records)
+        self.transactions += transactions
+        self.failed += sum(1 for r in records if not r.get("success"))
+        for r in records:
+            for stage, ms in r.get("timings", {}).items():
+                self.stage_ms[stage] += ms
+        now = time.perf_counter()
+        if now - self._last >= self.every:
+            self._last = now
+            print(self.line(), file=sys.stderr, flush=True)
+
+    def line(self) -> str:
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        rate = self.users / elapsed
+        eta = (self.total_users - self.users) / rate if rate else float("inf")
+        return (f"[BATCH] {self.users}/{self.total_users} users, {self.failed} failed | "
+                f"{rate:.1f} users/s, {self.transactions / elapsed:,.0f} tx/s | eta {eta:.0f}s")
+
+    def summary(self) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - self.started
+        return {
+            "users": self.users,
+            "failed": self.failed,
+            "transactions": self.transactions,
+            "seconds": round(elapsed, 2),
+            "usersPerSecond": round(self.users / max(elapsed, 1e-9), 2),
+            "transactionsPerSecond": round(self.transactions / max(elapsed, 1e-9), 1),
+            # Tổng thời gian CPU-stage trên mọi worker (ms), để biết bước nào chiếm nhiều nhất
+            "stageMs": {k: round(v, 1) for k, v in sorted(self.stage_ms.items())}
+        }
+
+
+def _chunks(items: List[Tuple[str, Any]], size: int) -> Iterator[List[Tuple[str, Any]]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def run_batch(args: argparse.Namespace) -> Dict[str, Any]:
+    users = read_users(args.input, args.format)
+    checkpoint = Checkpoint(args.output)
+    output, completed = open_output(args.output, args.resume, checkpoint)
+
+    pending = [(user_id, payload) for user_id, payload in users.items() if user_id not in completed]
+    total_tx = sum(len(payload) for _, payload in pending)
+    print(f"[BATCH] {len(users)} users in {args.input}, {len(completed)} already done, "
+          f"{len(pending)} to run ({total_tx:,} transactions) on {args.workers or 'inline'} workers",
+          file=sys.stderr, flush=True)
+
+    options = {
+        "prediction_days": args.prediction_days,
+        "n_clusters": args.n_clusters,
+        "sensitivity": args.sensitivity,
+        "engine": args.engine,
+        "transaction_ids_mode": args.transaction_ids_mode
+    }
+    progress = Progress(len(pending), total_tx, args.progress_every)
+    sizes = {user_id: len(payload) for user_id, payload in pending}
+
+    def write(records: List[Dict[str, Any]]):
+        output.write(b"".join(_dumps(r) + b"\n" for r in records))
+        output.flush()
+        checkpoint.commit(output.tell(), [r["userId"] for r in records])
+        progress.update(records, sum(sizes[r["userId"]] for r in records))
+
+    chunks = _chunks(pending, args.chunk_size)
+    try:
+        if args.workers <= 0:
+            for chunk in chunks:
+                write(analyze_chunk(chunk, options))
+        else:
+            for var in THREAD_ENV_VARS:
+                os.environ.setdefault(var, "1")
+            with ProcessPoolExecutor(
+                max_workers=args.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker
+            ) as pool:
+                # Giới hạn số chunk đang chờ để không nạp hết dữ liệu vào hàng đợi của pool
+                running = set()
+                for chunk in chunks:
+                    running.add(pool.submit(analyze_chunk, chunk, options))
+                    if len(running) >= args.workers * 2:
+                        done, running = wait(running, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            write(future.result())
+                for future in wait(running).done:
+                    write(future.result())
+    finally:
+        output.close()
+        checkpoint.close()
+
+    summary = progress.summary()
+    print(progress.line(), file=sys.stderr, flush=True)
+    return summary
+
+
+def _available_cpus() -> int:
+    # Số CPU process được phép dùng (giới hạn của container / taskset), không phải số CPU của máy
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def main(argv: Optional[List[str]] = None):
+    from app.config import settings
+    from app.services.forecast_engines import available_engines
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="file .jsonl hoặc .parquet")
+    parser.add_argument("-o", "--output", required=True, help="file kết quả JSONL (1 dòng / user)")
+    parser.add_argument("--format", choices=["jsonl", "parquet"], help="mặc định theo đuôi file")
+    parser.add_argument("--workers", type=int, default=_available_cpus(), help="số process; 0 = chạy tuần tự")
+    parser.add_argument("--chunk-size", type=int, default=16, help="số user mỗi job gửi sang process")
+    parser.add_argument("--resume", action="store_true", help="bỏ qua user đã có trong checkpoint")
+    parser.add_argument("--prediction-days", type=int, default=settings.LSTM_PREDICTION_DAYS)
+    parser.add_argument("--n-clusters", type=int, default=None)
+    parser.add_argument("--sensitivity", type=float, default=0.1)
+    parser.add_argument("--engine", choices=available_engines(), default=settings.FORECAST_ENGINE)
+    parser.add_argument("--transaction-ids-mode", choices=["full", "omit", "ranges"], default="full")
+    parser.add_argument("--progress-every", type=float, default=5.0, help="giây giữa 2 dòng tiến độ")
+    args = parser.parse_args(argv)
+    if args.chunk_size < 1:
+        parser.error("--chunk-size must be >= 1")
+
+    summary = run_batch(args)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -11,7 +11,57 @@ class Settings(BaseSettings):
     LSTM_SEQUENCE_LENGTH: int = 5
     LSTM_PREDICTION_DAYS: int = 7
     KMEANS_N_CLUSTERS: int = 4
+    # Warm-start K-Means từ tâm cụm lần trước của user (fit lại từ đầu khi đổi schema / trôi phân phối)
+    KMEANS_WARM_START: bool = True
+    KMEANS_CACHE_MAX_USERS: int = 1000
+    KMEANS_DRIFT_THRESHOLD: float = 0.25
+    KMEANS_MAX_WARM_STARTS: int = 20
     ISOLATION_FOREST_CONTAMINATION: float = 0.1
+    # Cache Isolation Forest theo user cho /detect/check-single
+    ANOMALY_CACHE_MAX_USERS: int = 1000
+    ANOMALY_REFIT_MIN_NEW: int = 20
+    # Hai giao dịch cùng danh mục + cùng số tiền cách nhau dưới ngưỡng này bị coi là trùng lặp
+    ANOMALY_DUPLICATE_WINDOW_SECONDS: int = 300
+
+    # LSTM model registry (lưu model theo user/series trên đĩa)
+    LSTM_REGISTRY_ENABLED: bool = True
+    LSTM_MODEL_DIR: str = "data/lstm_models"
+    LSTM_REGISTRY_MAX_LOADED: int = 64
+    LSTM_RETRAIN_MIN_NEW_DAYS: int = 7
+    LSTM_RETRAIN_DRIFT_THRESHOLD: float = 0.25
+    # Cách chạy suy luận nhiều bước: "predict" (model.predict từng ngày), "call" (model(x) trực tiếp),
+    # "graph" (cả vòng lặp tự hồi quy biên dịch trong một tf.function)
+    LSTM_INFERENCE_MODE: str = "graph"
+    # Train thu nhập + chi tiêu chung một LSTM 2 kênh (fallback về từng series nếu không đủ điều kiện)
+    LSTM_MULTIVARIATE: bool = False
+    # TensorFlow chỉ được import khi lần đầu cần LSTM; bật để nạp sẵn lúc khởi động (các worker pool)
+    LSTM_PRELOAD_TENSORFLOW: bool = False
+    # Engine dự báo mặc định (request có thể chọn qua "engine"): "lstm" (LSTM khi đủ dữ liệu, còn lại Holt),
+    # "holt" (làm trơn mũ), "ridge_ar" (tự hồi quy ridge theo lag + thứ trong tuần, chỉ NumPy)
+    FORECAST_ENGINE: str = "lstm"
+
+    # Cache kết quả theo nội dung request (endpoint + user + giao dịch + tham số)
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_MAX_ENTRIES: int = 512
+    RESULT_CACHE_MAX_MB: float = 64
+    RESULT_CACHE_TTL_SECONDS: float = 600
+    # Đường dẫn file SQLite để cache còn sau khi restart; để trống = chỉ giữ trong RAM
+    RESULT_CACHE_DISK_PATH: str = ""
+
+    # Lịch sử giao dịch đồng bộ theo delta (client không cần gửi lại toàn bộ mỗi request)
+    TRANSACTION_STORE_PATH: str = "data/transactions.db"
+
+    # Giới hạn kích thước body (MB) sau khi giải nén gzip/zstd ở các endpoint /fast
+    TRANSPORT_MAX_BODY_MB: float = 64
+
+    # Metrics dạng Prometheus ở GET /metrics (số request, độ trễ, thời gian từng bước trong service)
+    METRICS_ENABLED: bool = True
+
+    # Worker pool cho tác vụ ML (không chặn event loop)
+    ML_THREAD_WORKERS: int = 4
+    ML_PROCESS_WORKERS: int = 2
+    ML_MAX_PENDING_JOBS: int = 32
+    ML_JOB_TIMEOUT_SECONDS: float = 60.0
 
     class Config:
         env_file = ".env"
@@ -1,9 +1,13 @@
 from .prediction import router as prediction_router
 from .clustering import router as clustering_router
 from .anomaly import router as anomaly_router
+from .sync import router as sync_router
+from .analysis import router as analysis_router
 
 __all__ = [
     "prediction_router",
     "clustering_router",
-    "anomaly_router"
+    "anomaly_router",
+    "sync_router",
+    "analysis_router"
 ]
@@ -0,0 +1,144 @@
+import asyncio
+import time
+
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Request
+
+from app.schemas.spending import AnalyzeRequest
+from app.services.cluster_ids import shape_for_request
+from app.services.isolation_forest_service import isolation_forest_service
+from app.services.kmeans_service import kmeans_service
+from app.services.lstm_service import lstm_service
+from app.services.request_io import fast_response, read_fast_request, resolve_transactions
+from app.services.result_cache import result_cache
+from app.services.transaction_frame import build_transaction_frame
+from app.services.transport import FastJSONResponse
+from app.workers import ml_executor
+
+router = APIRouter(tags=["Analysis"])
+
+
+async def _timed(timings: dict, stage: str, coro):
+    start = time.perf_counter()
+    try:
+        return await coro
+    finally:
+        timings[stage] = round((time.perf_counter() - start) * 1000, 2)
+
+
+async def _analyze_frame(params: AnalyzeRequest, frame, timings: dict) -> dict:
+    """Chạy 3 model song song trên cùng 1 frame giao dịch."""
+    expense_frame = frame[frame['money'] < 0]
+
+    async def run_anomaly():
+        if expense_frame.empty:
+            return {"success": True, "anomalies": [], "message": "No expense transactions to analyze"}
+        result = await ml_executor.run_in_thread(
+            isolation_forest_service.detect_anomalies,
+            user_id=params.user_id, transactions=None, sensitivity=params.sensitivity, frame=expense_frame
+        )
+        return result.model_dump(mode="json", by_alias=True)
+
+    async def run_clustering():
+        result = await ml_executor.run_in_thread(
+            kmeans_service.cluster_spending,
+            user_id=params.user_id, transactions=None, n_clusters=params.n_clusters, frame=frame
+        )
+        return result.model_dump(mode="json", by_alias=True)
+
+    async def run_prediction():
+        result = await ml_executor.run_predict_trend(
+            user_id=params.user_id, transactions=None, prediction_days=params.prediction_days, frame=frame,
+            engine=params.engine
+        )
+        return result.model_dump(mode="json", by_alias=True)
+
+    prediction, clustering, anomaly = await asyncio.gather(
+        _timed(timings, "prediction", run_prediction()),
+        _timed(timings, "clustering", run_clustering()),
+        _timed(timings, "anomaly", run_anomaly())
+    )
+
+    return {
+        "success": True,
+        "userId": params.user_id,
+        "totalTransactions": len(frame),
+        "prediction": prediction,
+        "clustering": clustering,
+        "anomaly": anomaly
+    }
+
+
+def _cache_params(params: AnalyzeRequest) -> dict:
+    return {
+        "prediction_days": params.prediction_days,
+        "engine": params.engine or lstm_service.default_engine,
+        "n_clusters": params.n_clusters,
+        "sensitivity": params.sensitivity
+    }
+
+
+def _finalize(params: AnalyzeRequest, response: dict, request_ids, started: float, timings: dict, cached: bool) -> dict:
+    # Kết quả trong cache luôn giữ đủ transactionIds; cắt/gộp theo request ở bước cuối
+    clustering = shape_for_request(response["clustering"], params, request_ids)
+    timings["total"] = round((time.perf_counter() - started) * 1000, 2)
+    return {**response, "clustering": clustering, "timings": {"cached": cached, **timings}}
+
+
+@router.post("/analyze")
+async def analyze(request: AnalyzeRequest, background_tasks: BackgroundTasks):
+    """
+    Dự báo + phân cụm + phát hiện bất thường trong 1 request: dựng frame giao dịch 1 lần,
+    chạy 3 model song song trên worker pool, trả kèm thời gian từng bước (ms).
+    """
+    try:
+        started = time.perf_counter()
+        timings = {}
+
+        transactions = await _timed(timings, "load", resolve_transactions(request.user_id, request.transactions))
+
+        cache_key, cached = await ml_executor.run_in_thread(
+            result_cache.lookup, "analyze", request.user_id, transactions, **_cache_params(request)
+        )
+        request_ids = lambda: [t.id for t in transactions]
+        if cached is not None:
+            return FastJSONResponse(_finalize(request, cached, request_ids, started, timings, cached=True))
+
+        frame = await _timed(timings, "frame", ml_executor.run_in_thread(build_transaction_frame, transactions))
+        response = await _analyze_frame(request, frame, timings)
+        background_tasks.add_task(result_cache.put, cache_key, response)
+        return FastJSONResponse(_finalize(request, response, request_ids, started, timings, cached=False))
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        import traceback
+        print(f"[ANALYZE ERROR] {traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail=f"Analysis error: {str(e)}")
+
+
+@router.post("/analyze/fast")
+async def analyze_fast(request: Request, background_tasks: BackgroundTasks):
+    """Body giống /analyze; danh sách giao dịch được giải mã thẳng thành cột (bước "decode")."""
+    try:
+        started = time.perf_counter()
+        timings = {}
+
+        params, frame = await _timed(timings, "decode", read_fast_request(request, AnalyzeRequest))
+
+        cache_key, cached = await ml_executor.run_in_thread(
+            result_cache.lookup_frame, "analyze/fast", params.user_id, frame, **_cache_params(params)
+        )
+        request_ids = lambda: frame['id']
+        if cached is not None:
+            return fast_response(request, _finalize(params, cached, request_ids, started, timings, cached=True))
+
+        response = await _analyze_frame(params, frame, timings)
+        background_tasks.add_task(result_cache.put, cache_key, response)
+        return fast_response(request, _finalize(params, response, request_ids, started, timings, cached=False))
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        import traceback
+        print(f"[ANALYZE ERROR] {traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail=f"Analysis error: {str(e)}")
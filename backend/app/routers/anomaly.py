@@ -1,8 +1,14 @@
-from fastapi import APIRouter, HTTPException
-from datetime import datetime
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Request
 
-from app.schemas.spending import AnomalyRequest, SpendingItem
+from app.schemas.spending import AnomalyRequest
 from app.services.isolation_forest_service import isolation_forest_service
+from app.services.raw_transactions import (
+    frame_to_items, history_fingerprint, parse_raw_transactions, quick_expense_frame, row_digest
+)
+from app.services.request_io import fast_response, read_fast_request, resolve_transactions
+from app.services.result_cache import result_cache
+from app.services.transport import FastJSONResponse
+from app.workers import ml_executor
 
 router = APIRouter(prefix="/detect", tags=["Anomaly Detection"])
 
@@ -11,11 +17,12 @@ router = APIRouter(prefix="/detect", tags=["Anomaly Detection"])
 # =================== NORMAL API ======================
 # =====================================================
 @router.post("/anomaly")
-async def detect_anomaly(request: AnomalyRequest):
+async def detect_anomaly(request: AnomalyRequest, background_tasks: BackgroundTasks):
     try:
+        transactions = await resolve_transactions(request.user_id, request.transactions)
         # ✅ CHỈ LẤY CHI TIÊU
         expense_transactions = [
-            t for t in request.transactions if t.money < 0
+            t for t in transactions if t.money < 0
         ]
 
         if not expense_transactions:
@@ -25,14 +32,67 @@ async def detect_anomaly(request: AnomalyRequest):
                 "message": "No expense transactions to analyze"
             }
 
-        result = isolation_forest_service.detect_anomalies(
+        cache_key, cached = await ml_executor.run_in_thread(
+            result_cache.lookup, "detect/anomaly", request.user_id, expense_transactions, sensitivity=request.sensitivity
+        )
+        if cached is not None:
+            return FastJSONResponse(cached)
+
+        result = await ml_executor.run_in_thread(
+            isolation_forest_service.detect_anomalies,
             user_id=request.user_id,
             transactions=expense_transactions,
             sensitivity=request.sensitivity
         )
 
-        return result.model_dump(by_alias=True)
+        response = result.model_dump(mode="json", by_alias=True)
+        background_tasks.add_task(result_cache.put, cache_key, response)
+        return FastJSONResponse(response)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Anomaly detection error: {str(e)}"
+        )
+
+
+@router.post("/anomaly/fast")
+async def detect_anomaly_fast(request: Request, background_tasks: BackgroundTasks):
+    """Body giống /anomaly; danh sách giao dịch được giải mã thẳng thành cột thay vì từng SpendingItem."""
+    try:
+        params, frame = await read_fast_request(request, AnomalyRequest)
+
+        # ✅ CHỈ LẤY CHI TIÊU
+        expense_frame = frame[frame['money'] < 0]
+        if expense_frame.empty:
+            return fast_response(request, {
+                "success": True,
+                "anomalies": [],
+                "message": "No expense transactions to analyze"
+            })
+
+        cache_key, cached = await ml_executor.run_in_thread(
+            result_cache.lookup_frame, "detect/anomaly/fast", params.user_id, expense_frame, sensitivity=params.sensitivity
+        )
+        if cached is not None:
+            return fast_response(request, cached)
+
+        result = await ml_executor.run_in_thread(
+            isolation_forest_service.detect_anomalies,
+            user_id=params.user_id,
+            transactions=None,
+            sensitivity=params.sensitivity,
+            frame=expense_frame
+        )
+
+        response = result.model_dump(mode="json", by_alias=True)
+        background_tasks.add_task(result_cache.put, cache_key, response)
+        return fast_response(request, response)
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -46,61 +106,31 @@ async def detect_anomaly(request: AnomalyRequest):
 @router.post("/anomaly/quick")
 async def quick_detect(user_id: str, transactions: list, sensitivity: float = 0.1):
     try:
-        spending_items: list[SpendingItem] = []
-
-        for t in transactions:
-            try:
-                # -------- Parse datetime --------
-                dt = t.get("dateTime") or t.get("date_time")
-                if isinstance(dt, str):
-                    for fmt in (
-                        "%Y-%m-%dT%H:%M:%S",
-                        "%Y-%m-%d %H:%M:%S",
-                        "%Y-%m-%d"
-                    ):
-                        try:
-                            dt = datetime.strptime(dt, fmt)
-                            break
-                        except ValueError:
-                            continue
-
-                money = int(t.get("money", 0))
-
-                # ❌ BỎ QUA THU NHẬP
-                if money >= 0:
-                    continue
-
-                item = SpendingItem(
-                    id=t.get("id", ""),
-                    money=abs(money),   # ⚠️ MODEL HỌC ĐỘ LỚN CHI TIÊU
-                    type=0,
-                    typeName="Expense",
-                    note=t.get("note"),
-                    dateTime=dt,
-                    image=t.get("image"),
-                    location=t.get("location"),
-                )
-
-                spending_items.append(item)
-
-            except Exception:
-                continue
-
-        if not spending_items:
+        frame, ingestion = await ml_executor.run_in_thread(parse_raw_transactions, transactions)
+
+        # ❌ BỎ QUA THU NHẬP, ⚠️ MODEL HỌC ĐỘ LỚN CHI TIÊU
+        expense_frame = quick_expense_frame(frame)
+
+        if expense_frame.empty:
             return {
                 "success": True,
                 "anomalies": [],
-                "message": "No expense transactions to analyze"
+                "message": "No expense transactions to analyze",
+                "ingestion": ingestion
             }
 
-        result = isolation_forest_service.detect_anomalies(
+        result = await ml_executor.run_in_thread(
+            isolation_forest_service.detect_anomalies,
             user_id=user_id,
-            transactions=spending_items,
-            sensitivity=sensitivity
+            transactions=None,
+            sensitivity=sensitivity,
+            frame=expense_frame
         )
 
-        return result
+        return FastJSONResponse({**result.model_dump(mode="json", by_alias=True), "ingestion": ingestion})
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -125,67 +155,74 @@ async def get_severity_levels():
 # =====================================================
 # =============== CHECK SINGLE TRAN ===================
 # =====================================================
-@router.post("/check-single")
-async def check_single_transaction(user_id: str, transaction: dict, history: list):
+async def _refit_anomaly_model(user_id: str):
     try:
-        def parse_expense(t):
-            money = int(t.get("money", 0))
-            if money >= 0:
-                return None
-
-            dt = t.get("dateTime") or t.get("date_time")
-            if isinstance(dt, str):
-                for fmt in (
-                    "%Y-%m-%dT%H:%M:%S",
-                    "%Y-%m-%d %H:%M:%S",
-                    "%Y-%m-%d"
-                ):
-                    try:
-                        dt = datetime.strptime(dt, fmt)
-                        break
-                    except ValueError:
-                        continue
-
-            return SpendingItem(
-                id=t.get("id", "check"),
-                money=abs(money),
-                type=0,
-                typeName="Expense",
-                note=t.get("note"),
-                dateTime=dt,
-                image=t.get("image"),
-                location=t.get("location"),
-            )
+        await ml_executor.run_in_thread(isolation_forest_service.refit_user_model, user_id)
+    except HTTPException as e:
+        # Pool đang bận: bỏ qua, lần chấm điểm sau sẽ lên lịch lại
+        print(f"[ANOMALY] Refit for {user_id} skipped: {e.detail}")
+        isolation_forest_service.release_refit(user_id)
 
-        history_items = list(
-            filter(None, (parse_expense(t) for t in history))
-        )
 
-        target_item = parse_expense(transaction)
+@router.post("/check-single")
+async def check_single_transaction(user_id: str, transaction: dict, history: list, background_tasks: BackgroundTasks):
+    try:
+        target_frame, target_report = parse_raw_transactions([transaction], default_id="check")
+        if target_frame.empty:
+            raise HTTPException(
+                status_code=422,
+                detail={"message": "Invalid transaction", "ingestion": target_report}
+            )
 
-        if not target_item:
+        target_items = frame_to_items(quick_expense_frame(target_frame))
+        if not target_items:
             return {
                 "isAnomaly": False,
                 "message": "Thu nhập không được kiểm tra bất thường"
             }
+        target_item = target_items[0]
+        # Giao dịch không gửi id nhận diện theo nội dung (id "check" chỉ là giá trị mặc định)
+        target_key = isolation_forest_service.transaction_key(target_item, use_id=bool(transaction.get('id')))
+
+        # ⚡ Chấm điểm bằng model đã cache; chỉ fit khi user chưa có model hoặc lịch sử gửi kèm đã khác
+        # (dấu vân tay rẻ hơn nhiều so với parse lại lịch sử)
+        history_report = None
+        history_fp = await ml_executor.run_in_thread(history_fingerprint, history)
+        score_args = dict(key=target_key, history_fingerprint=history_fp, digest=row_digest(transaction))
+        scored = isolation_forest_service.score_single(user_id, target_item, **score_args)
+        if scored is None:
+            history_frame, history_report = await ml_executor.run_in_thread(parse_raw_transactions, history)
+            history_items = frame_to_items(quick_expense_frame(history_frame))
+            fitted = await ml_executor.run_in_thread(
+                isolation_forest_service.fit_user_model,
+                user_id=user_id,
+                transactions=history_items,
+                fingerprint=history_fp
+            )
+            if fitted:
+                scored = isolation_forest_service.score_single(user_id, target_item, **score_args)
+
+        if scored is not None:
+            anomaly_info = scored["anomaly"]
+            if scored["needsRefit"]:
+                background_tasks.add_task(_refit_anomaly_model, user_id)
+        else:
+            # Lịch sử quá ít để fit model riêng -> phân tích toàn bộ như trước
+            history_items.append(target_item)
+
+            result = await ml_executor.run_in_thread(
+                isolation_forest_service.detect_anomalies,
+                user_id=user_id,
+                transactions=history_items,
+                sensitivity=0.1
+            )
 
-        history_items.append(target_item)
-
-        result = isolation_forest_service.detect_anomalies(
-            user_id=user_id,
-            transactions=history_items,
-            sensitivity=0.1
-        )
-
-        is_anomaly = any(
-            a.transaction_id == target_item.id
-            for a in result.anomalies
-        )
+            anomaly_info = next(
+                (a for a in result.anomalies if a.transaction_id == target_item.id),
+                None
+            )
 
-        anomaly_info = next(
-            (a for a in result.anomalies if a.transaction_id == target_item.id),
-            None
-        )
+        is_anomaly = anomaly_info is not None
 
         return {
             "isAnomaly": is_anomaly,
@@ -193,11 +230,20 @@ async def check_single_transaction(user_id: str, transaction: dict, history: lis
             "anomalyDetails": anomaly_info.dict() if anomaly_info else None,
             "message": "Giao dịch chi tiêu bất thường!"
             if is_anomaly else
-            "Giao dịch bình thường"
+            "Giao dịch bình thường",
+            # Chỉ có khi phải đọc `history` để fit model (lần đầu hoặc khi lịch sử gửi kèm đã đổi)
+            "historyIngestion": history_report
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Check error: {str(e)}"
         )
+
+
+@router.get("/model-cache/stats")
+async def get_model_cache_stats():
+    return isolation_forest_service.model_cache.get_stats()
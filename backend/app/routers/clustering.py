@@ -1,22 +1,73 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Request
 from typing import Optional
 
 from app.schemas.spending import ClusteringRequest
 from app.schemas.response import ClusteringResponse
+from app.services.cluster_ids import shape_for_request
 from app.services.kmeans_service import kmeans_service
+from app.services.raw_transactions import parse_raw_transactions
+from app.services.request_io import fast_response, read_fast_request, resolve_transactions
+from app.services.result_cache import result_cache
+from app.services.transport import FastJSONResponse
+from app.workers import ml_executor
 
 router = APIRouter(prefix="/cluster", tags=["Clustering"])
 
 
 @router.post("/behavior")
-async def cluster_behavior(request: ClusteringRequest):
+async def cluster_behavior(request: ClusteringRequest, background_tasks: BackgroundTasks):
     try:
-        result = kmeans_service.cluster_spending(
+        transactions = await resolve_transactions(request.user_id, request.transactions)
+        cache_key, cached = await ml_executor.run_in_thread(
+            result_cache.lookup, "cluster/behavior", request.user_id, transactions, n_clusters=request.n_clusters
+        )
+        request_ids = lambda: [t.id for t in transactions]
+        if cached is not None:
+            return FastJSONResponse(shape_for_request(cached, request, request_ids))
+
+        result = await ml_executor.run_in_thread(
+            kmeans_service.cluster_spending,
             user_id=request.user_id,
-            transactions=request.transactions,
+            transactions=transactions,
             n_clusters=request.n_clusters
         )
-        return result.model_dump(by_alias=True)
+        response = result.model_dump(mode="json", by_alias=True)
+        background_tasks.add_task(result_cache.put, cache_key, response)
+        return FastJSONResponse(shape_for_request(response, request, request_ids))
+    except HTTPException:
+        raise
+    except Exception as e:
+        import traceback
+        error_detail = f"Clustering error: {str(e)}\n{traceback.format_exc()}"
+        print(error_detail)
+        raise HTTPException(status_code=500, detail=error_detail)
+
+
+@router.post("/behavior/fast")
+async def cluster_behavior_fast(request: Request, background_tasks: BackgroundTasks):
+    """Body giống /behavior; danh sách giao dịch được giải mã thẳng thành cột thay vì từng SpendingItem."""
+    try:
+        params, frame = await read_fast_request(request, ClusteringRequest)
+
+        cache_key, cached = await ml_executor.run_in_thread(
+            result_cache.lookup_frame, "cluster/behavior/fast", params.user_id, frame, n_clusters=params.n_clusters
+        )
+        request_ids = lambda: frame['id']
+        if cached is not None:
+            return fast_response(request, shape_for_request(cached, params, request_ids))
+
+        result = await ml_executor.run_in_thread(
+            kmeans_service.cluster_spending,
+            user_id=params.user_id,
+            transactions=None,
+            n_clusters=params.n_clusters,
+            frame=frame
+        )
+        response = result.model_dump(mode="json", by_alias=True)
+        background_tasks.add_task(result_cache.put, cache_key, response)
+        return fast_response(request, shape_for_request(response, params, request_ids))
+    except HTTPException:
+        raise
     except Exception as e:
         import traceback
         error_detail = f"Clustering error: {str(e)}\n{traceback.format_exc()}"
@@ -27,49 +78,30 @@ async def cluster_behavior(request: ClusteringRequest):
 @router.post("/behavior/quick")
 async def quick_cluster(user_id: str, transactions: list, n_clusters: Optional[int] = None):
     try:
-        from app.schemas.spending import SpendingItem
-        from datetime import datetime
-
-        spending_items = []
-        for t in transactions:
-            try:
-                dt = t.get('dateTime') or t.get('date_time')
-                if isinstance(dt, str):
-                    for fmt in ['%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d']:
-                        try:
-                            dt = datetime.strptime(dt, fmt)
-                            break
-                        except:
-                            continue
-
-                item = SpendingItem(
-                    id=t.get('id', ''),
-                    money=int(t.get('money', 0)),
-                    type=int(t.get('type', 0)),
-                    typeName=t.get('typeName') or t.get('type_name', 'Other'),
-                    note=t.get('note'),
-                    dateTime=dt,
-                    image=t.get('image'),
-                    location=t.get('location')
-                )
-                spending_items.append(item)
-            except:
-                continue
-
-        if not spending_items:
-            return {"success": False, "message": "No valid transactions provided"}
-
-        result = kmeans_service.cluster_spending(
+        frame, ingestion = await ml_executor.run_in_thread(parse_raw_transactions, transactions)
+        if frame.empty:
+            return {"success": False, "message": "No valid transactions provided", "ingestion": ingestion}
+
+        result = await ml_executor.run_in_thread(
+            kmeans_service.cluster_spending,
             user_id=user_id,
-            transactions=spending_items,
-            n_clusters=n_clusters
+            transactions=None,
+            n_clusters=n_clusters,
+            frame=frame
         )
-        return result
+        return FastJSONResponse({**result.model_dump(mode="json", by_alias=True), "ingestion": ingestion})
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Quick clustering error: {str(e)}")
 
 
+@router.get("/model-cache/stats")
+async def get_centroid_cache_stats():
+    return kmeans_service.centroid_cache.get_stats()
+
+
 @router.get("/profiles")
 async def get_cluster_profiles():
     return {
@@ -1,26 +1,45 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Request
 from typing import Optional
 
 from app.schemas.spending import PredictionRequest
 from app.schemas.response import TrendPredictionResponse
+from app.services.forecast_engines import available_engines
 from app.services.lstm_service import lstm_service
+from app.services.raw_transactions import parse_raw_transactions
+from app.services.request_io import fast_response, read_fast_request, resolve_transactions
+from app.services.result_cache import result_cache
+from app.services.transport import FastJSONResponse
+from app.workers import ml_executor
 
 router = APIRouter(prefix="/predict", tags=["Prediction"])
 
 
 @router.post("/trend", response_model=TrendPredictionResponse)
-async def predict_trend(request: PredictionRequest):
+async def predict_trend(request: PredictionRequest, background_tasks: BackgroundTasks):
     try:
+        transactions = await resolve_transactions(request.user_id, request.transactions)
+
         print(f"\n{'='*50}")
-        print(f"[PREDICT] Received {len(request.transactions)} transactions for user {request.user_id}")
-        if request.transactions:
-            for i, t in enumerate(request.transactions[:3]):
+        print(f"[PREDICT] Received {len(transactions)} transactions for user {request.user_id}")
+        if transactions:
+            for i, t in enumerate(transactions[:3]):
                 print(f"[PREDICT] Trans {i}: money={t.money}, type={t.type}, date={t.date_time}")
 
-        result = lstm_service.predict_trend(
+        # Hash khóa O(n) + đọc SQLite chạy trên thread pool; ghi cache sau khi đã trả response
+        cache_key, cached = await ml_executor.run_in_thread(
+            result_cache.lookup, "predict/trend", request.user_id, transactions, prediction_days=request.prediction_days,
+            engine=request.engine or lstm_service.default_engine
+        )
+        if cached is not None:
+            print(f"[PREDICT] Cache hit for user {request.user_id}")
+            print(f"{'='*50}\n")
+            return cached
+
+        result = await ml_executor.run_predict_trend(
             user_id=request.user_id,
-            transactions=request.transactions,
-            prediction_days=request.prediction_days
+            transactions=transactions,
+            prediction_days=request.prediction_days,
+            engine=request.engine
         )
 
         print(f"[PREDICT] Result success={result.success}")
@@ -29,7 +48,40 @@ async def predict_trend(request: PredictionRequest):
             for p in result.predictions[:3]:
                 print(f"[PREDICT] Pred: date={p.date}, income={p.predicted_income}, expense={p.predicted_expense}")
         print(f"{'='*50}\n")
+        background_tasks.add_task(result_cache.put, cache_key, result.model_dump(mode="json", by_alias=True))
         return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        import traceback
+        print(f"[PREDICT ERROR] {traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
+
+
+@router.post("/trend/fast", response_model=TrendPredictionResponse)
+async def predict_trend_fast(request: Request, background_tasks: BackgroundTasks):
+    """Body giống /trend; danh sách giao dịch được giải mã thẳng thành cột thay vì từng SpendingItem."""
+    try:
+        params, frame = await read_fast_request(request, PredictionRequest)
+
+        cache_key, cached = await ml_executor.run_in_thread(
+            result_cache.lookup_frame, "predict/trend/fast", params.user_id, frame, prediction_days=params.prediction_days,
+            engine=params.engine or lstm_service.default_engine
+        )
+        if cached is not None:
+            return fast_response(request, cached)
+
+        result = await ml_executor.run_predict_trend(
+            user_id=params.user_id,
+            transactions=None,
+            prediction_days=params.prediction_days,
+            frame=frame,
+            engine=params.engine
+        )
+        background_tasks.add_task(result_cache.put, cache_key, result.model_dump(mode="json", by_alias=True))
+        return fast_response(request, result)
+    except HTTPException:
+        raise
     except Exception as e:
         import traceback
         print(f"[PREDICT ERROR] {traceback.format_exc()}")
@@ -37,46 +89,35 @@ async def predict_trend(request: PredictionRequest):
 
 
 @router.post("/trend/quick")
-async def quick_predict(user_id: str, transactions: list, days: int = 7):
+async def quick_predict(user_id: str, transactions: list, days: int = 7, engine: Optional[str] = None):
     try:
-        from app.schemas.spending import SpendingItem
-        from datetime import datetime
-
-        spending_items = []
-        for t in transactions:
-            try:
-                dt = t.get('dateTime') or t.get('date_time')
-                if isinstance(dt, str):
-                    for fmt in ['%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d']:
-                        try:
-                            dt = datetime.strptime(dt, fmt)
-                            break
-                        except:
-                            continue
-
-                item = SpendingItem(
-                    id=t.get('id', ''),
-                    money=int(t.get('money', 0)),
-                    type=int(t.get('type', 0)),
-                    typeName=t.get('typeName') or t.get('type_name', 'Other'),
-                    note=t.get('note'),
-                    dateTime=dt,
-                    image=t.get('image'),
-                    location=t.get('location')
-                )
-                spending_items.append(item)
-            except:
-                continue
-
-        if not spending_items:
-            return {"success": False, "message": "No valid transactions provided"}
-
-        result = lstm_service.predict_trend(
+        if engine is not None and engine not in available_engines():
+            raise HTTPException(status_code=422, detail=f"Unknown forecast engine '{engine}'")
+
+        frame, ingestion = await ml_executor.run_in_thread(parse_raw_transactions, transactions)
+        if frame.empty:
+            return {"success": False, "message": "No valid transactions provided", "ingestion": ingestion}
+
+        result = await ml_executor.run_predict_trend(
             user_id=user_id,
-            transactions=spending_items,
-            prediction_days=days
+            transactions=None,
+            prediction_days=days,
+            frame=frame,
+            engine=engine
         )
-        return result
+        return FastJSONResponse({**result.model_dump(mode="json", by_alias=True), "ingestion": ingestion})
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Quick prediction error: {str(e)}")
+
+
+@router.get("/engines")
+async def get_forecast_engines():
+    return {"default": lstm_service.default_engine, "available": available_engines()}
+
+
+@router.get("/registry/stats")
+async def get_registry_stats():
+    return lstm_service.get_registry_stats()
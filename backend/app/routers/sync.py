@@ -0,0 +1,40 @@
+from fastapi import APIRouter, HTTPException
+
+from app.schemas.spending import SyncRequest
+from app.services.transaction_store import VersionConflictError, transaction_store
+from app.workers import ml_executor
+
+router = APIRouter(prefix="/sync", tags=["Sync"])
+
+
+@router.post("/transactions")
+async def sync_transactions(request: SyncRequest):
+    try:
+        return await ml_executor.run_in_thread(
+            transaction_store.apply_delta,
+            user_id=request.user_id,
+            upserts=request.upserts,
+            deletes=request.deletes,
+            base_version=request.base_version,
+            replace=request.replace
+        )
+    except VersionConflictError as e:
+        raise HTTPException(
+            status_code=409,
+            detail={"message": str(e), "serverVersion": e.current}
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Sync error: {str(e)}")
+
+
+@router.get("/{user_id}/version")
+async def get_sync_version(user_id: str):
+    return await ml_executor.run_in_thread(transaction_store.get_version, user_id)
+
+
+@router.delete("/{user_id}")
+async def delete_synced_history(user_id: str):
+    await ml_executor.run_in_thread(transaction_store.delete_user, user_id)
+    return {"success": True, "userId": user_id}
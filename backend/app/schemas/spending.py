@@ -1,12 +1,25 @@
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Literal, Optional
 from datetime import datetime
 
 
+def _check_forecast_engine(value: Optional[str]) -> Optional[str]:
+    # Import trong hàm: app.services import ngược lại schemas
+    from app.services.forecast_engines import available_engines
+
+    if value is not None and value not in available_engines():
+        raise ValueError(f"Unknown forecast engine, available: {', '.join(available_engines())}")
+    return value
+
+
+# Số nguyên lưu được trong cột int64 của frame / INTEGER của SQLite (lớn hơn thì tràn số)
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+
 class SpendingItem(BaseModel):
     id: str
-    money: int
-    type: int
+    money: int = Field(..., ge=INT64_MIN, le=INT64_MAX)
+    type: int = Field(..., ge=INT64_MIN, le=INT64_MAX)
     type_name: str = Field(..., alias="typeName")
     note: Optional[str] = None
     date_time: datetime = Field(..., alias="dateTime")
@@ -27,8 +40,13 @@ class SpendingData(BaseModel):
 
 class PredictionRequest(BaseModel):
     user_id: str = Field(..., alias="userId")
-    transactions: List[SpendingItem]
+    # Bỏ trống -> server dùng lịch sử đã đồng bộ qua /sync/transactions
+    transactions: Optional[List[SpendingItem]] = None
     prediction_days: int = Field(default=7, alias="predictionDays", ge=1, le=30)
+    # Engine dự báo (lstm / holt / ridge_ar ...); bỏ trống -> settings.FORECAST_ENGINE
+    engine: Optional[str] = None
+
+    _check_engine = field_validator("engine")(_check_forecast_engine)
 
     class Config:
         populate_by_name = True
@@ -36,8 +54,14 @@ class PredictionRequest(BaseModel):
 
 class ClusteringRequest(BaseModel):
     user_id: str = Field(..., alias="userId")
-    transactions: List[SpendingItem]
+    # Bỏ trống -> server dùng lịch sử đã đồng bộ qua /sync/transactions
+    transactions: Optional[List[SpendingItem]] = None
     n_clusters: Optional[int] = Field(default=None, alias="nClusters", ge=2, le=10)
+    # Cách trả transactionIds của từng cụm: full (như cũ) / omit / ranges (khoảng vị trí trong
+    # danh sách giao dịch gửi lên) / page (cắt theo offset + limit)
+    transaction_ids_mode: Literal["full", "omit", "ranges", "page"] = Field(default="full", alias="transactionIdsMode")
+    transaction_ids_offset: int = Field(default=0, alias="transactionIdsOffset", ge=0)
+    transaction_ids_limit: int = Field(default=1000, alias="transactionIdsLimit", ge=1, le=100000)
 
     class Config:
         populate_by_name = True
@@ -45,8 +69,41 @@ class ClusteringRequest(BaseModel):
 
 class AnomalyRequest(BaseModel):
     user_id: str = Field(..., alias="userId")
-    transactions: List[SpendingItem]
+    # Bỏ trống -> server dùng lịch sử đã đồng bộ qua /sync/transactions
+    transactions: Optional[List[SpendingItem]] = None
     sensitivity: float = Field(default=0.1, ge=0.01, le=0.5)
 
     class Config:
         populate_by_name = True
+
+
+class SyncRequest(BaseModel):
+    user_id: str = Field(..., alias="userId")
+    upserts: List[SpendingItem] = Field(default_factory=list)
+    deletes: List[str] = Field(default_factory=list)
+    # Version client nhận được ở lần sync trước; lệch với server -> 409, client gửi lại với replace=true
+    base_version: Optional[int] = Field(default=None, alias="baseVersion")
+    replace: bool = False
+
+    class Config:
+        populate_by_name = True
+
+
+class AnalyzeRequest(BaseModel):
+    user_id: str = Field(..., alias="userId")
+    # Bỏ trống -> server dùng lịch sử đã đồng bộ qua /sync/transactions
+    transactions: Optional[List[SpendingItem]] = None
+    prediction_days: int = Field(default=7, alias="predictionDays", ge=1, le=30)
+    n_clusters: Optional[int] = Field(default=None, alias="nClusters", ge=2, le=10)
+    sensitivity: float = Field(default=0.1, ge=0.01, le=0.5)
+    # Như PredictionRequest: engine dự báo cho phần prediction
+    engine: Optional[str] = None
+    # Như ClusteringRequest: cách trả transactionIds trong phần clustering
+    transaction_ids_mode: Literal["full", "omit", "ranges", "page"] = Field(default="full", alias="transactionIdsMode")
+    transaction_ids_offset: int = Field(default=0, alias="transactionIdsOffset", ge=0)
+    transaction_ids_limit: int = Field(default=1000, alias="transactionIdsLimit", ge=1, le=100000)
+
+    _check_engine = field_validator("engine")(_check_forecast_engine)
+
+    class Config:
+        populate_by_name = True
@@ -1,9 +1,11 @@
 from .lstm_service import LSTMService
 from .kmeans_service import KMeansService
 from .isolation_forest_service import IsolationForestService
+from .model_registry import LSTMModelRegistry
 
 __all__ = [
     "LSTMService",
     "KMeansService",
-    "IsolationForestService"
+    "IsolationForestService",
+    "LSTMModelRegistry"
 ]
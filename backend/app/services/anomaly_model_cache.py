@@ -0,0 +1,201 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from sklearn.ensemble import IsolationForest
+
+
+def _average_path_length(n_samples: np.ndarray) -> np.ndarray:
+    """Độ dài đường đi trung bình c(n) của cây isolation (công thức giống sklearn)."""
+    n_samples = np.asarray(n_samples, dtype=float)
+    result = np.zeros_like(n_samples)
+    result[n_samples == 2] = 1.0
+    mask = n_samples > 2
+    result[mask] = 2.0 * (np.log(n_samples[mask] - 1.0) + np.euler_gamma) - 2.0 * (n_samples[mask] - 1.0) / n_samples[mask]
+    return result
+
+
+class CompiledIsolationForest:
+    """
+    Bản "dẹt" của IsolationForest đã fit: toàn bộ cây được xếp vào các mảng NumPy (n_trees x n_nodes)
+    để duyệt đồng thời mọi cây cho MỘT mẫu, tránh chi phí gọi tree.apply từng cây của sklearn.
+    decision_function trả về đúng giá trị như IsolationForest.decision_function.
+    """
+
+    def __init__(self, forest: IsolationForest):
+        estimators = forest.estimators_
+        n_trees = len(estimators)
+        max_nodes = max(est.tree_.node_count for est in estimators)
+        n_features = forest.n_features_in_
+
+        self.feature = np.zeros((n_trees, max_nodes), dtype=np.intp)
+        self.threshold = np.zeros((n_trees, max_nodes), dtype=float)
+        self.left = np.full((n_trees, max_nodes), -1, dtype=np.intp)
+        self.right = np.full((n_trees, max_nodes), -1, dtype=np.intp)
+        self.leaf_depth = np.zeros((n_trees, max_nodes), dtype=float)
+
+        for i, (est, features) in enumerate(zip(estimators, forest.estimators_features_)):
+            tree = est.tree_
+            nc = tree.node_count
+            # sklearn chỉ đánh lại chỉ số feature khi cây được train trên tập con feature
+            feature_map = np.asarray(features) if len(features) != n_features else np.arange(n_features)
+            self.feature[i, :nc] = np.where(tree.feature >= 0, feature_map[np.maximum(tree.feature, 0)], 0)
+            self.threshold[i, :nc] = tree.threshold
+            self.left[i, :nc] = tree.children_left
+            self.right[i, :nc] = tree.children_right
+            self.leaf_depth[i, :nc] = tree.compute_node_depths() + _average_path_length(tree.n_node_samples) - 1.0
+
+        self.max_depth = max(est.tree_.max_depth for est in estimators)
+        self.denominator = n_trees * float(_average_path_length(np.array([forest.max_samples_]))[0])
+        self.offset = float(forest.offset_)
+        self._rows = np.arange(n_trees)
+
+    def decision_function(self, x: np.ndarray) -> float:
+        # Cây sklearn so sánh trên float32
+        x = np.asarray(x, dtype=np.float32).astype(float)
+        node = np.zeros(len(self._rows), dtype=np.intp)
+        for _ in range(self.max_depth):
+            left = self.left[self._rows, node]
+            is_leaf = left == -1
+            if is_leaf.all():
+                break
+            go_left = x[self.feature[self._rows, node]] <= self.threshold[self._rows, node]
+            node = np.where(is_leaf, node, np.where(go_left, left, self.right[self._rows, node]))
+
+        depth = self.leaf_depth[self._rows, node].sum()
+        ratio = depth / self.denominator if self.denominator != 0 else 1.0
+        return -(2.0 ** -ratio) - self.offset
+
+
+@dataclass
+class UserAnomalyModel:
+    """Trạng thái đã fit của một user: model + thống kê đặc trưng để chấm điểm giao dịch mới tăng dần."""
+    forest: CompiledIsolationForest
+    scaler_mean: np.ndarray
+    scaler_scale: np.ndarray
+    score_min: float
+    score_max: float
+    thresholds: Dict[str, float]
+    # Thống kê Welford [count, mean, M2]: toàn bộ giao dịch và theo từng danh mục
+    global_stats: List[float]
+    type_stats: Dict[str, List[float]]
+    recent_amounts: Deque[float]
+    daily_counts: Dict[Any, int]
+    # (type_name, amount) -> thời điểm gần nhất, phục vụ phát hiện trùng lặp
+    last_seen: Dict[Tuple[str, float], Any]
+    history: List[Any]
+    # Khóa giao dịch (IsolationForestService.transaction_key) đã có trong lịch sử fit / đã chấm,
+    # để client gửi lại cùng giao dịch không bị tính 2 lần vào thống kê + lịch sử
+    seen_keys: Set[str] = field(default_factory=set)
+    # Khóa -> kết quả chấm lần đầu (AnomalyTransaction | None), trả lại nguyên vẹn cho lần gửi lại
+    scored: Dict[str, Any] = field(default_factory=dict)
+    # Dấu vân tay lịch sử thô (raw_transactions.history_fingerprint) model này khớp với: lịch sử lúc fit
+    # + lần lượt từng giao dịch đã chấm; client gửi lịch sử khác các giá trị này -> phải fit lại
+    fingerprint: Optional[Tuple[int, int]] = None
+    accepted_fingerprints: Set[Tuple[int, int]] = field(default_factory=set)
+    fitted_at: float = field(default_factory=time.time)
+    new_since_fit: int = 0
+    refitting: bool = False
+    # Đã bị model refit thay thế trong cache: không ghi thêm vào model này (score_single lấy lại model mới)
+    retired: bool = False
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def record(self, type_name: str, amount: float, day: Any) -> Tuple[float, float, float, float]:
+        """Cộng 1 giao dịch mới vào thống kê (gọi khi giữ lock); trả (mean, std) danh mục + toàn bộ sau khi cộng."""
+        type_mean, type_std = self.update_type_stats(type_name, amount)
+        global_mean, global_std = self.update_global_stats(amount)
+        self.recent_amounts.append(amount)
+        self.daily_counts[day] = self.daily_counts.get(day, 0) + 1
+        return type_mean, type_std, global_mean, global_std
+
+    def remember(self, type_name: str, amount: float, when: Any):
+        """Ghi thời điểm gần nhất của cặp (danh mục, số tiền) cho phát hiện trùng lặp."""
+        previous = self.last_seen.get((type_name, amount))
+        if previous is None or when > previous:
+            self.last_seen[(type_name, amount)] = when
+
+    def update_type_stats(self, type_name: str, amount: float) -> Tuple[float, float]:
+        """Cập nhật thống kê danh mục với giao dịch mới, trả về (mean, std) kiểu expanding (ddof=1)."""
+        return self._welford_update(self.type_stats.setdefault(type_name, [0, 0.0, 0.0]), amount)
+
+    def update_global_stats(self, amount: float) -> Tuple[float, float]:
+        return self._welford_update(self.global_stats, amount)
+
+    def peek_type_stats(self, type_name: str) -> Tuple[float, float]:
+        """(mean, std) hiện tại của danh mục, không thêm giao dịch nào."""
+        return self._mean_std(self.type_stats.get(type_name, [0, 0.0, 0.0]))
+
+    def peek_global_stats(self) -> Tuple[float, float]:
+        return self._mean_std(self.global_stats)
+
+    @staticmethod
+    def _mean_std(stats: List[float]) -> Tuple[float, float]:
+        std = math.sqrt(stats[2] / (stats[0] - 1)) if stats[0] > 1 else 0.0
+        return stats[1], std
+
+    @classmethod
+    def _welford_update(cls, stats: List[float], amount: float) -> Tuple[float, float]:
+        stats[0] += 1
+        delta = amount - stats[1]
+        stats[1] += delta / stats[0]
+        stats[2] += delta * (amount - stats[1])
+        return cls._mean_std(stats)
+
+
+class AnomalyModelCache:
+    """Cache LRU các UserAnomalyModel theo user_id (an toàn đa luồng)."""
+
+    def __init__(self, max_users: int = 1000):
+        self.max_users = max_users
+        self._lock = threading.Lock()
+        self._models: "OrderedDict[str, UserAnomalyModel]" = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "fits": 0, "refits": 0, "evictions": 0, "invalidations": 0}
+
+    def get(self, user_id: str) -> Optional[UserAnomalyModel]:
+        with self._lock:
+            model = self._models.get(user_id)
+            if model is None:
+                self._stats["misses"] += 1
+                return None
+            self._models.move_to_end(user_id)
+            self._stats["hits"] += 1
+            return model
+
+    def peek(self, user_id: str) -> Optional[UserAnomalyModel]:
+        """Lấy model mà không tính vào thống kê hit/miss (dùng cho refit nền)."""
+        with self._lock:
+            return self._models.get(user_id)
+
+    def put(self, user_id: str, model: UserAnomalyModel, is_refit: bool = False):
+        with self._lock:
+            self._models[user_id] = model
+            self._models.move_to_end(user_id)
+            self._stats["refits" if is_refit else "fits"] += 1
+            while len(self._models) > self.max_users:
+                self._models.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def replace(self, user_id: str, old: UserAnomalyModel, new: UserAnomalyModel) -> bool:
+        """Thay model refit vào cache, chỉ khi cache vẫn giữ đúng model lúc bắt đầu refit."""
+        with self._lock:
+            if self._models.get(user_id) is not old:
+                return False
+            self._models[user_id] = new
+            self._models.move_to_end(user_id)
+            self._stats["refits"] += 1
+            return True
+
+    def invalidate(self, user_id: str, model: UserAnomalyModel):
+        """Bỏ model của user (chỉ khi vẫn là đúng model đó, tránh xóa model vừa fit lại ở luồng khác)."""
+        with self._lock:
+            if self._models.get(user_id) is model:
+                del self._models[user_id]
+                self._stats["invalidations"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "cachedUsers": len(self._models), "maxUsers": self.max_users}
@@ -0,0 +1,117 @@
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Any, Dict, Hashable, Optional
+
+import numpy as np
+import pandas as pd
+
+
+class CategoryResolver(ABC):
+    """
+    Ánh xạ tên danh mục thô (từ app) -> tên hiển thị.
+    - Bảng tra đã chuẩn hóa được dựng sẵn 1 lần khi khởi tạo service (lúc import)
+    - Tên lạ đi qua nhánh chậm và được nhớ trong LRU có giới hạn
+    - resolve_column() phân giải cả cột: factorize thành mã danh mục, chỉ phân giải mỗi giá trị duy nhất 1 lần
+    """
+
+    def __init__(self, max_cache_size: int = 4096):
+        self._resolve_cached = lru_cache(maxsize=max_cache_size)(self._resolve_uncached)
+
+    @abstractmethod
+    def _lookup(self, key: Hashable) -> Optional[str]:
+        """Tra bảng nhanh; None nếu cần đi nhánh chậm."""
+
+    @abstractmethod
+    def _resolve_uncached(self, key: Hashable) -> str:
+        """Nhánh chậm cho tên lạ (kết quả được nhớ trong LRU)."""
+
+    def resolve(self, key: Hashable) -> str:
+        value = self._lookup(key)
+        return value if value is not None else self._resolve_cached(key)
+
+    def resolve_column(self, *columns: Any) -> np.ndarray:
+        """
+        Phân giải cả cột (hoặc bộ nhiều cột, key là tuple) theo mã categorical.
+        Trả về mảng object cùng độ dài với đầu vào.
+        """
+        codes, uniques = pd.factorize(pd.Series(columns[0]), use_na_sentinel=False)
+        keys = [(self._denan(u),) for u in uniques]
+
+        # Nhiều cột: ghép mã từng cột thành mã tổ hợp rồi factorize lại
+        for column in columns[1:]:
+            col_codes, col_uniques = pd.factorize(pd.Series(column), use_na_sentinel=False)
+            n = len(col_uniques)
+            codes, combined = pd.factorize(codes * n + col_codes)
+            keys = [keys[c // n] + (self._denan(col_uniques[c % n]),) for c in combined]
+
+        if len(columns) == 1:
+            keys = [k[0] for k in keys]
+
+        resolved = np.array([self.resolve(k) for k in keys], dtype=object)
+        return resolved[codes]
+
+    @staticmethod
+    def _denan(value: Any) -> Any:
+        # factorize biến None thành NaN; trả lại None để khớp với resolve() từng giá trị
+        return None if not isinstance(value, str) and pd.isna(value) else value
+
+    def cache_info(self) -> Dict[str, int]:
+        info = self._resolve_cached.cache_info()
+        return {"hits": info.hits, "misses": info.misses, "size": info.currsize, "maxSize": info.maxsize}
+
+
+class AnomalyCategoryResolver(CategoryResolver):
+    """Tên danh mục cho IsolationForestService (key -> tên tiếng Việt ngắn, có dò chuỗi con)."""
+
+    DEFAULT_NAME = "Khác"
+
+    def __init__(self, category_map: Dict[str, str], max_cache_size: int = 4096):
+        super().__init__(max_cache_size)
+        self.table = dict(category_map)
+        # Danh sách dò chuỗi con, giữ đúng thứ tự ưu tiên của CATEGORY_MAP
+        self._scan = [
+            (f" {key} ", key, value, len(key) > 2, len(key) > 3)
+            for key, value in category_map.items()
+        ]
+
+    def resolve(self, key: Any) -> str:
+        if not key: return self.DEFAULT_NAME
+        return super().resolve(str(key).lower().strip())
+
+    def _lookup(self, key: str) -> Optional[str]:
+        return self.table.get(key)
+
+    def _resolve_uncached(self, key_raw: str) -> str:
+        key_normalized = key_raw.replace("_", " ").replace("-", " ")
+        if key_normalized in self.table: return self.table[key_normalized]
+        padded = f" {key_normalized} "
+        for padded_key, key, value, match_word, match_sub in self._scan:
+            if match_word and padded_key in padded: return value
+            if match_sub and key in key_normalized: return value
+        return key_normalized.capitalize()
+
+
+class ClusterCategoryResolver(CategoryResolver):
+    """Tên hiển thị cho KMeansService, key là (type_id, type_name)."""
+
+    DEFAULT_NAME = "Danh mục Khác"
+
+    def __init__(self, translations: Dict[Any, str], max_cache_size: int = 4096):
+        super().__init__(max_cache_size)
+        self.name_table = {k: v for k, v in translations.items() if isinstance(k, str)}
+        self.id_table = {k: v for k, v in translations.items() if isinstance(k, int)}
+
+    @staticmethod
+    def _raw_name(type_name: Any) -> str:
+        return str(type_name).strip() if type_name else ""
+
+    def _lookup(self, key) -> Optional[str]:
+        type_id, type_name = key
+        raw_name = self._raw_name(type_name)
+        if raw_name in self.name_table: return self.name_table[raw_name]
+        if type_id in self.id_table: return self.id_table[type_id]
+        if not raw_name: return self.DEFAULT_NAME
+        return None
+
+    def _resolve_uncached(self, key) -> str:
+        return self._raw_name(key[1]).replace("_", " ").title()
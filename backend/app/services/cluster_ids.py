@@ -0,0 +1,73 @@
+from typing import Any, Callable, Dict, List, Sequence
+
+import numpy as np
+
+class PositionLookup:
+    """id -> vị trí trong danh sách giao dịch gửi lên; dựng 1 lần cho cả response (id trùng lấy lần đầu)."""
+
+    def __init__(self, request_ids: Sequence[str]):
+        ids = list(request_ids)
+        # Duyệt ngược để với id trùng, vị trí đầu tiên được ghi sau cùng
+        self._positions = dict(zip(reversed(ids), range(len(ids) - 1, -1, -1)))
+
+    def ranges(self, cluster_ids: Sequence[str]) -> List[List[int]]:
+        """Vị trí các giao dịch của cụm, gộp thành khoảng liên tiếp [start, end] (gồm end)."""
+        if len(cluster_ids) == 0:
+            return []
+        lookup = self._positions.get
+        positions = np.unique(np.fromiter((lookup(i, -1) for i in cluster_ids), dtype=np.int64, count=len(cluster_ids)))
+        positions = positions[positions >= 0]
+        if positions.size == 0:
+            return []
+
+        breaks = np.flatnonzero(np.diff(positions) != 1)
+        starts = positions[np.r_[0, breaks + 1]]
+        ends = positions[np.r_[breaks, positions.size - 1]]
+        return np.column_stack([starts, ends]).tolist()
+
+
+def shape_transaction_ids(
+    response: Dict[str, Any],
+    mode: str,
+    request_ids: Sequence[str] = (),
+    offset: int = 0,
+    limit: int = 1000
+) -> Dict[str, Any]:
+    """
+    Đổi transactionIds của từng cụm trong response clustering (dict đã jsonable) theo `mode`.
+    Trả dict mới, không sửa `response` (có thể là kết quả lấy từ cache).
+    - full: giữ nguyên
+    - omit: bỏ hẳn transactionIds (vẫn còn characteristics.transactionCount)
+    - ranges: transactionIndexRanges = [[start, end], ...] theo vị trí trong `request_ids`
+    - page: transactionIds[offset:offset + limit] kèm transactionIdsPage = {offset, limit, total}
+    """
+    if mode == "full" or not response.get("clusters"):
+        return response
+
+    lookup = PositionLookup(request_ids) if mode == "ranges" else None
+    clusters = []
+    for cluster in response["clusters"]:
+        cluster = dict(cluster)
+        ids = cluster.pop("transactionIds", [])
+        if mode == "ranges":
+            cluster["transactionIndexRanges"] = lookup.ranges(ids)
+        elif mode == "page":
+            cluster["transactionIds"] = ids[offset:offset + limit]
+            cluster["transactionIdsPage"] = {"offset": offset, "limit": limit, "total": len(ids)}
+        clusters.append(cluster)
+    return {**response, "clusters": clusters}
+
+
+def shape_for_request(response: Dict[str, Any], request: Any, request_ids: Callable[[], Sequence[str]]) -> Dict[str, Any]:
+    """
+    shape_transaction_ids theo các trường transactionIds* của ClusteringRequest / AnalyzeRequest.
+    `request_ids` trả id theo thứ tự gửi lên, chỉ được gọi ở chế độ ranges.
+    """
+    mode = request.transaction_ids_mode
+    return shape_transaction_ids(
+        response,
+        mode,
+        request_ids() if mode == "ranges" else (),
+        offset=request.transaction_ids_offset,
+        limit=request.transaction_ids_limit
+    )
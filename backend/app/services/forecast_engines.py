@@ -0,0 +1,273 @@
+import inspect
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Tuple, Type
+
+import numpy as np
+
+# Kết quả của một engine: (dự báo từng ngày, độ tin cậy). List rỗng = không dự báo được -> fallback Holt
+Forecast = Tuple[List[float], float]
+
+
+# ==============================================================================
+# 1. GIAO DIỆN ENGINE + REGISTRY
+# ==============================================================================
+class ForecastEngine(ABC):
+    """
+    Engine dự báo một series theo ngày (đã điền đủ ngày trống bằng 0, không âm).
+    `user_id` / `series` chỉ dùng cho engine cần lưu trạng thái theo user (VD: LSTM registry).
+    """
+    name = "base"
+
+    @abstractmethod
+    def forecast(
+        self,
+        values: np.ndarray,
+        days: int,
+        user_id: Optional[str] = None,
+        series: Optional[str] = None
+    ) -> Forecast:
+        """Dự báo `days` ngày tiếp theo của 1 series."""
+
+    def forecast_batch(self, values: np.ndarray, lengths: np.ndarray, days: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Dự báo nhiều series một lần: `values` (số series x số ngày) đệm bên phải, `lengths` = số ngày thật của
+        từng dòng. Trả (dự báo [số series x days], độ tin cậy [số series]); dòng không dự báo được có độ tin cậy 0.
+        Mặc định gọi forecast() từng dòng; engine có thể vector hóa (VD: Holt).
+        """
+        values, lengths = np.asarray(values, dtype=float), np.asarray(lengths)
+        preds = np.zeros((len(values), days))
+        confidences = np.zeros(len(values))
+        for row, length in enumerate(lengths):
+            p, c = self.forecast(values[row, :length], days)
+            if p:
+                preds[row], confidences[row] = p, c
+        return preds, confidences
+
+
+def pad_series(series: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """List series độ dài khác nhau -> (mảng 2D đệm 0 bên phải, độ dài từng series) cho forecast_batch."""
+    lengths = np.fromiter((len(s) for s in series), dtype=np.int64, count=len(series))
+    values = np.zeros((len(series), int(lengths.max()) if len(series) else 0))
+    for row, s in enumerate(series):
+        values[row, :len(s)] = s
+    return values, lengths
+
+
+# Tên engine -> factory(service) tạo engine; service là LSTMService gọi tới (engine LSTM cần model/registry của nó)
+_ENGINE_FACTORIES: Dict[str, Callable[[object], ForecastEngine]] = {}
+
+
+def register_engine(engine_cls: Type[ForecastEngine], factory: Optional[Callable[[object], ForecastEngine]] = None):
+    """
+    Đăng ký engine theo `engine_cls.name`; `factory` mặc định là chính lớp (nhận service).
+    Lớp thiếu hàm trừu tượng (VD: forecast) bị từ chối ngay lúc đăng ký thay vì lỗi ở request đầu tiên.
+    """
+    if not (inspect.isclass(engine_cls) and issubclass(engine_cls, ForecastEngine)):
+        raise TypeError(f"{engine_cls!r} is not a ForecastEngine subclass")
+    if inspect.isabstract(engine_cls):
+        missing = ", ".join(sorted(engine_cls.__abstractmethods__))
+        raise TypeError(f"Forecast engine '{engine_cls.name}' does not implement: {missing}")
+    _ENGINE_FACTORIES[engine_cls.name] = factory or engine_cls
+
+
+def available_engines() -> List[str]:
+    return sorted(_ENGINE_FACTORIES)
+
+
+def create_engine(name: str, service: object = None) -> ForecastEngine:
+    if name not in _ENGINE_FACTORIES:
+        raise ValueError(f"Unknown forecast engine '{name}', available: {', '.join(available_engines())}")
+    return _ENGINE_FACTORIES[name](service)
+
+
+# ==============================================================================
+# 2. HOLT (làm trơn mũ có xu hướng tắt dần) - engine thống kê mặc định / fallback
+# ==============================================================================
+def holt_forecast(values: np.ndarray, days: int) -> Forecast:
+    n = len(values)
+    if n < 1: return [0.0] * days, 0.0
+
+    alpha, beta = 0.3, 0.1
+    level = values[0]
+    trend = values[1] - values[0] if n > 1 else 0
+
+    for i in range(1, n):
+        prev_level = level
+        level = alpha * values[i] + (1 - alpha) * (prev_level + trend)
+        trend = beta * (level - prev_level) + (1 - beta) * trend
+
+    preds = []
+    damped_trend = trend * 0.8
+    for h in range(1, days + 1):
+        val = level + h * damped_trend
+        preds.append(max(0.0, float(val)))
+
+    total_hist = np.sum(values)
+    if sum(preds) < 1000 and total_hist > 0:
+        daily_avg = total_hist / max(1, n)
+        return [float(daily_avg)] * days, 0.4
+
+    return preds, 0.5
+
+
+def holt_forecast_batch(values: np.ndarray, lengths: np.ndarray, days: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    holt_forecast cho cả mảng (số series x số ngày, đệm bên phải) trong 1 lần: vòng lặp chỉ chạy theo ngày,
+    mỗi bước cập nhật level/trend của mọi series bằng phép toán vector; dòng đã hết dữ liệu giữ nguyên trạng thái.
+    Kết quả trùng holt_forecast từng dòng (kể cả nhánh fallback trung bình ngày, độ tin cậy 0.4 / 0.5 / 0.0).
+    """
+    values = np.asarray(values, dtype=float)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    n_series = len(values)
+    if n_series == 0:
+        return np.zeros((0, days)), np.zeros(0)
+
+    alpha, beta = 0.3, 0.1
+    width = values.shape[1]
+    first = values[:, 0] if width else np.zeros(n_series)
+    level = first.copy()
+    trend = np.where(lengths > 1, (values[:, 1] if width > 1 else first) - first, 0.0)
+
+    for i in range(1, int(lengths.max())):
+        active = lengths > i
+        prev_level = level
+        new_level = alpha * values[:, i] + (1 - alpha) * (prev_level + trend)
+        new_trend = beta * (new_level - prev_level) + (1 - beta) * trend
+        level = np.where(active, new_level, level)
+        trend = np.where(active, new_trend, trend)
+
+    horizon = np.arange(1, days + 1)
+    preds = np.maximum(0.0, level[:, None] + horizon[None, :] * (trend * 0.8)[:, None])
+    confidences = np.full(n_series, 0.5)
+
+    in_range = np.arange(width)[None, :] < lengths[:, None]
+    total_hist = np.where(in_range, values, 0.0).sum(axis=1)
+    use_average = (preds.sum(axis=1) < 1000) & (total_hist > 0)
+    daily_avg = total_hist / np.maximum(1, lengths)
+    preds[use_average] = daily_avg[use_average, None]
+    confidences[use_average] = 0.4
+
+    empty = lengths < 1
+    preds[empty] = 0.0
+    confidences[empty] = 0.0
+    return preds, confidences
+
+
+class HoltEngine(ForecastEngine):
+    name = "holt"
+
+    def forecast(self, values, days, user_id=None, series=None) -> Forecast:
+        return holt_forecast(values, days)
+
+    def forecast_batch(self, values, lengths, days):
+        return holt_forecast_batch(values, lengths, days)
+
+
+# ==============================================================================
+# 3. LSTM (qua LSTMService: model Keras + registry theo user)
+# ==============================================================================
+class LSTMEngine(ForecastEngine):
+    """LSTM khi series đủ dài và đủ biến động, ngược lại trả rỗng để fallback Holt (hành vi mặc định cũ)."""
+    name = "lstm"
+
+    def __init__(self, service):
+        self.service = service
+
+    def forecast(self, values, days, user_id=None, series=None) -> Forecast:
+        if self.service is None or not self.service._qualifies_for_dl(values):
+            return [], 0.0
+        return self.service._predict_lstm(values, days, user_id, series)
+
+
+# ==============================================================================
+# 4. RIDGE AUTOREGRESSION (chỉ NumPy, giải dạng đóng)
+# ==============================================================================
+class RidgeAREngine(ForecastEngine):
+    """
+    y[t] ~ các lag (1..7, 14, 21, 28 tùy độ dài lịch sử) + trung bình trượt 7 / max_lag ngày
+         + 7 biến giả theo thứ trong tuần (thay cho hệ số chặn, không bị phạt).
+    Series luôn liên tục theo ngày nên vị trí t % 7 tương ứng cố định với thứ trong tuần.
+    Hệ số giải bằng (XᵀX + λD)⁻¹Xᵀy; λ chọn trong lưới theo sai số leave-one-out dạng đóng
+    (e_i / (1 - h_ii)), nên train chỉ vài ms và không cần TensorFlow. Dự báo nhiều ngày bằng tự hồi quy.
+    """
+    name = "ridge_ar"
+
+    LAGS = (1, 2, 3, 4, 5, 6, 7, 14, 21, 28)
+    LAMBDAS = (0.1, 1.0, 10.0, 100.0, 1000.0)
+
+    def __init__(self, min_days: int = 28):
+        self.min_days = min_days
+
+    @staticmethod
+    def _max_lag(n: int) -> int:
+        if n >= 90: return 28
+        if n >= 45: return 14
+        return 7
+
+    @staticmethod
+    def _features(history: np.ndarray, targets: np.ndarray, lags: np.ndarray, windows: Tuple[int, ...]) -> np.ndarray:
+        """Ma trận đặc trưng cho các vị trí `targets` (chỉ dùng history[:t] cho mỗi t)."""
+        cumsum = np.concatenate(([0.0], np.cumsum(history)))
+        columns = [history[targets[:, None] - lags[None, :]]]
+        columns += [((cumsum[targets] - cumsum[targets - w]) / w)[:, None] for w in windows]
+        columns.append(np.eye(7)[targets % 7])
+        return np.hstack(columns)
+
+    def _fit(self, x: np.ndarray, y: np.ndarray, n_penalized: int) -> Tuple[np.ndarray, float]:
+        penalty = np.zeros(x.shape[1])
+        penalty[:n_penalized] = 1.0
+        gram, xty = x.T @ x, x.T @ y
+        best = (None, np.inf)
+        for lam in self.LAMBDAS:
+            try:
+                inverse = np.linalg.inv(gram + lam * len(y) * np.diag(penalty))
+            except np.linalg.LinAlgError:
+                continue
+            coef = inverse @ xty
+            leverage = np.einsum('ij,jk,ik->i', x, inverse, x)
+            loo = np.mean(((y - x @ coef) / np.maximum(1.0 - leverage, 1e-6)) ** 2)
+            if loo < best[1]:
+                best = (coef, loo)
+        return best
+
+    def forecast(self, values, days, user_id=None, series=None) -> Forecast:
+        values = np.asarray(values, dtype=float)
+        n = len(values)
+        if n < self.min_days:
+            return [], 0.0
+
+        # Chuẩn hóa theo mức trung bình để λ không phụ thuộc đơn vị tiền
+        scale = float(np.mean(values))
+        if scale <= 0:
+            return [], 0.0
+        history = values / scale
+
+        max_lag = self._max_lag(n)
+        lags = np.array([lag for lag in self.LAGS if lag <= max_lag])
+        windows = (7, max_lag) if max_lag > 7 else (7,)
+        n_penalized = len(lags) + len(windows)
+
+        targets = np.arange(max_lag, n)
+        x = self._features(history, targets, lags, windows)
+        y = history[targets]
+        if len(y) < 2 * x.shape[1]:
+            return [], 0.0
+
+        coef, loo = self._fit(x, y, n_penalized)
+        if coef is None:
+            return [], 0.0
+
+        extended = np.concatenate((history, np.zeros(days)))
+        for step in range(days):
+            t = n + step
+            extended[t] = max(0.0, float((self._features(extended, np.array([t]), lags, windows) @ coef)[0]))
+
+        # Độ tin cậy theo mức cải thiện leave-one-out so với dự báo bằng trung bình: 0.5 .. 0.8
+        skill = 1.0 - loo / max(float(np.var(y)), 1e-12)
+        confidence = round(0.5 + 0.3 * min(max(skill, 0.0), 1.0), 2)
+        return [float(v) for v in extended[n:] * scale], confidence
+
+
+register_engine(LSTMEngine)
+register_engine(HoltEngine, lambda service: HoltEngine())
+register_engine(RidgeAREngine, lambda service: RidgeAREngine())
@@ -1,6 +1,9 @@
+import hashlib
+
 import numpy as np
 import pandas as pd
-from typing import List, Dict, Any
+from collections import deque
+from typing import List, Dict, Any, Optional, Set, Tuple
 from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import StandardScaler
 from datetime import datetime, timedelta
@@ -9,6 +12,11 @@ from datetime import datetime, timedelta
 from app.schemas.spending import SpendingItem
 from app.schemas.response import AnomalyDetectionResponse, AnomalyTransaction
 from app.config import settings
+from app.services.category_resolver import AnomalyCategoryResolver
+from app.services.transaction_frame import FRAME_COLUMNS, build_transaction_frame
+from app.services.anomaly_model_cache import AnomalyModelCache, CompiledIsolationForest, UserAnomalyModel
+from app.services.metrics import observe_input, stage
+from app.services.raw_transactions import extend_fingerprint
 
 class IsolationForestService:
 
@@ -59,53 +67,50 @@ class IsolationForestService:
         "other": "Khác",
     }
 
+    FEATURE_COLUMNS = ['log_amount', 'amount_zscore', 'is_unusual_hour', 'daily_count', 'rolling_mean_7d']
+    WHITELIST_TYPES = ["Lưu trú & Thuê nhà", "Hóa đơn Điện", "Hóa đơn Nước"]
+
     def __init__(self):
-        self.scaler = StandardScaler()
         self.default_contamination = settings.ISOLATION_FOREST_CONTAMINATION
+        self.refit_min_new = settings.ANOMALY_REFIT_MIN_NEW
+        self.duplicate_window_seconds = settings.ANOMALY_DUPLICATE_WINDOW_SECONDS
+        self.model_cache = AnomalyModelCache(max_users=settings.ANOMALY_CACHE_MAX_USERS)
+        self.category_resolver = AnomalyCategoryResolver(self.CATEGORY_MAP)
 
     def _get_vietnamese_type_name(self, original_name: str) -> str:
-        if not original_name: return "Khác"
-        key_raw = str(original_name).lower().strip()
-        if key_raw in self.CATEGORY_MAP: return self.CATEGORY_MAP[key_raw]
-        key_normalized = key_raw.replace("_", " ").replace("-", " ")
-        if key_normalized in self.CATEGORY_MAP: return self.CATEGORY_MAP[key_normalized]
-        for key, value in self.CATEGORY_MAP.items():
-            if len(key) > 2 and f" {key} " in f" {key_normalized} ": return value
-            if len(key) > 3 and key in key_normalized: return value
-        return key_normalized.capitalize()
-
-    def _extract_features(self, transactions: List[SpendingItem]) -> pd.DataFrame:
-        data = []
-        for t in transactions:
-            vn_type_name = self._get_vietnamese_type_name(t.type_name)
-            data.append({
-                'id': t.id, 'money': t.money, 'amount': abs(t.money),
-                'type': t.type, 'type_name': vn_type_name,
-                'date_time': t.date_time,
-                'hour': t.date_time.hour,
-                'weekday': t.date_time.weekday(),
-                'day_of_month': t.date_time.day,
-                'is_expense': t.money < 0
-            })
-
-        if not data: return pd.DataFrame()
-
-        df = pd.DataFrame(data)
+        return self.category_resolver.resolve(original_name)
+
+    def _extract_features(self, transactions: Optional[List[SpendingItem]], frame: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        # Đọc thuộc tính 1 lần thành các cột (hoặc dùng frame chung do /analyze dựng sẵn),
+        # mọi phép tính sau đó đều theo cột
+        if frame is None:
+            frame = build_transaction_frame(transactions)
+        if frame.empty: return pd.DataFrame()
+
+        df = frame[FRAME_COLUMNS].copy()
+
+        # Dịch tên danh mục theo mã categorical thay vì từng dòng
+        df['type_name'] = self.category_resolver.resolve_column(df['type_name'])
+
+        df.insert(2, 'amount', df['money'].abs())
+        df['hour'] = df['date_time'].dt.hour.astype(int)
+        df['weekday'] = df['date_time'].dt.weekday.astype(int)
+        df['day_of_month'] = df['date_time'].dt.day.astype(int)
+        df['is_expense'] = df['money'] < 0
+
         df = df.sort_values('date_time').reset_index(drop=True)
 
         df['log_amount'] = np.log1p(df['amount'])
 
-        indexer = pd.api.indexers.FixedForwardWindowIndexer(window_size=7) # Hack for rolling
         df['rolling_mean_7d'] = df['amount'].rolling(window=7, min_periods=1).mean()
         df['rolling_std_7d'] = df['amount'].rolling(window=7, min_periods=1).std().fillna(1)
-        
-        df['is_month_start'] = df['day_of_month'].apply(lambda x: 1 if x <= 5 else 0)
 
-        for type_name_vn in df['type_name'].unique():
-            mask = df['type_name'] == type_name_vn
-            type_amounts = df.loc[mask, 'amount']
-            df.loc[mask, 'type_mean'] = type_amounts.expanding().mean()
-            df.loc[mask, 'type_std'] = type_amounts.expanding().std().fillna(0)
+        df['is_month_start'] = (df['day_of_month'] <= 5).astype(int)
+
+        # Thống kê lũy kế theo danh mục: một lần groupby().expanding() cho mọi danh mục
+        type_expanding = df.groupby('type_name', sort=False)['amount'].expanding()
+        df['type_mean'] = type_expanding.mean().reset_index(level=0, drop=True)
+        df['type_std'] = type_expanding.std().reset_index(level=0, drop=True).fillna(0)
 
         df['type_mean'] = df['type_mean'].fillna(df['amount'].mean())
         df['type_std'] = df['type_std'].fillna(df['amount'].std())
@@ -115,91 +120,143 @@ class IsolationForestService:
         global_mean, global_std = df['amount'].mean(), df['amount'].std()
         df['global_zscore'] = (df['amount'] - global_mean) / global_std if global_std > 0 else 0
 
-        df['is_unusual_hour'] = df['hour'].apply(lambda x: 1 if x < 6 or x > 23 else 0)
+        df['is_unusual_hour'] = ((df['hour'] < 6) | (df['hour'] > 23)).astype(int)
         df['is_weekend'] = df['weekday'].isin([5, 6]).astype(int)
 
-        df['daily_count'] = df.groupby(df['date_time'].dt.date)['id'].transform('count')
-        df['daily_total'] = df.groupby(df['date_time'].dt.date)['amount'].transform('sum')
+        day_key = df['date_time'].dt.normalize()
+        df['daily_count'] = df.groupby(day_key)['id'].transform('count')
+        df['daily_total'] = df.groupby(day_key)['amount'].transform('sum')
 
         return df
 
-    def _detect_logical_anomalies(self, df: pd.DataFrame) -> List[Dict]:
-        anomalies = []
-        
+    def _detect_logical_anomalies(self, df: pd.DataFrame, window_seconds: Optional[float] = None) -> List[Dict]:
+        window = self.duplicate_window_seconds if window_seconds is None else window_seconds
+
         df_sorted = df.sort_values(['type_name', 'amount', 'date_time'])
-        df_sorted['prev_time'] = df_sorted['date_time'].shift(1)
-        df_sorted['prev_amount'] = df_sorted['amount'].shift(1)
-        df_sorted['prev_type'] = df_sorted['type_name'].shift(1)
-        
-        for index, row in df_sorted.iterrows():
-            if (row['amount'] == row['prev_amount'] and row['type_name'] == row['prev_type'] and row['amount'] > 0):
-                if pd.notnull(row['prev_time']):
-                    diff = (row['date_time'] - row['prev_time']).total_seconds()
-                    if diff < 300: # 5 phút
-                        anomalies.append({
-                            'id': row['id'],
-                            'reason': f"Nghi vấn trùng lặp: Giống hệt giao dịch lúc {row['prev_time'].strftime('%H:%M')}",
-                            'score': 1.0,
-                            'severity': 'high'
-                        })
-        return anomalies
-
-    def _determine_anomaly_reason(self, row: pd.Series, thresholds: Dict[str, float]) -> str:
-        reasons = []
-        cat_name = row['type_name']
-
-        if row['amount'] > row['rolling_mean_7d'] * 3:
-             reasons.append(f"Cao gấp 3 lần mức chi tiêu trung bình tuần qua")
-        elif abs(row['amount_zscore']) > 2:
-            reasons.append(f"Khác biệt lớn so với lịch sử chi tiêu '{cat_name}'")
-
-        if abs(row['global_zscore']) > 3:
-            reasons.append("Số tiền cực lớn so với thu nhập/chi tiêu chung")
-
-        if row['is_unusual_hour']:
-            reasons.append(f"Phát sinh lúc đêm khuya ({row['hour']}h)")
-
-        if row['daily_count'] > thresholds.get('daily_count', 10):
-            reasons.append(f"Tần suất giao dịch bất thường ({int(row['daily_count'])} lần/ngày)")
-
-        if not reasons: reasons.append("Hành vi chi tiêu khác biệt so với thói quen")
-        
-        full_reason = "; ".join(reasons)
-        return full_reason[0].upper() + full_reason[1:] if full_reason else "Bất thường không xác định"
+        amount = df_sorted['amount']
+        date_time = df_sorted['date_time']
+        prev_time = date_time.shift(1)
+
+        # So sánh mỗi dòng với dòng liền trước trong thứ tự (danh mục, số tiền, thời gian)
+        is_duplicate = (
+            amount.eq(amount.shift(1))
+            & df_sorted['type_name'].eq(df_sorted['type_name'].shift(1))
+            & (amount > 0)
+            & prev_time.notna()
+            & ((date_time - prev_time).dt.total_seconds() < window)
+        )
+
+        dup_ids = df_sorted['id'][is_duplicate]
+        prev_labels = prev_time[is_duplicate].dt.strftime('%H:%M')
+        return [
+            {
+                'id': tx_id,
+                'reason': f"Nghi vấn trùng lặp: Giống hệt giao dịch lúc {label}",
+                'score': 1.0,
+                'severity': 'high'
+            }
+            for tx_id, label in zip(dup_ids, prev_labels)
+        ]
+
+    def _determine_anomaly_reasons(self, df: pd.DataFrame, thresholds: Dict[str, float]) -> pd.Series:
+        """Lý do bất thường cho cả khung dữ liệu, ghép theo cột thay vì từng dòng."""
+        empty = pd.Series("", index=df.index, dtype=object)
+        amount_zscore = df['amount_zscore'].abs()
+
+        spike = df['amount'] > df['rolling_mean_7d'] * 3
+        history = ~spike & (amount_zscore > 2)
+        parts = [
+            empty.mask(spike, "Cao gấp 3 lần mức chi tiêu trung bình tuần qua"),
+            empty.mask(history, "Khác biệt lớn so với lịch sử chi tiêu '" + df['type_name'].astype(str) + "'"),
+            empty.mask(df['global_zscore'].abs() > 3, "Số tiền cực lớn so với thu nhập/chi tiêu chung"),
+            empty.mask(df['is_unusual_hour'].astype(bool), "Phát sinh lúc đêm khuya (" + df['hour'].astype(str) + "h)"),
+            empty.mask(
+                df['daily_count'] > thresholds.get('daily_count', 10),
+                "Tần suất giao dịch bất thường (" + df['daily_count'].astype(int).astype(str) + " lần/ngày)"
+            )
+        ]
+
+        reasons = empty
+        for part in parts:
+            has_part = part != ""
+            joined = reasons.where(reasons == "", reasons + "; ") + part
+            reasons = reasons.mask(has_part, joined)
+
+        reasons = reasons.mask(reasons == "", "Hành vi chi tiêu khác biệt so với thói quen")
+        return reasons.str[:1].str.upper() + reasons.str[1:]
+
+    def _determine_anomaly_reason(self, row: Dict[str, Any], thresholds: Dict[str, float]) -> str:
+        return self._determine_anomaly_reasons(pd.DataFrame([row]), thresholds).iloc[0]
+
+    @staticmethod
+    def _determine_severities(anomaly_score: np.ndarray, amount_zscore: np.ndarray) -> np.ndarray:
+        score = np.abs(np.asarray(anomaly_score, dtype=float))
+        zscore = np.abs(np.asarray(amount_zscore, dtype=float))
+        combined_score = score + zscore / 3
+        return np.select(
+            [(combined_score > 0.8) | (zscore > 4), (combined_score > 0.5) | (zscore > 2.5)],
+            ["high", "medium"],
+            default="low"
+        )
 
     def _determine_severity(self, anomaly_score: float, amount_zscore: float, manual_severity: str = None) -> str:
         if manual_severity: return manual_severity # Ưu tiên mức độ từ Rule-based
-        
-        combined_score = abs(anomaly_score) + abs(amount_zscore) / 3
-        if combined_score > 0.8 or abs(amount_zscore) > 4: return "high"
-        elif combined_score > 0.5 or abs(amount_zscore) > 2.5: return "medium"
-        else: return "low"
-
-    def detect_anomalies(self, user_id: str, transactions: List[SpendingItem], sensitivity: float = None) -> AnomalyDetectionResponse:
-        df = self._extract_features(transactions)
+        return str(self._determine_severities([anomaly_score], [amount_zscore])[0])
+
+    @staticmethod
+    def _build_anomaly_transactions(ids, money, type_names, date_times, scores, reasons, severities) -> List[AnomalyTransaction]:
+        return [
+            AnomalyTransaction(
+                transaction_id=tx_id, money=amount, type_name=type_name, date_time=date_time,
+                anomaly_score=score, anomaly_reason=reason, severity=severity
+            )
+            for tx_id, amount, type_name, date_time, score, reason, severity
+            in zip(ids, money, type_names, date_times, scores, reasons, severities)
+        ]
+
+    def detect_anomalies(
+        self,
+        user_id: str,
+        transactions: Optional[List[SpendingItem]],
+        sensitivity: float = None,
+        frame: Optional[pd.DataFrame] = None
+    ) -> AnomalyDetectionResponse:
+        observe_input("isolation_forest", len(frame) if frame is not None else len(transactions or []))
+        with stage("isolation_forest", "featurize"):
+            df = self._extract_features(transactions, frame)
         
         if df.empty or len(df) < 5:
             return AnomalyDetectionResponse(
-                success=False, user_id=user_id, total_transactions=len(transactions),
+                success=False, user_id=user_id, total_transactions=len(df),
                 anomalies_detected=0, anomalies=[], statistics={},
                 alerts=["Cần thêm dữ liệu (tối thiểu 5 giao dịch) để AI phân tích."],
                 message="Chưa đủ dữ liệu"
             )
 
         contamination = sensitivity or self.default_contamination
-        feature_columns = ['log_amount', 'amount_zscore', 'is_unusual_hour', 'daily_count', 'rolling_mean_7d']
-        X = df[feature_columns].values
+        X = df[self.FEATURE_COLUMNS].values
         X = np.nan_to_num(X, nan=0.0, posinf=0.0, neginf=0.0)
-        X_scaled = self.scaler.fit_transform(X)
+        # Scaler tạo mới mỗi request: service là singleton dùng chung giữa các thread
+        with stage("isolation_forest", "scaler_fit"):
+            X_scaled = StandardScaler().fit_transform(X)
 
         iso_forest = IsolationForest(contamination=contamination, random_state=42, n_estimators=100)
-        df['anomaly_label'] = iso_forest.fit_predict(X_scaled)
-        df['anomaly_score'] = -iso_forest.decision_function(X_scaled)
-
+        with stage("isolation_forest", "model_fit"):
+            iso_forest.fit(X_scaled)
+        with stage("isolation_forest", "inference"):
+            # fit_predict = fit + so decision_function với 0; tính score 1 lần cho cả nhãn lẫn điểm
+            decision = iso_forest.decision_function(X_scaled)
+        df['anomaly_label'] = np.where(decision < 0, -1, 1)
+        df['anomaly_score'] = -decision
+
+        with stage("isolation_forest", "response_build"):
+            return self._build_detection_response(user_id, df)
+
+    def _build_detection_response(self, user_id: str, df: pd.DataFrame) -> AnomalyDetectionResponse:
         score_min, score_max = df['anomaly_score'].min(), df['anomaly_score'].max()
         df['anomaly_score_normalized'] = (df['anomaly_score'] - score_min) / (score_max - score_min) if score_max > score_min else 0.5
 
-        whitelist_mask = (df['is_month_start'] == 1) & (df['type_name'].isin(["Lưu trú & Thuê nhà", "Hóa đơn Điện", "Hóa đơn Nước"]))
+        whitelist_mask = (df['is_month_start'] == 1) & (df['type_name'].isin(self.WHITELIST_TYPES))
         df.loc[whitelist_mask, 'anomaly_label'] = 1 
         df.loc[whitelist_mask, 'anomaly_score_normalized'] = 0.1
 
@@ -213,26 +270,28 @@ class IsolationForestService:
             'daily_total': df['daily_total'].quantile(0.95)
         }
 
-        final_anomalies = []
-
-        for _, row in ai_anomaly_df.iterrows():
-            reason = self._determine_anomaly_reason(row, thresholds)
-            sev = self._determine_severity(row['anomaly_score_normalized'], row['amount_zscore'])
-            final_anomalies.append(AnomalyTransaction(
-                transaction_id=row['id'], money=int(row['money']), type_name=row['type_name'],
-                date_time=row['date_time'].strftime('%Y-%m-%d %H:%M'),
-                anomaly_score=round(row['anomaly_score_normalized'], 3),
-                anomaly_reason=reason, severity=sev
-            ))
-
-        for item in logical_anomalies:
-            row = df[df['id'] == item['id']].iloc[0]
-            final_anomalies.append(AnomalyTransaction(
-                transaction_id=item['id'], money=int(row['money']), type_name=row['type_name'],
-                date_time=row['date_time'].strftime('%Y-%m-%d %H:%M'),
-                anomaly_score=item['score'],
-                anomaly_reason=item['reason'], severity=item['severity']
-            ))
+        final_anomalies = self._build_anomaly_transactions(
+            ai_anomaly_df['id'].tolist(),
+            ai_anomaly_df['money'].astype(np.int64).tolist(),
+            ai_anomaly_df['type_name'].tolist(),
+            ai_anomaly_df['date_time'].dt.strftime('%Y-%m-%d %H:%M').tolist(),
+            np.round(ai_anomaly_df['anomaly_score_normalized'].to_numpy(dtype=float), 3).tolist(),
+            self._determine_anomaly_reasons(ai_anomaly_df, thresholds).tolist(),
+            self._determine_severities(ai_anomaly_df['anomaly_score_normalized'], ai_anomaly_df['amount_zscore']).tolist()
+        )
+
+        if logical_anomalies:
+            # Tra theo id qua index (giữ dòng đầu tiên nếu id bị trùng) thay vì quét df cho từng id
+            logical_rows = df.drop_duplicates('id').set_index('id').loc[logical_ids]
+            final_anomalies += self._build_anomaly_transactions(
+                logical_ids,
+                logical_rows['money'].astype(np.int64).tolist(),
+                logical_rows['type_name'].tolist(),
+                logical_rows['date_time'].dt.strftime('%Y-%m-%d %H:%M').tolist(),
+                [item['score'] for item in logical_anomalies],
+                [item['reason'] for item in logical_anomalies],
+                [item['severity'] for item in logical_anomalies]
+            )
 
         sev_order = {'high': 0, 'medium': 1, 'low': 2}
         final_anomalies.sort(key=lambda x: (sev_order[x.severity], -x.anomaly_score))
@@ -251,6 +310,257 @@ class IsolationForestService:
             message="Phân tích chuyên sâu hoàn tất"
         )
 
+    # ==========================================================================
+    # CHẤM ĐIỂM TĂNG DẦN 1 GIAO DỊCH (model cache theo user)
+    # ==========================================================================
+    @staticmethod
+    def transaction_key(transaction: SpendingItem, use_id: bool = True) -> str:
+        """
+        Khóa nhận diện 1 giao dịch khi chấm điểm tăng dần: theo id, hoặc hash nội dung
+        (số tiền, danh mục, thời điểm) khi giao dịch không có id thật.
+        """
+        if use_id and transaction.id:
+            return f"id:{transaction.id}"
+        content = f"{transaction.money}|{transaction.type}|{transaction.type_name}|{transaction.date_time.isoformat()}"
+        return "sha1:" + hashlib.sha1(content.encode()).hexdigest()
+
+    def fit_user_model(
+        self,
+        user_id: str,
+        transactions: List[SpendingItem],
+        is_refit: bool = False,
+        scored: Optional[Dict[str, Any]] = None,
+        fingerprint: Optional[Tuple[int, int]] = None,
+        accepted_fingerprints: Optional[Set[Tuple[int, int]]] = None
+    ) -> bool:
+        """
+        Fit Isolation Forest trên lịch sử của user và lưu kèm thống kê đặc trưng vào cache.
+        `scored`: kết quả chấm của model cũ (khi refit) để giao dịch gửi lại vẫn nhận đúng kết quả lần đầu.
+        `fingerprint`: dấu vân tay lịch sử thô client gửi (history_fingerprint) để nhận ra khi lịch sử đổi.
+        """
+        model = self._build_user_model(transactions, scored, fingerprint, accepted_fingerprints)
+        if model is None:
+            return False
+        self.model_cache.put(user_id, model, is_refit=is_refit)
+        return True
+
+    def _build_user_model(
+        self,
+        transactions: List[SpendingItem],
+        scored: Optional[Dict[str, Any]] = None,
+        fingerprint: Optional[Tuple[int, int]] = None,
+        accepted_fingerprints: Optional[Set[Tuple[int, int]]] = None
+    ) -> Optional[UserAnomalyModel]:
+        df = self._extract_features(transactions)
+        if df.empty or len(df) < 5:
+            return None
+
+        X = np.nan_to_num(df[self.FEATURE_COLUMNS].values, nan=0.0, posinf=0.0, neginf=0.0)
+        scaler = StandardScaler().fit(X)
+        X_scaled = scaler.transform(X)
+
+        iso_forest = IsolationForest(contamination=self.default_contamination, random_state=42, n_estimators=100)
+        iso_forest.fit(X_scaled)
+        scores = -iso_forest.decision_function(X_scaled)
+
+        # Trạng thái Welford theo danh mục, khớp với expanding mean/std (ddof=1) lúc trích đặc trưng
+        grouped = df.groupby('type_name')['amount']
+        counts, means, variances = grouped.count(), grouped.mean(), grouped.var().fillna(0.0)
+        type_stats = {
+            name: [int(counts[name]), float(means[name]), float(variances[name] * (counts[name] - 1))]
+            for name in counts.index
+        }
+
+        global_var = df['amount'].var() if len(df) > 1 else 0.0
+
+        model = UserAnomalyModel(
+            forest=CompiledIsolationForest(iso_forest),
+            scaler_mean=scaler.mean_.copy(),
+            scaler_scale=scaler.scale_.copy(),
+            score_min=float(scores.min()),
+            score_max=float(scores.max()),
+            thresholds={
+                'daily_count': df['daily_count'].quantile(0.95),
+                'daily_total': df['daily_total'].quantile(0.95),
+                'daily_count_median': df['daily_count'].median()
+            },
+            global_stats=[len(df), float(df['amount'].mean()), float(global_var * (len(df) - 1))],
+            type_stats=type_stats,
+            recent_amounts=deque(df['amount'].tail(6).tolist(), maxlen=6),
+            daily_counts=df.groupby(df['date_time'].dt.date).size().to_dict(),
+            last_seen=df.groupby(['type_name', 'amount'])['date_time'].max().to_dict(),
+            history=list(transactions),
+            seen_keys={self.transaction_key(t) for t in transactions} | set(scored or ()),
+            scored=dict(scored or {}),
+            fingerprint=fingerprint,
+            accepted_fingerprints=set(accepted_fingerprints or ()) | ({fingerprint} if fingerprint else set())
+        )
+        return model
+
+    def refit_user_model(self, user_id: str) -> bool:
+        """
+        Fit lại từ lịch sử đã tích lũy trong cache (chạy nền khi có đủ giao dịch mới).
+        Fit không giữ lock nên score_single vẫn chấm trên model cũ; lúc thay model, phần score_single ghi thêm
+        sau bản chụp (lịch sử, thống kê, kết quả đã chấm, vân tay) được chép sang model mới.
+        """
+        model = self.model_cache.peek(user_id)
+        if model is None:
+            return False
+        try:
+            with model.lock:
+                history, scored = list(model.history), dict(model.scored)
+                fingerprint, accepted = model.fingerprint, set(model.accepted_fingerprints)
+            refitted = self._build_user_model(history, scored, fingerprint, accepted)
+            if refitted is None:
+                return False
+            with model.lock:
+                self._carry_over(model, refitted, fitted_rows=len(history))
+                # Model đã bị bỏ / fit lại từ lịch sử client trong lúc refit: giữ model đó
+                if not self.model_cache.replace(user_id, model, refitted):
+                    return False
+                model.retired = True
+            return True
+        finally:
+            model.refitting = False
+
+    def _carry_over(self, old: UserAnomalyModel, new: UserAnomalyModel, fitted_rows: int):
+        """Chép sang `new` các giao dịch score_single thêm vào `old` sau khi chụp `fitted_rows` dòng lịch sử để fit."""
+        late = old.history[fitted_rows:]
+        for transaction in late:
+            amount = float(abs(transaction.money))
+            type_name = self._get_vietnamese_type_name(transaction.type_name)
+            new.record(type_name, amount, transaction.date_time.date())
+            new.remember(type_name, amount, transaction.date_time)
+        new.history.extend(late)
+        new.new_since_fit = len(late)
+        new.seen_keys |= old.seen_keys
+        for key, anomaly in old.scored.items():
+            new.scored.setdefault(key, anomaly)
+        new.fingerprint = old.fingerprint
+        new.accepted_fingerprints |= old.accepted_fingerprints
+
+    def _acquire_model(self, user_id: str) -> Optional[UserAnomalyModel]:
+        """Model hiện tại của user, trả về khi đã giữ model.lock (bỏ qua model vừa bị refit thay thế)."""
+        while True:
+            model = self.model_cache.get(user_id)
+            if model is None:
+                return None
+            model.lock.acquire()
+            if not model.retired:
+                return model
+            model.lock.release()
+
+    def release_refit(self, user_id: str):
+        model = self.model_cache.peek(user_id)
+        if model is not None:
+            model.refitting = False
+
+    def score_single(
+        self,
+        user_id: str,
+        transaction: SpendingItem,
+        key: Optional[str] = None,
+        history_fingerprint: Optional[Tuple[int, int]] = None,
+        digest: Optional[int] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Chấm điểm 1 giao dịch mới bằng model đã cache, không fit lại.
+        Trả về None nếu user chưa có model, hoặc `history_fingerprint` (lịch sử client gửi kèm) không khớp lịch sử
+        của model (model bị bỏ, cần fit lại); ngược lại {"anomaly": AnomalyTransaction | None, "needsRefit": bool}.
+        Giao dịch đã chấm (cùng `key`, mặc định transaction_key) trả lại kết quả lần đầu, không cập nhật trạng thái;
+        giao dịch đã nằm trong lịch sử fit được chấm theo thống kê hiện có mà không cộng thêm lần nữa.
+        `digest`: row_digest của giao dịch thô, để lịch sử client có thêm giao dịch này vẫn khớp model.
+        """
+        key = key or self.transaction_key(transaction)
+        amount = float(abs(transaction.money))
+        type_name = self._get_vietnamese_type_name(transaction.type_name)
+        dt = transaction.date_time
+        day = dt.date()
+
+        # Toàn bộ lần chấm nằm trong 1 lần giữ lock để refit nền không thay model giữa chừng
+        model = self._acquire_model(user_id)
+        if model is None:
+            return None
+        try:
+            if (history_fingerprint is not None and model.fingerprint is not None
+                    and history_fingerprint not in model.accepted_fingerprints):
+                self.model_cache.invalidate(user_id, model)
+                return None
+
+            if key in model.scored:
+                return {"anomaly": model.scored[key], "needsRefit": False}
+
+            is_new = key not in model.seen_keys
+            if is_new:
+                type_mean, type_std, global_mean, global_std = model.record(type_name, amount, day)
+            else:
+                type_mean, type_std = model.peek_type_stats(type_name)
+                global_mean, global_std = model.peek_global_stats()
+
+            row = {
+                'amount': amount,
+                'type_name': type_name,
+                'hour': dt.hour,
+                'rolling_mean_7d': float(np.mean(model.recent_amounts)) if model.recent_amounts else amount,
+                'amount_zscore': (amount - type_mean) / type_std if type_std > 0 else 0.0,
+                'global_zscore': (amount - global_mean) / global_std if global_std > 0 else 0.0,
+                'is_unusual_hour': 1 if dt.hour < 6 or dt.hour > 23 else 0,
+                'daily_count': model.daily_counts.get(day, 1)
+            }
+
+            # Lúc fit, daily_count là số giao dịch của CẢ ngày; giao dịch mới chỉ thấy một phần ngày
+            # nên lấy tối thiểu bằng trung vị để ngày chưa kết thúc không bị coi là "ít bất thường"
+            feature_row = {**row, 'daily_count': max(row['daily_count'], model.thresholds['daily_count_median'])}
+            features = np.array([np.log1p(amount)] + [feature_row[c] for c in self.FEATURE_COLUMNS[1:]], dtype=float)
+            features = np.nan_to_num(features, nan=0.0, posinf=0.0, neginf=0.0)
+            decision = model.forest.decision_function((features - model.scaler_mean) / model.scaler_scale)
+
+            score_range = model.score_max - model.score_min
+            normalized = float(np.clip((-decision - model.score_min) / score_range, 0.0, 1.0)) if score_range > 0 else 0.5
+            is_anomaly = decision < 0
+            if dt.day <= 5 and type_name in self.WHITELIST_TYPES:
+                is_anomaly, normalized = False, 0.1
+
+            # Trùng lặp chỉ xét với giao dịch KHÁC đã thấy (giao dịch trong lịch sử fit do detect_anomalies xử lý)
+            prev_time = model.last_seen.get((type_name, amount)) if is_new else None
+            is_duplicate = (
+                amount > 0 and prev_time is not None
+                and 0 <= (dt - prev_time).total_seconds() < self.duplicate_window_seconds
+            )
+
+            needs_refit = False
+            if is_new:
+                model.remember(type_name, amount, dt)
+                model.seen_keys.add(key)
+                if digest is not None and model.fingerprint is not None:
+                    model.fingerprint = extend_fingerprint(model.fingerprint, digest)
+                    model.accepted_fingerprints.add(model.fingerprint)
+                model.history.append(transaction)
+                model.new_since_fit += 1
+                needs_refit = model.new_since_fit >= self.refit_min_new and not model.refitting
+                if needs_refit:
+                    model.refitting = True
+
+            anomaly = None
+            if is_duplicate:
+                anomaly = AnomalyTransaction(
+                    transaction_id=transaction.id, money=int(transaction.money), type_name=type_name,
+                    date_time=dt.strftime('%Y-%m-%d %H:%M'), anomaly_score=1.0,
+                    anomaly_reason=f"Nghi vấn trùng lặp: Giống hệt giao dịch lúc {prev_time.strftime('%H:%M')}",
+                    severity='high'
+                )
+            elif is_anomaly:
+                anomaly = AnomalyTransaction(
+                    transaction_id=transaction.id, money=int(transaction.money), type_name=type_name,
+                    date_time=dt.strftime('%Y-%m-%d %H:%M'), anomaly_score=round(normalized, 3),
+                    anomaly_reason=self._determine_anomaly_reason(row, model.thresholds),
+                    severity=self._determine_severity(normalized, row['amount_zscore'])
+                )
+            model.scored[key] = anomaly
+            return {"anomaly": anomaly, "needsRefit": needs_refit}
+        finally:
+            model.lock.release()
+
     def _build_statistics(self, df: pd.DataFrame, anomaly_df: pd.DataFrame) -> Dict[str, Any]:
         total_amount = df['amount'].sum()
         anomaly_amount = anomaly_df['amount'].sum() if not anomaly_df.empty else 0
@@ -0,0 +1,92 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+
+@dataclass
+class UserCentroids:
+    """Tâm cụm lần fit trước của một user (trong không gian đặc trưng GỐC, chưa chuẩn hóa)."""
+    centers: np.ndarray
+    feature_columns: Tuple[str, ...]
+    n_clusters: int
+    n_samples: int
+    feature_mean: np.ndarray
+    feature_std: np.ndarray
+    warm_starts: int = 0
+    fitted_at: float = field(default_factory=time.time)
+
+
+class KMeansCentroidCache:
+    """
+    Cache LRU tâm cụm K-Means theo user_id để lần phân cụm sau warm-start (init = tâm cũ, n_init=1).
+    Fit lại từ đầu khi: đổi bộ đặc trưng / số cụm, lịch sử bị rút ngắn, phân phối đặc trưng trôi
+    quá ngưỡng, hoặc đã warm-start liên tiếp quá số lần cho phép.
+    """
+
+    def __init__(self, max_users: int = 1000, drift_threshold: float = 0.25, max_warm_starts: int = 20):
+        self.max_users = max_users
+        self.drift_threshold = drift_threshold
+        self.max_warm_starts = max_warm_starts
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, UserCentroids]" = OrderedDict()
+        self._stats = {
+            "warmStarts": 0, "coldFits": 0, "misses": 0,
+            "schemaRefits": 0, "driftRefits": 0, "periodicRefits": 0, "evictions": 0
+        }
+
+    def _drift(self, entry: UserCentroids, X: np.ndarray) -> float:
+        # Độ lệch trung bình từng đặc trưng, tính theo đơn vị độ lệch chuẩn lúc fit trước
+        # (chặn dưới std để cột nhị phân gần như hằng không bị coi là trôi chỉ vì vài giao dịch mới)
+        shift = np.abs(X.mean(axis=0) - entry.feature_mean) / np.maximum(entry.feature_std, 0.1)
+        return float(shift.max()) if shift.size else 0.0
+
+    def lookup(self, user_id: str, X: np.ndarray, feature_columns: Tuple[str, ...], n_clusters: int) -> Optional[np.ndarray]:
+        """Trả về tâm cụm cũ (không gian gốc) nếu được phép warm-start, ngược lại None."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(user_id)
+
+            if entry.feature_columns != tuple(feature_columns) or entry.n_clusters != n_clusters:
+                self._stats["schemaRefits"] += 1
+                return None
+            if len(X) < entry.n_samples or self._drift(entry, X) > self.drift_threshold:
+                self._stats["driftRefits"] += 1
+                return None
+            if entry.warm_starts >= self.max_warm_starts:
+                self._stats["periodicRefits"] += 1
+                return None
+            return entry.centers.copy()
+
+    def store(self, user_id: str, centers: np.ndarray, X: np.ndarray, feature_columns: Tuple[str, ...], warm: bool):
+        with self._lock:
+            previous = self._entries.get(user_id)
+            warm_starts = previous.warm_starts + 1 if warm and previous is not None else 0
+            self._entries[user_id] = UserCentroids(
+                centers=np.asarray(centers, dtype=float),
+                feature_columns=tuple(feature_columns),
+                n_clusters=len(centers),
+                n_samples=len(X),
+                feature_mean=X.mean(axis=0),
+                feature_std=X.std(axis=0),
+                warm_starts=warm_starts
+            )
+            self._entries.move_to_end(user_id)
+            self._stats["warmStarts" if warm else "coldFits"] += 1
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {**self._stats, "cachedUsers": len(self._entries), "maxUsers": self.max_users}
+        fits = stats["warmStarts"] + stats["coldFits"]
+        stats["warmStartRate"] = round(stats["warmStarts"] / fits, 4) if fits else 0.0
+        return stats
@@ -9,6 +9,10 @@ from datetime import datetime
 from app.schemas.spending import SpendingItem
 from app.schemas.response import ClusteringResponse, SpendingCluster
 from app.config import settings
+from app.services.category_resolver import ClusterCategoryResolver
+from app.services.kmeans_centroid_cache import KMeansCentroidCache
+from app.services.transaction_frame import build_transaction_frame
+from app.services.metrics import observe_input, stage
 
 class KMeansService:
 
@@ -132,68 +136,76 @@ class KMeansService:
         }
     }
 
+    FEATURE_COLUMNS = ['log_amount', 'is_weekend', 'is_essential', 'is_entertainment', 'is_investment']
+
+    # Cột cờ nhóm -> khóa trong CATEGORY_GROUPS
+    GROUP_FLAG_COLUMNS = {
+        'is_essential': 'essential',
+        'is_entertainment': 'entertainment',
+        'is_investment': 'investment'
+    }
+
     def __init__(self):
-        self.scaler = StandardScaler()
+        self.category_resolver = ClusterCategoryResolver(self.CATEGORY_TRANSLATIONS)
+        self.warm_start = settings.KMEANS_WARM_START
+        self.centroid_cache = KMeansCentroidCache(
+            max_users=settings.KMEANS_CACHE_MAX_USERS,
+            drift_threshold=settings.KMEANS_DRIFT_THRESHOLD,
+            max_warm_starts=settings.KMEANS_MAX_WARM_STARTS
+        )
+        # Dựng sẵn tập tra cứu 1 lần: key dạng chữ khớp original_key, key dạng số khớp type
+        self.group_lookup = {
+            group: (
+                frozenset(k for k in keys if isinstance(k, str)),
+                frozenset(k for k in keys if not isinstance(k, str))
+            )
+            for group, keys in self.CATEGORY_GROUPS.items()
+        }
 
     def _resolve_category_name(self, type_id: int, type_name: Optional[str]) -> str:
-        raw_name = str(type_name).strip() if type_name else ""
-        
-        if raw_name in self.CATEGORY_TRANSLATIONS: 
-            return self.CATEGORY_TRANSLATIONS[raw_name]
-        
-        if type_id in self.CATEGORY_TRANSLATIONS: 
-            return self.CATEGORY_TRANSLATIONS[type_id]
-        
-        if raw_name: 
-            return raw_name.replace("_", " ").title()
-        
-        return "Danh mục Khác"
-
-    def _extract_features(self, transactions: List[SpendingItem]) -> pd.DataFrame:
-        data = []
-        for t in transactions:
-            if t.money >= 0 or t.money == 0: continue 
-            if not t.date_time: continue
-            
-            display_name = self._resolve_category_name(t.type, t.type_name)
-            
-            original_key = t.type_name if t.type_name else self.ID_TO_KEY_MAPPING.get(t.type, "other")
-
-            dt = t.date_time
-            day_of_month = dt.day
-
-            is_start_month = 1 if day_of_month <= 5 else 0
-            is_end_month = 1 if day_of_month >= 25 else 0
-
-            data.append({
-                'id': t.id, 
-                'amount': abs(t.money), 
-                'type': t.type,
-                'type_name': display_name, 
-                'original_key': original_key,
-                'date': dt.date(), 
-                'hour': dt.hour,
-                'day_of_month': day_of_month,
-                'weekday': dt.weekday(),
-                'is_start_month': is_start_month,
-                'is_end_month': is_end_month
-            })
-
-        if not data: return pd.DataFrame()
-        
-        df = pd.DataFrame(data)
+        return self.category_resolver.resolve((type_id, type_name))
+
+    def _extract_features(self, transactions: Optional[List[SpendingItem]], frame: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        if frame is None:
+            frame = build_transaction_frame(transactions)
+
+        # Chỉ phân cụm các khoản chi
+        expenses = frame[(frame['money'] < 0) & frame['date_time'].notna()]
+        if expenses.empty: return pd.DataFrame()
+
+        dt = expenses['date_time'].dt
+        type_name = expenses['type_name']
+        day_of_month = dt.day.astype(int)
+        # Thiếu typeName thì suy ra key gốc từ mã type
+        has_name = type_name.fillna('').astype(bool)
+        original_key = type_name.where(has_name, expenses['type'].map(self.ID_TO_KEY_MAPPING).fillna('other'))
+
+        df = pd.DataFrame({
+            'id': expenses['id'],
+            'amount': expenses['money'].abs(),
+            'type': expenses['type'],
+            'type_name': type_name,
+            'original_key': original_key,
+            'date': dt.date,
+            'hour': dt.hour.astype(int),
+            'day_of_month': day_of_month,
+            'weekday': dt.weekday.astype(int),
+            'is_start_month': (day_of_month <= 5).astype(int),
+            'is_end_month': (day_of_month >= 25).astype(int)
+        }).reset_index(drop=True)
+        # Tên hiển thị phân giải theo cặp (type, type_name) duy nhất thay vì từng dòng
+        df['type_name'] = self.category_resolver.resolve_column(df['type'], df['type_name'])
         
         df['is_weekend'] = df['weekday'].isin([5, 6]).astype(int)
         
-        def check_group(row, group_key):
-            group_list = self.CATEGORY_GROUPS.get(group_key, [])
-            cond1 = row['original_key'] in group_list
-            cond2 = row['type'] in group_list
-            return 1 if (cond1 or cond2) else 0
-
-        df['is_essential'] = df.apply(lambda x: check_group(x, 'essential'), axis=1)
-        df['is_entertainment'] = df.apply(lambda x: check_group(x, 'entertainment'), axis=1)
-        df['is_investment'] = df.apply(lambda x: check_group(x, 'investment'), axis=1)
+        # Mỗi cột chỉ có vài giá trị khác nhau: tra nhóm trên giá trị duy nhất rồi ánh xạ lại theo mã
+        key_codes, key_uniques = pd.factorize(df['original_key'])
+        type_codes, type_uniques = pd.factorize(df['type'])
+        for column, group_key in self.GROUP_FLAG_COLUMNS.items():
+            name_keys, id_keys = self.group_lookup.get(group_key, (frozenset(), frozenset()))
+            key_in_group = np.array([k in name_keys for k in key_uniques] + [False])
+            type_in_group = np.array([t in id_keys for t in type_uniques] + [False])
+            df[column] = (key_in_group[key_codes] | type_in_group[type_codes]).astype(int)
         
         df['log_amount'] = np.log1p(df['amount'])
         
@@ -254,8 +266,16 @@ class KMeansService:
             percentage=round(len(merged_df) / len(full_df) * 100, 1)
         )
 
-    def cluster_spending(self, user_id: str, transactions: List[SpendingItem], n_clusters: int = None) -> ClusteringResponse:
-        df = self._extract_features(transactions)
+    def cluster_spending(
+        self,
+        user_id: str,
+        transactions: Optional[List[SpendingItem]],
+        n_clusters: int = None,
+        frame: Optional[pd.DataFrame] = None
+    ) -> ClusteringResponse:
+        observe_input("kmeans", len(frame) if frame is not None else len(transactions or []))
+        with stage("kmeans", "featurize"):
+            df = self._extract_features(transactions, frame)
         
         if df.empty or len(df) < 5:
             return ClusteringResponse(
@@ -266,12 +286,12 @@ class KMeansService:
 
         n_clusters_calc = max(3, min(6, len(df) // 5))
         
-        X_features = df[['log_amount', 'is_weekend', 'is_essential', 'is_entertainment', 'is_investment']].values
-        X = self.scaler.fit_transform(X_features)
-        
-        kmeans = KMeans(n_clusters=n_clusters_calc, random_state=42, n_init=10)
-        df['temp_cluster_id'] = kmeans.fit_predict(X)
+        df['temp_cluster_id'] = self._fit_clusters(user_id, df, n_clusters_calc)
+
+        with stage("kmeans", "response_build"):
+            return self._build_clustering_response(user_id, df, n_clusters_calc)
 
+    def _build_clustering_response(self, user_id: str, df: pd.DataFrame, n_clusters_calc: int) -> ClusteringResponse:
         merged_groups = {}
         for cid in range(n_clusters_calc):
             segment = df[df['temp_cluster_id'] == cid]
@@ -295,6 +315,36 @@ class KMeansService:
             message="Phân tích thành công"
         )
 
+    def _fit_clusters(self, user_id: str, df: pd.DataFrame, n_clusters: int) -> np.ndarray:
+        """
+        Gán nhãn cụm cho từng giao dịch. Nếu user đã có tâm cụm lần trước (client gửi lại gần như
+        toàn bộ lịch sử) thì warm-start từ tâm cũ với n_init=1 thay vì 10 lần khởi tạo ngẫu nhiên.
+        """
+        X_features = df[self.FEATURE_COLUMNS].values.astype(float)
+        # Scaler tạo mới mỗi request: service là singleton dùng chung giữa các thread
+        scaler = StandardScaler()
+        with stage("kmeans", "scaler_fit"):
+            X = scaler.fit_transform(X_features)
+
+        init_centers = None
+        if self.warm_start:
+            init_centers = self.centroid_cache.lookup(user_id, X_features, tuple(self.FEATURE_COLUMNS), n_clusters)
+
+        if init_centers is not None:
+            # Tâm cũ lưu ở không gian gốc -> chuẩn hóa theo scaler của lần này
+            kmeans = KMeans(n_clusters=n_clusters, init=scaler.transform(init_centers), n_init=1, random_state=42)
+        else:
+            kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
+        with stage("kmeans", "model_fit"):
+            labels = kmeans.fit_predict(X)
+
+        if self.warm_start:
+            self.centroid_cache.store(
+                user_id, scaler.inverse_transform(kmeans.cluster_centers_), X_features,
+                tuple(self.FEATURE_COLUMNS), warm=init_centers is not None
+            )
+        return labels
+
     def _determine_spending_style(self, df: pd.DataFrame) -> str:
         total_tx = len(df)
         avg_amt = df['amount'].mean()
@@ -1,9 +1,16 @@
+import importlib.util
+import os
+import threading
+
 import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Tuple, Optional
 from sklearn.preprocessing import MinMaxScaler
 
+from app.services.forecast_engines import ForecastEngine, LSTMEngine, create_engine, holt_forecast
+from app.services.metrics import FORECAST_ENGINE_USED, observe_input, stage
+
 # ==============================================================================
 # 1. CẤU HÌNH IMPORT & MÔI TRƯỜNG
 # ==============================================================================
@@ -11,7 +18,11 @@ try:
     from app.schemas.spending import SpendingItem
     from app.schemas.response import TrendPredictionResponse, PredictedValue
     from app.config import settings
+    from app.services.model_registry import LSTMModelRegistry
     SEQ_LENGTH = getattr(settings, 'LSTM_SEQUENCE_LENGTH', 14)
+    INFERENCE_MODE = getattr(settings, 'LSTM_INFERENCE_MODE', 'graph')
+    MULTIVARIATE = getattr(settings, 'LSTM_MULTIVARIATE', False)
+    DEFAULT_ENGINE = getattr(settings, 'FORECAST_ENGINE', 'lstm')
 except ImportError:
     # Fallback dự phòng
     class SpendingItem:
@@ -25,19 +36,44 @@ except ImportError:
         def __init__(self, **kwargs):
             self.__dict__ = kwargs
     SEQ_LENGTH = 14
-
-# Cấu hình TensorFlow
-try:
-    import tensorflow as tf
-    from tensorflow.keras.models import Sequential
-    from tensorflow.keras.layers import LSTM, Dense, Dropout, Input
-    from tensorflow.keras.callbacks import EarlyStopping
-    from tensorflow.keras.optimizers import Adam
-    import os
-    os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
-    TF_AVAILABLE = True
-except ImportError:
-    TF_AVAILABLE = False
+    INFERENCE_MODE = 'graph'
+    MULTIVARIATE = False
+    DEFAULT_ENGINE = 'lstm'
+    settings = None
+    LSTMModelRegistry = None
+
+# Cấu hình TensorFlow: chỉ import khi có series đủ điều kiện dùng LSTM (xem load_tensorflow).
+# Import TF mất vài giây và vài trăm MB RSS, trong khi đa số request chỉ cần dự báo thống kê.
+TF_AVAILABLE = importlib.util.find_spec("tensorflow") is not None
+tf = Sequential = LSTM = Dense = Dropout = Input = EarlyStopping = Adam = None
+_TF_LOCK = threading.Lock()
+
+
+def load_tensorflow() -> bool:
+    """Import TensorFlow/Keras lần đầu cần dùng (an toàn giữa các thread). False nếu không import được."""
+    global TF_AVAILABLE, tf, Sequential, LSTM, Dense, Dropout, Input, EarlyStopping, Adam
+    if tf is not None:
+        return True
+    if not TF_AVAILABLE:
+        return False
+
+    with _TF_LOCK:
+        if tf is None:
+            os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+            try:
+                import tensorflow as _tf
+                from tensorflow.keras.models import Sequential as _Sequential
+                from tensorflow.keras.layers import LSTM as _LSTM, Dense as _Dense, Dropout as _Dropout, Input as _Input
+                from tensorflow.keras.callbacks import EarlyStopping as _EarlyStopping
+                from tensorflow.keras.optimizers import Adam as _Adam
+            except ImportError:
+                TF_AVAILABLE = False
+                return False
+            Sequential, LSTM, Dense, Dropout, Input = _Sequential, _LSTM, _Dense, _Dropout, _Input
+            EarlyStopping, Adam = _EarlyStopping, _Adam
+            # Gán tf sau cùng: thread khác thấy tf khác None thì các tên còn lại đã sẵn sàng
+            tf = _tf
+    return True
 
 # ==============================================================================
 # 2. CLASS LOGIC CHÍNH: LSTMService
@@ -47,8 +83,18 @@ class LSTMService:
     def __init__(self):
         self.sequence_length = SEQ_LENGTH
         self.min_samples_for_dl = 40 
-        self.income_scaler = MinMaxScaler(feature_range=(0, 1))
-        self.expense_scaler = MinMaxScaler(feature_range=(0, 1))
+        self.inference_mode = INFERENCE_MODE
+        self.multivariate = MULTIVARIATE
+        self.default_engine = DEFAULT_ENGINE
+        self._engines: Dict[str, ForecastEngine] = {}
+        self.registry = None
+        if settings is not None and LSTMModelRegistry is not None and settings.LSTM_REGISTRY_ENABLED:
+            self.registry = LSTMModelRegistry(
+                root_dir=settings.LSTM_MODEL_DIR,
+                min_new_days=settings.LSTM_RETRAIN_MIN_NEW_DAYS,
+                drift_threshold=settings.LSTM_RETRAIN_DRIFT_THRESHOLD,
+                max_loaded=settings.LSTM_REGISTRY_MAX_LOADED
+            )
 
     # --------------------------------------------------------------------------
     # BƯỚC 1: CHUẨN BỊ DỮ LIỆU
@@ -77,7 +123,22 @@ class LSTMService:
             except Exception:
                 continue
 
-        df = pd.DataFrame(data)
+        return self._aggregate_daily(pd.DataFrame(data))
+
+    def _prepare_daily_data_from_frame(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """Như _prepare_daily_data nhưng đọc từ frame giao dịch chung (transaction_frame) theo cột."""
+        if frame.empty:
+            return pd.DataFrame()
+
+        money = frame['money'].astype(float)
+        df = pd.DataFrame({
+            'date': frame['date_time'].dt.normalize(),
+            'amount': money.abs(),
+            'is_income': money > 0
+        })
+        return self._aggregate_daily(df)
+
+    def _aggregate_daily(self, df: pd.DataFrame) -> pd.DataFrame:
         if df.empty: return pd.DataFrame()
 
         daily = df.groupby(['date', 'is_income'])['amount'].sum().unstack(fill_value=0.0).reset_index()
@@ -99,71 +160,207 @@ class LSTMService:
     # BƯỚC 2: CÁC ENGINE DỰ BÁO
     # --------------------------------------------------------------------------
     
-    def _predict_lstm(self, values: np.ndarray, scaler, days: int) -> Tuple[List[float], float]:
-        try:
-            scaled_data = scaler.fit_transform(values.reshape(-1, 1))
-            X, y = [], []
-            for i in range(len(scaled_data) - self.sequence_length):
-                X.append(scaled_data[i:(i + self.sequence_length)])
-                y.append(scaled_data[i + self.sequence_length])
-            X, y = np.array(X), np.array(y)
-            
-            if len(X) < 5: return [], 0.0
-
-            model = Sequential([
-                Input(shape=(self.sequence_length, 1)),
-                LSTM(64, return_sequences=False),
-                Dense(32, activation='relu'),
-                Dense(1)
-            ])
+    def _build_model(self, compile_model: bool = True, channels: int = 1):
+        # channels = 1: một series; channels = 2: thu nhập + chi tiêu dự báo chung một model
+        if not load_tensorflow():
+            raise RuntimeError("TensorFlow is not available")
+        model = Sequential([
+            Input(shape=(self.sequence_length, channels)),
+            LSTM(64, return_sequences=False),
+            Dense(32, activation='relu'),
+            Dense(channels)
+        ])
+        # Model nạp lại từ registry chỉ để suy luận -> không cần optimizer
+        if compile_model:
             model.compile(optimizer=Adam(learning_rate=0.001), loss='huber')
-            early_stop = EarlyStopping(monitor='loss', patience=3, restore_best_weights=True)
-            model.fit(X, y, epochs=30, batch_size=16, verbose=0, callbacks=[early_stop])
-
-            predictions = []
-            curr_seq = scaled_data[-self.sequence_length:].reshape(1, self.sequence_length, 1)
-            for _ in range(days):
-                pred = model.predict(curr_seq, verbose=0)[0, 0]
-                predictions.append(pred)
-                curr_seq = np.roll(curr_seq, -1, axis=1)
-                curr_seq[0, -1, 0] = pred
-
-            pred_inv = scaler.inverse_transform(np.array(predictions).reshape(-1, 1)).flatten()
-            return [max(0.0, float(p)) for p in pred_inv], 0.8
+        return model
+
+    def _model_signature(self, channels: int = 1) -> Dict[str, Any]:
+        return {"sequence_length": self.sequence_length, "channels": channels}
+
+    def _train_lstm(self, scaled_data: np.ndarray):
+        X, y = [], []
+        for i in range(len(scaled_data) - self.sequence_length):
+            X.append(scaled_data[i:(i + self.sequence_length)])
+            y.append(scaled_data[i + self.sequence_length])
+        X, y = np.array(X), np.array(y)
+
+        if len(X) < 5: return None
+
+        model = self._build_model(channels=scaled_data.shape[1])
+        early_stop = EarlyStopping(monitor='loss', patience=3, restore_best_weights=True)
+        model.fit(X, y, epochs=30, batch_size=16, verbose=0, callbacks=[early_stop])
+        return model
+
+    def _get_or_train_lstm(self, values: np.ndarray, user_id: Optional[str], series: Optional[str]):
+        """values có shape (n_days, channels)."""
+        channels = values.shape[1]
+        # Scaler riêng cho từng request -> không chia sẻ trạng thái giữa các thread
+        scaler = MinMaxScaler(feature_range=(0, 1))
+
+        # Không có registry / không biết user -> train mới như cũ
+        if self.registry is None or not user_id or not series:
+            with stage("lstm", "scaler_fit"):
+                scaled_data = scaler.fit_transform(values)
+            with stage("lstm", "model_fit"):
+                return self._train_lstm(scaled_data), scaler
+
+        signature = self._model_signature(channels)
+        with self.registry.lock_for(user_id, series):
+            cached = self.registry.get(
+                user_id, series, values, signature,
+                lambda: self._build_model(compile_model=False, channels=channels)
+            )
+            if cached is not None:
+                return cached
+
+            with stage("lstm", "scaler_fit"):
+                scaled_data = scaler.fit_transform(values)
+            with stage("lstm", "model_fit"):
+                model = self._train_lstm(scaled_data)
+            if model is not None:
+                self.registry.put(user_id, series, model, scaler, values, signature)
+            return model, scaler
+
+    # --------------------------------------------------------------------------
+    # SUY LUẬN NHIỀU BƯỚC (TỰ HỒI QUY)
+    # --------------------------------------------------------------------------
+    def _forecast_autoregressive(self, model, seed_seq: np.ndarray, days: int) -> np.ndarray:
+        """
+        Dự báo `days` bước, mỗi bước đưa kết quả vừa dự báo vào cuối chuỗi đầu vào.
+        seed_seq có shape (1, sequence_length, channels); trả về mảng (days, channels).
+        """
+        mode = self.inference_mode
+
+        if mode == "graph":
+            forecast_fn = self._get_graph_forecaster(model)
+            return forecast_fn(tf.constant(seed_seq, dtype=tf.float32), tf.constant(days, dtype=tf.int32)).numpy()
+
+        predictions = []
+        curr_seq = seed_seq.astype(np.float32)
+        for _ in range(days):
+            if mode == "call":
+                pred = model(curr_seq, training=False).numpy()[0]
+            else:
+                pred = model.predict(curr_seq, verbose=0)[0]
+            predictions.append(pred)
+            curr_seq = np.roll(curr_seq, -1, axis=1)
+            curr_seq[0, -1, :] = pred
+        return np.array(predictions).reshape(days, -1)
+
+    @staticmethod
+    def _get_graph_forecaster(model):
+        # Mỗi model giữ một tf.function riêng, trace 1 lần rồi tái sử dụng cho mọi request
+        forecast_fn = getattr(model, "_lux_forecast_fn", None)
+        if forecast_fn is not None:
+            return forecast_fn
+
+        @tf.function(reduce_retracing=True)
+        def forecast_fn(seq, days):
+            outputs = tf.TensorArray(tf.float32, size=days)
+            for i in tf.range(days):
+                pred = model(seq, training=False)
+                outputs = outputs.write(i, pred[0])
+                seq = tf.concat([seq[:, 1:, :], tf.expand_dims(pred, axis=1)], axis=1)
+            return outputs.stack()
+
+        model._lux_forecast_fn = forecast_fn
+        return forecast_fn
+
+    def _forecast_lstm_matrix(
+        self,
+        values: np.ndarray,
+        days: int,
+        user_id: Optional[str],
+        series: Optional[str]
+    ) -> Optional[np.ndarray]:
+        """Train/nạp model cho ma trận (n_days, channels) và trả về dự báo (days, channels) đã đảo scale."""
+        model, scaler = self._get_or_train_lstm(values, user_id, series)
+        if model is None: return None
+
+        channels = values.shape[1]
+        scaled_data = scaler.transform(values)
+
+        curr_seq = scaled_data[-self.sequence_length:].reshape(1, self.sequence_length, channels)
+        with stage("lstm", "inference"):
+            predictions = self._forecast_autoregressive(model, curr_seq, days)
+
+        return np.maximum(scaler.inverse_transform(predictions.reshape(days, channels)), 0.0)
+
+    def _predict_lstm(
+        self,
+        values: np.ndarray,
+        days: int,
+        user_id: Optional[str] = None,
+        series: Optional[str] = None
+    ) -> Tuple[List[float], float]:
+        try:
+            forecast = self._forecast_lstm_matrix(values.reshape(-1, 1), days, user_id, series)
+            if forecast is None: return [], 0.0
+            return [float(p) for p in forecast[:, 0]], 0.8
         except Exception:
             return [], 0.0
 
+    def _predict_lstm_joint(
+        self,
+        inc_vals: np.ndarray,
+        exp_vals: np.ndarray,
+        days: int,
+        user_id: Optional[str] = None
+    ) -> Tuple[List[float], List[float], float]:
+        """Một LSTM 2 kênh dự báo đồng thời thu nhập và chi tiêu: 1 lần build + 1 lần fit thay vì 2."""
+        try:
+            values = np.column_stack([inc_vals, exp_vals]).astype(float)
+            forecast = self._forecast_lstm_matrix(values, days, user_id, "joint")
+            if forecast is None: return [], [], 0.0
+            return [float(p) for p in forecast[:, 0]], [float(p) for p in forecast[:, 1]], 0.8
+        except Exception:
+            return [], [], 0.0
+
     def _predict_statistical(self, values: np.ndarray, days: int) -> Tuple[List[float], float]:
-        n = len(values)
-        if n < 1: return [0.0] * days, 0.0
-        
-        alpha, beta = 0.3, 0.1
-        level = values[0]
-        trend = values[1] - values[0] if n > 1 else 0
-        
-        for i in range(1, n):
-            prev_level = level
-            level = alpha * values[i] + (1 - alpha) * (prev_level + trend)
-            trend = beta * (level - prev_level) + (1 - beta) * trend
-            
-        preds = []
-        damped_trend = trend * 0.8
-        for h in range(1, days + 1):
-            val = level + h * damped_trend
-            preds.append(max(0.0, float(val)))
+        return holt_forecast(values, days)
 
-        total_hist = np.sum(values)
-        if sum(preds) < 1000 and total_hist > 0:
-            daily_avg = total_hist / max(1, n)
-            return [float(daily_avg)] * days, 0.4 
+    def _qualifies_for_dl(self, values: np.ndarray) -> bool:
+        # Kiểm tra dữ liệu trước, chỉ import TensorFlow khi series thực sự dùng LSTM
+        return (
+            TF_AVAILABLE and len(values) >= self.min_samples_for_dl and np.std(values) > 5000
+            and load_tensorflow()
+        )
 
-        return preds, 0.5
+    def get_engine(self, name: Optional[str] = None) -> ForecastEngine:
+        name = name or self.default_engine
+        if name not in self._engines:
+            self._engines[name] = create_engine(name, self)
+        return self._engines[name]
 
-    def _execute_prediction_strategy(self, values: np.ndarray, scaler, days: int) -> Tuple[List[float], float]:
-        if TF_AVAILABLE and len(values) >= self.min_samples_for_dl and np.std(values) > 5000:
-            p, c = self._predict_lstm(values, scaler, days)
-            if p: return p, c
-        return self._predict_statistical(values, days)
+    def forecast_batch(
+        self,
+        values: np.ndarray,
+        lengths: np.ndarray,
+        days: int,
+        engine: str = "holt"
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Dự báo nhiều series (số series x số ngày, đệm bên phải) cho job batch; xem ForecastEngine.forecast_batch."""
+        return self.get_engine(engine).forecast_batch(values, lengths, days)
+
+    def _execute_prediction_strategy(
+        self,
+        values: np.ndarray,
+        days: int,
+        user_id: Optional[str] = None,
+        series: Optional[str] = None,
+        engine: Optional[str] = None
+    ) -> Tuple[List[float], float, str]:
+        """(dự báo, độ tin cậy, engine thực sự dùng); engine không dự báo được thì fallback Holt."""
+        forecast_engine = self.get_engine(engine)
+        with stage("lstm", "forecast"):
+            p, c = forecast_engine.forecast(values, days, user_id, series)
+            used = forecast_engine.name
+            if not p:
+                p, c = self._predict_statistical(values, days)
+                used = "holt"
+        FORECAST_ENGINE_USED.inc(requested=forecast_engine.name, used=used, series=series or "")
+        return p, c, used
 
     # --------------------------------------------------------------------------
     # BƯỚC 3: PHÂN TÍCH XU HƯỚNG (NÂNG CẤP LOGIC)
@@ -278,8 +475,22 @@ class LSTMService:
     # --------------------------------------------------------------------------
     # BƯỚC 4: MAIN FUNCTION
     # --------------------------------------------------------------------------
-    def predict_trend(self, user_id: str, transactions: List[Any], prediction_days: int = 7) -> TrendPredictionResponse:
-        daily_df = self._prepare_daily_data(transactions)
+    def predict_trend(
+        self,
+        user_id: str,
+        transactions: Optional[List[Any]],
+        prediction_days: int = 7,
+        frame: Optional[pd.DataFrame] = None,
+        engine: Optional[str] = None
+    ) -> TrendPredictionResponse:
+        """`engine`: tên engine dự báo (forecast_engines); None = settings.FORECAST_ENGINE."""
+        engine = engine or self.default_engine
+        observe_input("lstm", len(frame) if frame is not None else len(transactions or []))
+        with stage("lstm", "featurize"):
+            if frame is not None:
+                daily_df = self._prepare_daily_data_from_frame(frame)
+            else:
+                daily_df = self._prepare_daily_data(transactions)
         
         if daily_df.empty:
             return TrendPredictionResponse(
@@ -292,50 +503,76 @@ class LSTMService:
         last_date = daily_df['date'].iloc[-1]
 
         # Chạy dự báo (Forecast)
-        inc_preds, inc_conf = self._execute_prediction_strategy(inc_vals, self.income_scaler, prediction_days)
-        exp_preds, exp_conf = self._execute_prediction_strategy(exp_vals, self.expense_scaler, prediction_days)
-
-        predictions_obj = []
-        for i in range(prediction_days):
-            curr_date = last_date + timedelta(days=i+1)
-            p_inc = round(inc_preds[i])
-            p_exp = round(exp_preds[i])
+        inc_preds, exp_preds = [], []
+        if (
+            engine == LSTMEngine.name and self.multivariate
+            and self._qualifies_for_dl(inc_vals) and self._qualifies_for_dl(exp_vals)
+        ):
+            with stage("lstm", "forecast"):
+                inc_preds, exp_preds, joint_conf = self._predict_lstm_joint(inc_vals, exp_vals, prediction_days, user_id)
+            inc_conf = exp_conf = joint_conf
+            inc_engine = exp_engine = "lstm_joint"
+            if inc_preds and exp_preds:
+                FORECAST_ENGINE_USED.inc(2, requested=engine, used=inc_engine, series="joint")
+
+        # Fallback: dự báo riêng từng series
+        if not inc_preds or not exp_preds:
+            inc_preds, inc_conf, inc_engine = self._execute_prediction_strategy(
+                inc_vals, prediction_days, user_id, "income", engine
+            )
+            exp_preds, exp_conf, exp_engine = self._execute_prediction_strategy(
+                exp_vals, prediction_days, user_id, "expense", engine
+            )
+
+        with stage("lstm", "response_build"):
+            predictions_obj = []
+            for i in range(prediction_days):
+                curr_date = last_date + timedelta(days=i+1)
+                p_inc = round(inc_preds[i])
+                p_exp = round(exp_preds[i])
             
-            desc_parts = []
-            if p_inc > 0: desc_parts.append(f"Thu {p_inc:,.0f}")
-            if p_exp > 0: desc_parts.append(f"Chi {p_exp:,.0f}")
-            if not desc_parts: desc_parts.append("Ít biến động")
+                desc_parts = []
+                if p_inc > 0: desc_parts.append(f"Thu {p_inc:,.0f}")
+                if p_exp > 0: desc_parts.append(f"Chi {p_exp:,.0f}")
+                if not desc_parts: desc_parts.append("Ít biến động")
             
-            predictions_obj.append(PredictedValue(
-                date=curr_date.strftime('%Y-%m-%d'),
-                predicted_income=p_inc,
-                predicted_expense=p_exp,
-                confidence=round((inc_conf + exp_conf)/2, 2),
-                description=", ".join(desc_parts)
-            ))
-
-        total_inc = sum(inc_preds)
-        total_exp = sum(exp_preds)
-        balance = total_inc - total_exp
+                predictions_obj.append(PredictedValue(
+                    date=curr_date.strftime('%Y-%m-%d'),
+                    predicted_income=p_inc,
+                    predicted_expense=p_exp,
+                    confidence=round((inc_conf + exp_conf)/2, 2),
+                    description=", ".join(desc_parts)
+                ))
+
+            total_inc = sum(inc_preds)
+            total_exp = sum(exp_preds)
+            balance = total_inc - total_exp
         
-        summary = {
-            "predictionPeriod": f"{prediction_days} ngày tới",
-            "totalPredictedIncome": round(total_inc),
-            "totalPredictedExpense": round(total_exp),
-            "predictedBalance": round(balance),
-            "trend": {
-                # Gọi hàm phân tích mới với đầy đủ lịch sử
-                "incomeTrend": self._analyze_trend_text(inc_vals, inc_preds, is_income=True),
-                "expenseTrend": self._analyze_trend_text(exp_vals, exp_preds, is_income=False),
-                "recommendation": self._generate_smart_recommendation(total_inc, total_exp)
-            },
-            "modelConfidence": round((inc_conf + exp_conf)/2, 2)
-        }
-
-        return TrendPredictionResponse(
-            success=True, user_id=user_id, predictions=predictions_obj,
-            summary=summary, message="Dự báo thành công"
-        )
+            summary = {
+                "predictionPeriod": f"{prediction_days} ngày tới",
+                "totalPredictedIncome": round(total_inc),
+                "totalPredictedExpense": round(total_exp),
+                "predictedBalance": round(balance),
+                "trend": {
+                    # Gọi hàm phân tích mới với đầy đủ lịch sử
+                    "incomeTrend": self._analyze_trend_text(inc_vals, inc_preds, is_income=True),
+                    "expenseTrend": self._analyze_trend_text(exp_vals, exp_preds, is_income=False),
+                    "recommendation": self._generate_smart_recommendation(total_inc, total_exp)
+                },
+                "modelConfidence": round((inc_conf + exp_conf)/2, 2),
+                "forecastEngine": {"requested": engine, "income": inc_engine, "expense": exp_engine}
+            }
+
+            response = TrendPredictionResponse(
+                success=True, user_id=user_id, predictions=predictions_obj,
+                summary=summary, message="Dự báo thành công"
+            )
+        return response
+
+    def get_registry_stats(self) -> Dict[str, Any]:
+        if self.registry is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.registry.get_stats()}
 
 # Khởi tạo instance
-lstm_service = LSTMService()
\ No newline at end of file
+lstm_service = LSTMService()
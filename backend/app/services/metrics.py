@@ -0,0 +1,245 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.config import settings
+
+# Bucket mặc định (giây) cho độ trễ request / từng bước trong service
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Số giao dịch đầu vào của một lần gọi service
+SIZE_BUCKETS = (10, 50, 100, 500, 1_000, 5_000, 10_000, 50_000, 100_000, 500_000, 1_000_000)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+# ==============================================================================
+# 1. COUNTER / HISTOGRAM (theo nhãn, an toàn giữa các thread)
+# ==============================================================================
+class _Metric:
+    kind = ""
+
+    def __init__(self, registry: "MetricsRegistry", name: str, help_text: str, labelnames: Sequence[str]):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _merge(self, key: Tuple[str, ...], state: float):
+        self._values[key] = self._values.get(key, 0.0) + state
+
+    def _render(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in sorted(self._values.items())]
+
+
+class Histogram(_Metric):
+    """State mỗi bộ nhãn: [số quan sát theo từng bucket (không cộng dồn, bucket cuối = +Inf), tổng, số lượng]."""
+    kind = "histogram"
+
+    def __init__(self, registry, name, help_text, labelnames, buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(registry, name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _merge(self, key: Tuple[str, ...], state: list):
+        current = self._values.get(key)
+        if current is None:
+            self._values[key] = [list(state[0]), state[1], state[2]]
+            return
+        current[0] = [a + b for a, b in zip(current[0], state[0])]
+        current[1] += state[1]
+        current[2] += state[2]
+
+    def _render(self) -> List[str]:
+        lines = []
+        for key, (counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + (math.inf,), counts):
+                cumulative += n
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+# ==============================================================================
+# 2. REGISTRY + XUẤT ĐỊNH DẠNG PROMETHEUS
+# ==============================================================================
+class MetricsRegistry:
+    """
+    Metrics trong bộ nhớ của process, xuất dạng text Prometheus (exposition 0.0.4).
+    Process con (LSTM trên process pool) gọi drain() sau mỗi job và trả kèm kết quả để process chính merge().
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._metrics: Dict[str, _Metric] = {}
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(self, name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(self, name, help_text, labelnames, buckets))
+
+    def _register(self, metric: _Metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            with metric._lock:
+                samples = metric._render()
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+    def drain(self) -> Dict[str, Dict[Tuple[str, ...], Any]]:
+        """Lấy toàn bộ giá trị đã ghi và xóa về 0 (dùng trong process con)."""
+        snapshot = {}
+        for name, metric in self._metrics.items():
+            with metric._lock:
+                if metric._values:
+                    snapshot[name], metric._values = metric._values, {}
+        return snapshot
+
+    def merge(self, snapshot: Optional[Dict[str, Dict[Tuple[str, ...], Any]]]):
+        for name, values in (snapshot or {}).items():
+            metric = self._metrics.get(name)
+            if metric is None:
+                continue
+            with metric._lock:
+                for key, state in values.items():
+                    metric._merge(key, state)
+
+
+metrics = MetricsRegistry(enabled=settings.METRICS_ENABLED)
+
+HTTP_REQUESTS = metrics.counter(
+    "http_requests_total", "HTTP requests by route template and status code", ("method", "route", "status")
+)
+HTTP_LATENCY = metrics.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route")
+)
+STAGE_LATENCY = metrics.histogram(
+    "ml_stage_duration_seconds",
+    "Time spent in each pipeline stage (featurize, scaler_fit, model_fit, inference, forecast, response_build)",
+    ("service", "stage")
+)
+INPUT_SIZE = metrics.histogram(
+    "ml_input_transactions", "Transactions per service call", ("service",), buckets=SIZE_BUCKETS
+)
+FORECAST_ENGINE_USED = metrics.counter(
+    "forecast_engine_series_total",
+    "Forecast series by requested engine and engine actually used (fallback to holt when the engine declines)",
+    ("requested", "used", "series")
+)
+
+
+def stage(service: str, name: str):
+    """`with stage("kmeans", "model_fit"): ...` - ghi thời gian một bước vào ml_stage_duration_seconds."""
+    return STAGE_LATENCY.time(service=service, stage=name)
+
+
+def observe_input(service: str, n_transactions: int):
+    INPUT_SIZE.observe(n_transactions, service=service)
+
+
+# ==============================================================================
+# 3. MIDDLEWARE ASGI: đếm request + độ trễ theo route template (không theo path thật để tránh bùng nhãn)
+# ==============================================================================
+def _route_template(scope) -> str:
+    """
+    Path template của route đã khớp ("/api/v1/sync/{user_id}/version"). Tùy phiên bản FastAPI, route của
+    router con có thể chỉ giữ path tương đối -> ghép lại các đoạn prefix từ path thật (tham số không chứa "/").
+    """
+    template = getattr(scope.get("route"), "path", None)
+    if not template:
+        return "unmatched"
+    actual = [part for part in scope.get("path", "").split("/") if part]
+    relative = [part for part in template.split("/") if part]
+    prefix = actual[:max(0, len(actual) - len(relative))]
+    return "/" + "/".join(prefix + relative)
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not metrics.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            path = _route_template(scope)
+            method = scope.get("method", "")
+            HTTP_LATENCY.observe(time.perf_counter() - start, method=method, route=path)
+            HTTP_REQUESTS.inc(method=method, route=path, status=str(status["code"]))
@@ -0,0 +1,286 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+from sklearn.preprocessing import MinMaxScaler
+
+try:
+    import fcntl
+except ImportError:  # Windows: chỉ khóa được giữa các thread trong cùng process
+    fcntl = None
+
+
+class LSTMModelRegistry:
+    """
+    Lưu model LSTM đã train theo (user, series) trên đĩa: trọng số Keras + trạng thái MinMaxScaler.
+    Chỉ train lại khi lịch sử theo ngày tăng thêm đủ số ngày hoặc phân phối bị trôi quá ngưỡng.
+    Nhiều process (process pool) dùng chung thư mục: mỗi (user, series) có file .lock (flock), trọng số
+    được ghi ra file riêng của từng lần train rồi mới "công bố" bằng cách thay meta (os.replace),
+    nên người đọc luôn thấy cặp trọng số + scaler khớp nhau.
+    """
+
+    META_VERSION = 3
+    # Số khóa thread cố định, (user, series) chia theo hash: bộ nhớ không tăng theo số user từng gặp
+    LOCK_STRIPES = 64
+
+    def __init__(
+        self,
+        root_dir: str,
+        min_new_days: int = 7,
+        drift_threshold: float = 0.25,
+        max_loaded: int = 64
+    ):
+        self.root_dir = root_dir
+        self.min_new_days = min_new_days
+        self.drift_threshold = drift_threshold
+        self.max_loaded = max_loaded
+
+        self._lock = threading.Lock()
+        self._key_locks = [threading.Lock() for _ in range(self.LOCK_STRIPES)]
+        # (user, series) -> (model, scaler, model_id của meta đã nạp)
+        self._loaded: "OrderedDict[Tuple[str, str], Tuple[Any, MinMaxScaler, str]]" = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "retrains": 0, "saves": 0, "loads": 0}
+
+    # --------------------------------------------------------------------------
+    # ĐƯỜNG DẪN & KHÓA
+    # --------------------------------------------------------------------------
+    def _user_dir(self, user_id: str) -> str:
+        # Hash user_id để tránh ký tự lạ / path traversal trong tên thư mục
+        return os.path.join(self.root_dir, hashlib.sha1(str(user_id).encode("utf-8")).hexdigest())
+
+    def _meta_path(self, user_id: str, series: str) -> str:
+        return os.path.join(self._user_dir(user_id), f"{series}.json")
+
+    def _weights_path(self, user_id: str, series: str, model_id: str) -> str:
+        # Keras yêu cầu đuôi .weights.h5
+        return os.path.join(self._user_dir(user_id), f"{series}.{model_id}.weights.h5")
+
+    @contextmanager
+    def lock_for(self, user_id: str, series: str) -> Iterator[None]:
+        """
+        Khóa riêng cho từng (user, series) để hai request không train trùng một model:
+        threading.Lock giữa các thread + flock trên file .lock giữa các process dùng chung thư mục.
+        Khóa thread lấy theo hash(key) % LOCK_STRIPES: hai key trùng ô chỉ phải chờ nhau, không được lồng
+        lock_for bên trong lock_for.
+        """
+        thread_lock = self._key_locks[hash((user_id, series)) % self.LOCK_STRIPES]
+        with thread_lock:
+            user_dir = self._user_dir(user_id)
+            os.makedirs(user_dir, exist_ok=True)
+            with open(os.path.join(user_dir, f"{series}.lock"), "a+b") as handle:
+                if fcntl is not None:
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+    def _bump(self, name: str, amount: int = 1):
+        with self._lock:
+            self._stats[name] += amount
+
+    # --------------------------------------------------------------------------
+    # KIỂM TRA ĐỘ MỚI CỦA MODEL
+    # --------------------------------------------------------------------------
+    @staticmethod
+    def _describe(values: np.ndarray) -> Dict[str, Any]:
+        # Thống kê theo từng kênh (1 kênh cho model đơn, 2 kênh cho model thu/chi chung)
+        matrix = np.asarray(values, dtype=float).reshape(len(values), -1)
+        if len(matrix) == 0:
+            zeros = [0.0] * matrix.shape[1]
+            return {"n_days": 0, "mean": zeros, "std": zeros, "max": zeros}
+        return {
+            "n_days": int(len(matrix)),
+            "mean": matrix.mean(axis=0).tolist(),
+            "std": matrix.std(axis=0).tolist(),
+            "max": matrix.max(axis=0).tolist()
+        }
+
+    def _is_stale(self, meta: Dict[str, Any], values: np.ndarray, signature: Dict[str, Any]) -> bool:
+        if meta.get("version") != self.META_VERSION or meta.get("signature") != signature:
+            return True
+
+        current = self._describe(values)
+        trained = meta["history"]
+
+        new_days = current["n_days"] - trained["n_days"]
+        if new_days < 0 or new_days >= self.min_new_days:
+            return True
+
+        def rel_change(new: float, old: float) -> float:
+            return abs(new - old) / (abs(old) + 1e-6)
+
+        for new, old in zip(current["mean"], trained["mean"]):
+            if rel_change(new, old) > self.drift_threshold:
+                return True
+        for new, old in zip(current["std"], trained["std"]):
+            if rel_change(new, old) > self.drift_threshold:
+                return True
+        # Giá trị mới vượt xa miền scaler đã học -> đầu vào model bị lệch thang đo
+        for new, old in zip(current["max"], trained["max"]):
+            if new > old * (1 + self.drift_threshold):
+                return True
+        return False
+
+    # --------------------------------------------------------------------------
+    # SCALER <-> JSON
+    # --------------------------------------------------------------------------
+    @staticmethod
+    def _scaler_to_dict(scaler: MinMaxScaler) -> Dict[str, Any]:
+        return {
+            "feature_range": list(scaler.feature_range),
+            "data_min": scaler.data_min_.tolist(),
+            "data_max": scaler.data_max_.tolist()
+        }
+
+    @staticmethod
+    def _scaler_from_dict(state: Dict[str, Any]) -> MinMaxScaler:
+        scaler = MinMaxScaler(feature_range=tuple(state["feature_range"]))
+        # Fit lại trên 2 điểm cực trị cho ra đúng min_/scale_ như lúc train
+        scaler.fit(np.array([state["data_min"], state["data_max"]], dtype=float))
+        return scaler
+
+    # --------------------------------------------------------------------------
+    # API CHÍNH
+    # --------------------------------------------------------------------------
+    def get(
+        self,
+        user_id: str,
+        series: str,
+        values: np.ndarray,
+        signature: Dict[str, Any],
+        build_model: Callable[[], Any]
+    ) -> Optional[Tuple[Any, MinMaxScaler]]:
+        """
+        Trả về (model, scaler) nếu có model còn dùng được, ngược lại None (cần train).
+        `signature` mô tả kiến trúc (sequence length, số kênh...) - khác đi thì coi như hết hạn.
+        Model đã nạp trong RAM chỉ được dùng lại khi meta trên đĩa vẫn trỏ tới đúng lần train đó
+        (process khác có thể vừa train và ghi model mới hơn).
+        """
+        meta_path = self._meta_path(user_id, series)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            self._bump("misses")
+            return None
+
+        key = (user_id, series)
+        if self._is_stale(meta, values, signature):
+            self._bump("retrains")
+            with self._lock:
+                self._loaded.pop(key, None)
+            return None
+
+        model_id = meta["model_id"]
+        with self._lock:
+            entry = self._loaded.get(key)
+            if entry is not None and entry[2] == model_id:
+                self._loaded.move_to_end(key)
+            else:
+                entry = None
+
+        if entry is None:
+            try:
+                model = build_model()
+                model.load_weights(self._weights_path(user_id, series, model_id))
+                scaler = self._scaler_from_dict(meta["scaler"])
+            except Exception:
+                self._bump("misses")
+                return None
+            entry = (model, scaler, model_id)
+            self._bump("loads")
+            self._remember(key, entry)
+
+        self._bump("hits")
+        return entry[0], entry[1]
+
+    def put(
+        self,
+        user_id: str,
+        series: str,
+        model: Any,
+        scaler: MinMaxScaler,
+        values: np.ndarray,
+        signature: Dict[str, Any]
+    ):
+        """Gọi trong lock_for(user_id, series). Trọng số + meta đều ghi ra file tạm rồi os.replace."""
+        meta_path = self._meta_path(user_id, series)
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+
+        model_id = uuid.uuid4().hex
+        meta = {
+            "version": self.META_VERSION,
+            "model_id": model_id,
+            "signature": signature,
+            "history": self._describe(values),
+            "scaler": self._scaler_to_dict(scaler),
+            "trained_at": time.time()
+        }
+
+        try:
+            previous_id = None
+            try:
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    previous_id = json.load(f).get("model_id")
+            except (OSError, ValueError):
+                pass
+
+            weights_path = self._weights_path(user_id, series, model_id)
+            tmp_weights = self._weights_path(user_id, series, f"{model_id}.tmp")
+            model.save_weights(tmp_weights)
+            os.replace(tmp_weights, weights_path)
+
+            tmp_meta = f"{meta_path}.{model_id}.tmp"
+            with open(tmp_meta, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            os.replace(tmp_meta, meta_path)
+
+            # Meta đã trỏ sang trọng số mới -> xóa trọng số cũ
+            if previous_id and previous_id != model_id:
+                try:
+                    os.remove(self._weights_path(user_id, series, previous_id))
+                except OSError:
+                    pass
+        except OSError as e:
+            print(f"[LSTM REGISTRY] Cannot persist model for {series}: {e}")
+            model_id = None
+
+        self._bump("saves")
+        # Ghi đĩa lỗi: vẫn giữ trong RAM nhưng lần get sau sẽ không khớp meta nào -> nạp/train lại
+        self._remember((user_id, series), (model, scaler, model_id))
+
+    def _remember(self, key: Tuple[str, str], entry: Tuple[Any, MinMaxScaler, Optional[str]]):
+        with self._lock:
+            self._loaded[key] = entry
+            self._loaded.move_to_end(key)
+            while len(self._loaded) > self.max_loaded:
+                self._loaded.popitem(last=False)
+
+    def snapshot_counters(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+    def merge_counters(self, delta: Dict[str, int]):
+        """Cộng dồn bộ đếm từ registry chạy ở process khác (process pool train LSTM)."""
+        with self._lock:
+            for name, amount in delta.items():
+                if name in self._stats:
+                    self._stats[name] += amount
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["loadedModels"] = len(self._loaded)
+        lookups = stats["hits"] + stats["misses"] + stats["retrains"]
+        stats["hitRate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["modelDir"] = self.root_dir
+        return stats
@@ -0,0 +1,157 @@
+import hashlib
+import json
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.schemas.spending import SpendingItem
+from app.services.transaction_frame import FRAME_COLUMNS, normalize_datetimes
+
+# Số dòng bị loại tối đa liệt kê chi tiết trong báo cáo (số đếm theo lý do thì luôn đầy đủ)
+MAX_REJECTED_SAMPLES = 20
+
+
+# ==============================================================================
+# ĐỌC GIAO DỊCH THÔ (dict tùy ý) CHO CÁC ENDPOINT /quick VÀ /check-single
+# ==============================================================================
+def _first_present(items: List[Any], alias: str, name: str) -> pd.Series:
+    # Giống `t.get(alias) or t.get(name)`: giá trị rỗng ở alias thì lấy theo tên field
+    return pd.Series([(t.get(alias) or t.get(name)) if isinstance(t, dict) else None for t in items], dtype=object)
+
+
+def _integer_column(items: List[Any], key: str) -> Tuple[np.ndarray, np.ndarray]:
+    """(giá trị, mask không hợp lệ). Thiếu key -> 0 như int(t.get(key, 0)); số thực cắt phần lẻ như int()."""
+    raw = pd.Series([t.get(key, 0) if isinstance(t, dict) else 0 for t in items], dtype=object)
+    numbers = pd.to_numeric(raw.where(raw.map(type) != bool, np.nan), errors='coerce').astype(float)
+    invalid = ~np.isfinite(numbers.to_numpy())
+    return np.trunc(numbers.fillna(0).to_numpy()).astype(np.int64), invalid
+
+
+def _parse_datetimes(raw: pd.Series) -> pd.Series:
+    """
+    Chuỗi ISO 8601 (gồm cả 'YYYY-MM-DD HH:MM:SS' và 'YYYY-MM-DD') -> datetime, không đọc được -> NaT.
+    Có offset múi giờ (kể cả lẫn lộn trong cùng request): giữ giờ địa phương, bỏ offset (normalize_datetimes).
+    """
+    strings = raw.where(raw.map(type) == str)
+    try:
+        return normalize_datetimes(pd.to_datetime(strings, format='ISO8601', errors='coerce'))
+    except (ValueError, TypeError):
+        parsed = [pd.to_datetime(s, format='ISO8601', errors='coerce') if isinstance(s, str) else pd.NaT for s in strings]
+        return normalize_datetimes(pd.Series(parsed, index=strings.index, dtype=object))
+
+
+def parse_raw_transactions(items: Any, default_id: str = "") -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Đọc list dict giao dịch thô thành frame (FRAME_COLUMNS) trong 1 lượt theo cột, thay cho vòng lặp
+    strptime + SpendingItem từng dòng. Dòng không hợp lệ bị loại nhưng được đếm trong báo cáo:
+        {"received", "accepted", "rejected", "rejectedReasons": {lý do: số dòng}, "rejectedSamples": [...]}
+    Mặc định giữ như cũ: thiếu id -> default_id, thiếu money/type -> 0, thiếu typeName -> "Other".
+    """
+    items = list(items or [])
+    n = len(items)
+    if not n:
+        return pd.DataFrame(columns=FRAME_COLUMNS), _report(0, {})
+
+    reasons = {
+        'not_object': np.fromiter((not isinstance(t, dict) for t in items), dtype=bool, count=n)
+    }
+
+    ids = pd.Series([t.get('id') if isinstance(t, dict) else None for t in items], dtype=object)
+    ids = ids.where(ids.notna(), default_id).astype(str)
+
+    money, reasons['invalid_money'] = _integer_column(items, 'money')
+    types, reasons['invalid_type'] = _integer_column(items, 'type')
+
+    type_names = _first_present(items, 'typeName', 'type_name')
+    type_names = type_names.where(type_names.notna() & type_names.astype(bool), 'Other').astype(str)
+
+    raw_dates = _first_present(items, 'dateTime', 'date_time')
+    date_time = _parse_datetimes(raw_dates)
+    missing_date = raw_dates.isna().to_numpy()
+    reasons['missing_datetime'] = missing_date
+    reasons['invalid_datetime'] = date_time.isna().to_numpy() & ~missing_date
+
+    # Mỗi dòng chỉ tính 1 lý do (lý do đầu tiên theo thứ tự trên)
+    rejected = np.zeros(n, dtype=bool)
+    counts, samples = {}, []
+    for reason, mask in reasons.items():
+        mask = mask & ~rejected
+        if mask.any():
+            counts[reason] = int(mask.sum())
+            samples.extend({"index": int(i), "reason": reason} for i in np.flatnonzero(mask)[:MAX_REJECTED_SAMPLES])
+        rejected |= mask
+
+    keep = ~rejected
+    frame = pd.DataFrame({
+        'id': ids.to_numpy(dtype=object)[keep],
+        'money': money[keep],
+        'type': types[keep],
+        'type_name': type_names.to_numpy(dtype=object)[keep],
+        'date_time': date_time[keep].reset_index(drop=True)
+    })
+    samples.sort(key=lambda s: s["index"])
+    return frame, _report(n, counts, samples[:MAX_REJECTED_SAMPLES])
+
+
+def _report(received: int, counts: Dict[str, int], samples: List[Dict[str, Any]] = ()) -> Dict[str, Any]:
+    rejected = sum(counts.values())
+    return {
+        "received": received,
+        "accepted": received - rejected,
+        "rejected": rejected,
+        "rejectedReasons": counts,
+        "rejectedSamples": list(samples)
+    }
+
+
+# ==============================================================================
+# DẤU VÂN TAY LỊCH SỬ THÔ (nhận biết client gửi lịch sử khác mà không cần parse)
+# ==============================================================================
+_FINGERPRINT_MOD = 2 ** 64
+
+
+def row_digest(item: Any) -> int:
+    """Hash 64 bit của 1 giao dịch thô (không phụ thuộc thứ tự key)."""
+    encoded = json.dumps(item, sort_keys=True, default=str, separators=(",", ":")).encode()
+    return int.from_bytes(hashlib.blake2b(encoded, digest_size=8).digest(), "big")
+
+
+def history_fingerprint(items: Any) -> Tuple[int, int]:
+    """
+    (số giao dịch, tổng hash từng giao dịch mod 2^64): không phụ thuộc thứ tự và cộng dồn được,
+    nên lịch sử cũ + giao dịch mới = extend_fingerprint(lịch sử cũ, giao dịch mới) mà không phải hash lại.
+    """
+    items = list(items or [])
+    return len(items), sum(map(row_digest, items)) % _FINGERPRINT_MOD
+
+
+def extend_fingerprint(fingerprint: Tuple[int, int], digest: int) -> Tuple[int, int]:
+    return fingerprint[0] + 1, (fingerprint[1] + digest) % _FINGERPRINT_MOD
+
+
+# ==============================================================================
+# CHUYỂN ĐỔI DÙNG CHUNG
+# ==============================================================================
+def quick_expense_frame(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Quy ước cũ của /detect/anomaly/quick và /detect/check-single: chỉ giữ khoản chi,
+    model học độ lớn chi tiêu (money = |money|), gộp mọi danh mục thành "Expense".
+    """
+    expenses = frame[frame['money'] < 0]
+    return pd.DataFrame({
+        'id': expenses['id'].to_numpy(dtype=object),
+        'money': expenses['money'].abs().to_numpy(),
+        'type': np.zeros(len(expenses), dtype=np.int64),
+        'type_name': np.full(len(expenses), 'Expense', dtype=object),
+        'date_time': expenses['date_time'].reset_index(drop=True)
+    })
+
+
+def frame_to_items(frame: pd.DataFrame) -> List[SpendingItem]:
+    """Frame đã kiểm tra -> SpendingItem (model_construct, không validate lại) cho các API còn nhận object."""
+    date_times = frame['date_time'].dt.to_pydatetime()
+    return [
+        SpendingItem.model_construct(id=i, money=int(m), type=int(t), type_name=name, date_time=dt)
+        for i, m, t, name, dt in zip(frame['id'], frame['money'], frame['type'], frame['type_name'], date_times)
+    ]
@@ -0,0 +1,86 @@
+from typing import Any, List, Optional, Tuple, Type
+
+import pandas as pd
+from fastapi import HTTPException, Request, Response
+from pydantic import BaseModel, ValidationError
+
+from app.schemas.spending import SpendingItem
+from app.services.transaction_frame import (
+    FrameValidationError, build_transaction_frame, decode_transaction_columns, decode_transaction_frame
+)
+from app.services.transaction_store import transaction_store
+from app.services.transport import (
+    MEDIA_JSON, FastJSONResponse, TransportError,
+    decode_payload, decompress_body, encode_payload, negotiate_response_type
+)
+from app.workers import ml_executor
+
+
+# ==============================================================================
+# ĐỌC REQUEST / TRẢ RESPONSE DÙNG CHUNG CHO CÁC ROUTER
+# ==============================================================================
+async def resolve_transactions(user_id: str, transactions: Optional[List[SpendingItem]]) -> List[SpendingItem]:
+    """Dùng danh sách client gửi kèm nếu có, ngược lại đọc lịch sử đã đồng bộ trên server."""
+    if transactions is not None:
+        return transactions
+
+    stored = await ml_executor.run_in_thread(transaction_store.load, user_id)
+    if not stored:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No transactions in request and no synced history for user {user_id}"
+        )
+    return stored
+
+
+async def read_fast_request(request: Request, schema: Type[BaseModel]) -> Tuple[BaseModel, pd.DataFrame]:
+    """
+    Đọc body cho các endpoint /fast: tham số validate bằng `schema` như thường, riêng danh sách
+    giao dịch giải mã thẳng thành frame theo cột (không tạo SpendingItem cho từng giao dịch).
+    - Content-Type: JSON (mặc định), MessagePack hoặc Arrow IPC
+    - Content-Encoding: gzip / deflate / zstd
+    - transactions: list object như endpoint thường, hoặc dict cột {"id": [...], "money": [...], ...}
+    """
+    try:
+        body = await request.body()
+        body = await ml_executor.run_in_thread(decompress_body, body, request.headers.get("content-encoding"))
+        payload = await ml_executor.run_in_thread(decode_payload, body, request.headers.get("content-type"))
+    except TransportError as e:
+        if e.status_code == 422:
+            raise HTTPException(status_code=422, detail=[{"type": e.error_type, "loc": ["body"], "msg": str(e)}])
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=422, detail=[{"type": "model_type", "loc": ["body"], "msg": "Input should be a valid dictionary"}])
+
+    items = payload.pop("transactions", None)
+    try:
+        params = schema.model_validate({**payload, "transactions": None})
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=[
+            {**err, "loc": ["body", *err["loc"]]}
+            for err in e.errors(include_url=False, include_context=False, include_input=False)
+        ])
+
+    if items is None:
+        transactions = await resolve_transactions(params.user_id, None)
+        frame = await ml_executor.run_in_thread(build_transaction_frame, transactions)
+    else:
+        decode = decode_transaction_columns if isinstance(items, dict) else decode_transaction_frame
+        try:
+            frame = await ml_executor.run_in_thread(decode, items)
+        except FrameValidationError as e:
+            raise HTTPException(status_code=422, detail=e.errors)
+    return params, frame
+
+
+def fast_response(request: Request, content: Any) -> Response:
+    """
+    Trả `content` (model hoặc dict đã jsonable) theo header Accept: JSON (orjson nếu có) hoặc
+    MessagePack cùng cấu trúc, key camelCase. Trả thẳng Response nên không qua jsonable_encoder.
+    """
+    if isinstance(content, BaseModel):
+        content = content.model_dump(mode="json", by_alias=True)
+    media = negotiate_response_type(request.headers.get("accept"))
+    if media == MEDIA_JSON:
+        return FastJSONResponse(content)
+    return Response(content=encode_payload(content, media), media_type=media)
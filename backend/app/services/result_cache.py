@@ -0,0 +1,248 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import pandas as pd
+
+from app.config import settings
+from app.services.transaction_frame import FRAME_COLUMNS
+
+
+class ResultCache:
+    """
+    Cache kết quả phân tích theo nội dung request: client gửi lại nguyên lịch sử mỗi lần mở màn hình
+    nên cùng (endpoint, user, giao dịch, tham số) sẽ trả lại kết quả cũ thay vì tính lại.
+    - LRU + TTL, giới hạn cả số entry lẫn tổng dung lượng (đo trên JSON đã mã hóa)
+    - Tùy chọn lưu xuống SQLite để còn dùng được sau khi restart
+    Hash khóa + đọc/ghi SQLite là việc chặn (O(n) giao dịch, fsync) nên router gọi lookup() trên thread pool
+    và put() qua BackgroundTasks; SQLite có lock riêng, không giữ lock của LRU trong RAM khi chạm đĩa.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 512,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl_seconds: float = 600,
+        disk_path: Optional[str] = None,
+        enabled: bool = True
+    ):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.disk_path = disk_path or None
+
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        # key -> (thời điểm tạo, JSON bytes)
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._bytes = 0
+        self._stats = {"hits": 0, "diskHits": 0, "misses": 0, "expired": 0, "evictions": 0, "puts": 0, "oversized": 0}
+        self._db: Optional[sqlite3.Connection] = None
+        if self.enabled and self.disk_path:
+            self._open_disk()
+
+    # --------------------------------------------------------------------------
+    # KHÓA CACHE
+    # --------------------------------------------------------------------------
+    @staticmethod
+    def make_key(endpoint: str, user_id: str, transactions: Iterable[Any], **params) -> str:
+        """
+        Hash ổn định của request. Chỉ lấy các trường service thực sự dùng (bỏ note/image/location)
+        và giữ nguyên thứ tự giao dịch vì thứ tự ảnh hưởng tới thứ tự id trong kết quả.
+        """
+        digest = hashlib.sha256()
+        header = json.dumps({"endpoint": endpoint, "user": str(user_id), "params": params}, sort_keys=True, default=str)
+        digest.update(header.encode("utf-8"))
+        for t in transactions:
+            digest.update(
+                f"\x1e{t.id}\x1f{t.money}\x1f{t.type}\x1f{t.type_name}\x1f{t.date_time.isoformat()}".encode("utf-8")
+            )
+        return digest.hexdigest()
+
+    @staticmethod
+    def make_frame_key(endpoint: str, user_id: str, frame: pd.DataFrame, **params) -> str:
+        """Như make_key nhưng cho frame giao dịch (đường /fast): hash theo cột thay vì từng object."""
+        digest = hashlib.sha256()
+        header = json.dumps({"endpoint": endpoint, "user": str(user_id), "params": params}, sort_keys=True, default=str)
+        digest.update(header.encode("utf-8"))
+        if len(frame):
+            digest.update(pd.util.hash_pandas_object(frame[FRAME_COLUMNS], index=False).to_numpy().tobytes())
+        return digest.hexdigest()
+
+    def lookup(self, endpoint: str, user_id: str, transactions: Iterable[Any], **params) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """(khóa, kết quả cache | None) trong 1 lần gọi để router chạy trên thread pool; cache tắt -> không hash."""
+        if not self.enabled:
+            return None, None
+        key = self.make_key(endpoint, user_id, transactions, **params)
+        return key, self.get(key)
+
+    def lookup_frame(self, endpoint: str, user_id: str, frame: pd.DataFrame, **params) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        if not self.enabled:
+            return None, None
+        key = self.make_frame_key(endpoint, user_id, frame, **params)
+        return key, self.get(key)
+
+    # --------------------------------------------------------------------------
+    # LƯU TRỮ ĐĨA (SQLite, mọi truy cập qua _disk_lock)
+    # --------------------------------------------------------------------------
+    def _open_disk(self):
+        try:
+            directory = os.path.dirname(self.disk_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self.disk_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, created REAL NOT NULL, value BLOB NOT NULL)"
+            )
+            self._db.execute("DELETE FROM results WHERE created < ?", (time.time() - self.ttl_seconds,))
+            self._db.commit()
+        except sqlite3.Error as e:
+            print(f"[RESULT CACHE] Disk cache disabled: {e}")
+            self._db = None
+
+    def _disk_get(self, key: str) -> Optional[Tuple[float, bytes]]:
+        if self._db is None:
+            return None
+        try:
+            with self._disk_lock:
+                row = self._db.execute("SELECT created, value FROM results WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error:
+            return None
+        return (row[0], bytes(row[1])) if row else None
+
+    def _disk_put(self, key: str, created: float, value: bytes, cleanup: bool = False):
+        if self._db is None:
+            return
+        try:
+            with self._disk_lock:
+                self._db.execute("INSERT OR REPLACE INTO results (key, created, value) VALUES (?, ?, ?)", (key, created, value))
+                # Dọn entry hết hạn định kỳ để file không phình mãi
+                if cleanup:
+                    self._db.execute("DELETE FROM results WHERE created < ?", (time.time() - self.ttl_seconds,))
+                self._db.commit()
+        except sqlite3.Error as e:
+            print(f"[RESULT CACHE] Cannot persist entry: {e}")
+
+    def _disk_delete(self, key: str):
+        if self._db is None:
+            return
+        try:
+            with self._disk_lock:
+                self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+                self._db.commit()
+        except sqlite3.Error:
+            pass
+
+    # --------------------------------------------------------------------------
+    # API CHÍNH
+    # --------------------------------------------------------------------------
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled or key is None:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+        # Không có trong RAM -> đọc đĩa ngoài lock của LRU
+        from_disk = False
+        if entry is None:
+            entry = self._disk_get(key)
+            from_disk = entry is not None
+
+        expired = False
+        with self._lock:
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+
+            created, value = entry
+            if now - created > self.ttl_seconds:
+                # Chỉ bỏ đúng entry đã đọc (luồng khác có thể vừa ghi entry mới cùng khóa)
+                if self._entries.get(key, (None,))[0] == created:
+                    self._drop(key)
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                expired = True
+            else:
+                if from_disk:
+                    self._store(key, created, value)
+                    self._stats["diskHits"] += 1
+                elif key in self._entries:
+                    self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+
+        if expired:
+            self._disk_delete(key)
+            return None
+        # Mỗi lần hit giải mã ra dict mới -> caller sửa kết quả không ảnh hưởng cache
+        return json.loads(value)
+
+    def put(self, key: Optional[str], value: Dict[str, Any]):
+        if not self.enabled or key is None:
+            return
+        payload = json.dumps(value, ensure_ascii=False, default=str).encode("utf-8")
+        created = time.time()
+        with self._lock:
+            self._stats["puts"] += 1
+            puts = self._stats["puts"]
+            if len(payload) > self.max_bytes:
+                self._stats["oversized"] += 1
+                return
+            self._store(key, created, payload)
+        self._disk_put(key, created, payload, cleanup=puts % 100 == 0)
+
+    def _store(self, key: str, created: float, payload: bytes):
+        self._drop(key)
+        self._entries[key] = (created, payload)
+        self._bytes += len(payload)
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+            self._stats["evictions"] += 1
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[1])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self._db is not None:
+            try:
+                with self._disk_lock:
+                    self._db.execute("DELETE FROM results")
+                    self._db.commit()
+            except sqlite3.Error:
+                pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {
+                **self._stats,
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "maxEntries": self.max_entries,
+                "maxBytes": self.max_bytes,
+                "ttlSeconds": self.ttl_seconds,
+                "diskPath": self.disk_path
+            }
+        lookups = stats["hits"] + stats["misses"]
+        stats["hitRate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+result_cache = ResultCache(
+    max_entries=settings.RESULT_CACHE_MAX_ENTRIES,
+    max_bytes=int(settings.RESULT_CACHE_MAX_MB * 1024 * 1024),
+    ttl_seconds=settings.RESULT_CACHE_TTL_SECONDS,
+    disk_path=settings.RESULT_CACHE_DISK_PATH,
+    enabled=settings.RESULT_CACHE_ENABLED
+)
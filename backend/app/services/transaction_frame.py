@@ -0,0 +1,348 @@
+import json
+import re
+from operator import itemgetter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pydantic import ValidationError
+
+from app.schemas.spending import SpendingItem
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Các cột thô mà cả 3 service cần; mỗi service tự tính đặc trưng riêng từ đây
+FRAME_COLUMNS = ['id', 'money', 'type', 'type_name', 'date_time']
+
+# Cột -> các key JSON chấp nhận (alias trước, tên field sau - giống populate_by_name của SpendingItem)
+FIELD_KEYS = {
+    'id': ('id',),
+    'money': ('money',),
+    'type': ('type',),
+    'type_name': ('typeName', 'type_name'),
+    'date_time': ('dateTime', 'date_time')
+}
+
+MAX_REPORTED_ERRORS = 20
+
+# Dạng giá trị đọc thẳng theo cột; giá trị khác (sai kiểu, chuỗi số, epoch số thực, số quá lớn...) được
+# SpendingItem validate từng dòng để kết quả và lỗi giống hệt đường Pydantic.
+# Chuỗi thời gian mà pandas (format='ISO8601') và Pydantic đọc ra cùng một giá trị:
+_ISO_DATETIME = re.compile(r'\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d{1,6})?)?(?:Z|[+-]\d{2}:?\d{2})?)?')
+_ISO_MAX_LEN = 32
+# Số nguyên lớn hơn 2^53 mất chính xác khi đi qua float (SpendingItem giới hạn money / type trong int64)
+_MAX_EXACT_INT = 2 ** 53
+# Epoch số nguyên: |x| <= 2e10 là giây, lớn hơn là mili giây (quy tắc của Pydantic);
+# chỉ đọc theo cột trong khoảng 1900-2200, ngoài khoảng đó để Pydantic xử lý
+_EPOCH_MS_THRESHOLD = 20_000_000_000
+_EPOCH_MS_RANGE = (-2_208_988_800_000, 7_258_118_400_000)
+
+
+class FrameValidationError(ValueError):
+    """Dữ liệu giao dịch không hợp lệ; `errors` cùng dạng với lỗi 422 của FastAPI."""
+
+    def __init__(self, errors: List[Dict[str, Any]]):
+        super().__init__(f"{len(errors)} invalid transaction field(s)")
+        self.errors = errors
+
+
+def normalize_datetimes(values: Any) -> pd.Series:
+    """
+    Cột thời gian -> datetime64 không múi giờ, giữ giờ địa phương của từng giá trị (bỏ offset) - đúng giờ / thứ
+    như đọc `t.date_time.hour` trên từng giao dịch. Offset lẫn lộn (VD: "...Z" và "...+07:00") nếu để nguyên
+    sẽ thành cột object và mọi phép `.dt` của service đều lỗi.
+    """
+    series = values if isinstance(values, pd.Series) else pd.Series(values)
+    if isinstance(series.dtype, pd.DatetimeTZDtype):
+        return series.dt.tz_localize(None)
+    if series.dtype == object:
+        return pd.to_datetime(pd.Series(
+            [v.replace(tzinfo=None) if getattr(v, 'tzinfo', None) is not None else v for v in series],
+            index=series.index, dtype=object
+        ))
+    return series
+
+
+def build_transaction_frame(transactions: Optional[Iterable[SpendingItem]]) -> pd.DataFrame:
+    """
+    Đọc danh sách SpendingItem 1 lần thành DataFrame theo cột (giữ nguyên thứ tự đầu vào).
+    Frame này được dùng chung giữa các service nên coi là chỉ đọc: service nào cần thêm cột thì copy trước.
+    """
+    transactions = list(transactions or [])
+    if not transactions:
+        return pd.DataFrame(columns=FRAME_COLUMNS)
+
+    return pd.DataFrame({
+        'id': [t.id for t in transactions],
+        'money': [t.money for t in transactions],
+        'type': [t.type for t in transactions],
+        'type_name': [t.type_name for t in transactions],
+        'date_time': normalize_datetimes([t.date_time for t in transactions])
+    })
+
+
+# ==============================================================================
+# ĐƯỜNG GIẢI MÃ NHANH: JSON -> CỘT, KHÔNG TẠO SpendingItem CHO TỪNG GIAO DỊCH
+# ==============================================================================
+def loads_json(body: bytes) -> Any:
+    return orjson.loads(body) if ORJSON_AVAILABLE else json.loads(body)
+
+
+def _pick(items: List[Dict[str, Any]], field: str) -> pd.Series:
+    # Chỉ đọc đúng các key cần thiết (nhanh hơn DataFrame.from_records trên toàn bộ key)
+    keys = FIELD_KEYS[field]
+    if len(keys) == 1:
+        values = [t.get(keys[0]) for t in items]
+    else:
+        alias, name = keys
+        values = [t.get(alias, t.get(name)) for t in items]
+    return pd.Series(values, dtype=object)
+
+
+def _string_mask(values: pd.Series) -> np.ndarray:
+    """Dòng có giá trị là chuỗi thật (SpendingItem không tự đổi số / dict / None sang str)."""
+    if values.dtype == object:
+        if pd.api.types.infer_dtype(values, skipna=False) == 'string':
+            return np.ones(len(values), dtype=bool)
+        return values.map(type).eq(str).to_numpy()
+    if pd.api.types.is_string_dtype(values):
+        return values.notna().to_numpy()
+    return np.zeros(len(values), dtype=bool)
+
+
+def _integer_column(values: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (giá trị int64, mask dòng đọc được theo cột): số nguyên hoặc số thực không có phần lẻ, |x| < 2^53.
+    Bool, chuỗi số, số lớn hơn (mất chính xác khi qua float) để SpendingItem xử lý.
+    """
+    if values.dtype == object:
+        if pd.api.types.infer_dtype(values, skipna=False) in ('integer', 'floating', 'mixed-integer-float'):
+            numeric = np.ones(len(values), dtype=bool)
+        else:
+            kinds = values.map(type)
+            numeric = (kinds.eq(int) | kinds.eq(float)).to_numpy()
+    elif pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        numeric = np.ones(len(values), dtype=bool)
+    else:
+        numeric = np.zeros(len(values), dtype=bool)
+    try:
+        numbers = values.where(numeric, np.nan).astype(float).to_numpy()
+    except OverflowError:
+        # Số nguyên vượt cả float: để Pydantic đọc toàn bộ cột
+        numbers, numeric = np.zeros(len(values)), np.zeros(len(values), dtype=bool)
+    with np.errstate(invalid='ignore'):
+        regular = numeric & np.isfinite(numbers) & (numbers == np.floor(numbers)) & (np.abs(numbers) < _MAX_EXACT_INT)
+    return np.where(regular, numbers, 0).astype(np.int64), regular
+
+
+def _iso_datetime_mask(strings: np.ndarray) -> np.ndarray:
+    """
+    Mask chuỗi khớp _ISO_DATETIME, kiểm tra theo vị trí trên ma trận byte (regex từng chuỗi chậm hơn ~10 lần).
+    Chuỗi không phải ASCII thì dùng regex.
+    """
+    try:
+        raw = strings.astype(f'S{_ISO_MAX_LEN + 1}')
+    except UnicodeEncodeError:
+        return np.fromiter((_ISO_DATETIME.fullmatch(s) is not None for s in strings), dtype=bool, count=len(strings))
+
+    n = len(raw)
+    rows = np.arange(n)
+    # Đệm thêm cột 0 để đọc vị trí sau con trỏ không bao giờ vượt ra ngoài
+    chars = np.zeros((n, _ISO_MAX_LEN + 8), dtype=np.uint8)
+    chars[:, :_ISO_MAX_LEN + 1] = raw.view(np.uint8).reshape(n, _ISO_MAX_LEN + 1)
+    digit = (chars >= ord('0')) & (chars <= ord('9'))
+    # Độ dài lấy từ chuỗi gốc: kiểu bytes cắt mất ký tự \x00 ở cuối
+    lengths = np.fromiter(map(len, strings), dtype=np.int64, count=n)
+
+    # YYYY-MM-DD
+    ok = digit[:, [0, 1, 2, 3, 5, 6, 8, 9]].all(axis=1) & (chars[:, 4] == ord('-')) & (chars[:, 7] == ord('-'))
+    # [T ]HH:MM
+    has_time = (chars[:, 10] == ord('T')) | (chars[:, 10] == ord(' '))
+    ok &= ~has_time | (digit[:, [11, 12, 14, 15]].all(axis=1) & (chars[:, 13] == ord(':')))
+    cursor = np.where(has_time, 16, 10)
+    # :SS
+    has_seconds = has_time & (chars[:, 16] == ord(':'))
+    ok &= ~has_seconds | digit[:, 17:19].all(axis=1)
+    cursor = np.where(has_seconds, 19, cursor)
+    # .ffffff (1-6 chữ số)
+    has_fraction = has_seconds & (chars[:, 19] == ord('.'))
+    fraction_digits = np.cumprod(digit[:, 20:27], axis=1).sum(axis=1)
+    ok &= ~has_fraction | ((fraction_digits >= 1) & (fraction_digits <= 6))
+    cursor = np.where(has_fraction, 20 + fraction_digits, cursor)
+    # Z | ±HH[:]MM
+    sign = chars[rows, cursor]
+    is_utc = has_time & (sign == ord('Z'))
+    is_offset = has_time & ((sign == ord('+')) | (sign == ord('-')))
+    minutes = cursor + 3 + (chars[rows, cursor + 3] == ord(':'))
+    ok &= ~is_offset | (digit[rows, cursor + 1] & digit[rows, cursor + 2] & digit[rows, minutes] & digit[rows, minutes + 1])
+    cursor = np.where(is_utc, cursor + 1, np.where(is_offset, minutes + 2, cursor))
+
+    return ok & (cursor == lengths)
+
+
+def _datetime_column(values: pd.Series) -> Tuple[pd.Series, np.ndarray]:
+    """
+    (datetime64 không múi giờ, mask dòng đọc được theo cột): chuỗi ISO 8601 dạng chuẩn (_ISO_DATETIME)
+    hoặc epoch số nguyên như Pydantic (|x| <= 2e10 là giây, lớn hơn là mili giây, theo UTC).
+    Nhiều offset múi giờ khác nhau -> ValueError để bên gọi chuyển sang Pydantic.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        parsed = normalize_datetimes(values)
+        return parsed, parsed.notna().to_numpy()
+
+    is_str = _string_mask(values)
+    all_str = is_str.all()
+    strings = values.to_numpy(dtype=object) if all_str else np.where(is_str, values.to_numpy(dtype=object), '')
+    iso = is_str & _iso_datetime_mask(strings)
+    parsed = normalize_datetimes(pd.to_datetime(values.where(iso), format='ISO8601', errors='coerce'))
+    regular = iso & parsed.notna().to_numpy()
+    if all_str:
+        return parsed, regular
+
+    epoch, is_epoch = _integer_column(values)
+    if values.dtype == object:
+        is_epoch &= values.map(type).eq(int).to_numpy()
+    epoch_ms = np.where(np.abs(epoch) <= _EPOCH_MS_THRESHOLD, epoch * 1000, epoch)
+    is_epoch &= (epoch_ms >= _EPOCH_MS_RANGE[0]) & (epoch_ms <= _EPOCH_MS_RANGE[1])
+    if is_epoch.any():
+        stamps = pd.Series(pd.to_datetime(np.where(is_epoch, epoch_ms, 0), unit='ms'), index=parsed.index)
+        parsed = parsed.mask(is_epoch, stamps)
+        regular |= is_epoch
+    return parsed, regular
+
+
+def decode_transaction_frame(items: Any) -> pd.DataFrame:
+    """
+    Giải mã list giao dịch (đã json.loads) thẳng thành frame như build_transaction_frame, kiểm tra theo cột.
+    - Dòng có giá trị ngoài dạng đọc được theo cột -> validate dòng đó bằng SpendingItem (cùng giá trị / lỗi 422)
+    - Chuỗi thời gian lệch múi giờ lẫn lộn -> fallback validate từng item bằng SpendingItem
+    """
+    if not isinstance(items, list):
+        raise FrameValidationError([{"type": "list_type", "loc": ["body", "transactions"], "msg": "Input should be a valid list"}])
+    if not items:
+        return pd.DataFrame(columns=FRAME_COLUMNS)
+
+    try:
+        # Trường hợp thường gặp: mọi item đều có đủ key theo alias -> tách cột trong 1 lượt
+        columns = dict(zip(FIELD_KEYS, (
+            pd.Series(values, dtype=object)
+            for values in zip(*map(itemgetter(*(keys[0] for keys in FIELD_KEYS.values())), items))
+        )))
+    except (KeyError, TypeError):
+        not_dict = [i for i, t in enumerate(items) if not isinstance(t, dict)]
+        if not_dict:
+            raise FrameValidationError([
+                {"type": "model_type", "loc": ["body", "transactions", i], "msg": "Input should be a valid dictionary"}
+                for i in not_dict[:MAX_REPORTED_ERRORS]
+            ])
+        columns = {field: _pick(items, field) for field in FIELD_KEYS}
+
+    return _frame_from_columns(columns, lambda: items)
+
+
+def decode_transaction_columns(columns: Any) -> pd.DataFrame:
+    """
+    Như decode_transaction_frame nhưng cho giao dịch gửi theo cột (MessagePack / Arrow):
+    {"id": [...], "money": [...], "type": [...], "typeName": [...], "dateTime": [...]}.
+    Key nhận cả alias lẫn tên field; mọi cột phải cùng độ dài.
+    """
+    if not isinstance(columns, dict):
+        raise FrameValidationError([{"type": "dict_type", "loc": ["body", "transactions"], "msg": "Input should be a valid dictionary"}])
+
+    picked, errors = {}, []
+    for field, keys in FIELD_KEYS.items():
+        key = next((k for k in keys if k in columns), None)
+        if key is None:
+            errors.append({"type": "missing", "loc": ["body", "transactions", keys[0]], "msg": "Field required"})
+            continue
+        values = columns[key]
+        if isinstance(values, (pd.Series, np.ndarray)):
+            picked[field] = pd.Series(values).reset_index(drop=True)
+        elif isinstance(values, (list, tuple)):
+            picked[field] = pd.Series(values, dtype=object)
+        else:
+            errors.append({"type": "list_type", "loc": ["body", "transactions", key], "msg": "Input should be a valid list"})
+    if errors:
+        raise FrameValidationError(errors)
+
+    lengths = {FIELD_KEYS[field][0]: len(values) for field, values in picked.items()}
+    if len(set(lengths.values())) > 1:
+        raise FrameValidationError([{
+            "type": "value_error", "loc": ["body", "transactions"],
+            "msg": f"Value error, all transaction columns must have the same length: {lengths}"
+        }])
+    if not lengths['id']:
+        return pd.DataFrame(columns=FRAME_COLUMNS)
+
+    def as_items() -> List[Dict[str, Any]]:
+        aliases = [FIELD_KEYS[field][0] for field in picked]
+        return [dict(zip(aliases, row)) for row in zip(*(values.tolist() for values in picked.values()))]
+
+    return _frame_from_columns(picked, as_items)
+
+
+def _frame_from_columns(columns: Dict[str, pd.Series], items: Callable[[], List[Dict[str, Any]]]) -> pd.DataFrame:
+    # `items` chỉ được gọi khi có dòng phải validate bằng Pydantic (giá trị ngoài các dạng đọc được theo cột)
+    money, money_ok = _integer_column(columns['money'])
+    types, type_ok = _integer_column(columns['type'])
+    try:
+        date_time, date_ok = _datetime_column(columns['date_time'])
+    except (ValueError, TypeError):
+        # Nhiều offset múi giờ khác nhau trong cùng request: để Pydantic xử lý như đường cũ
+        return _decode_with_pydantic(items())
+
+    ids = columns['id'].to_numpy(dtype=object)
+    type_names = columns['type_name'].to_numpy(dtype=object)
+    regular = _string_mask(columns['id']) & _string_mask(columns['type_name']) & money_ok & type_ok & date_ok
+
+    irregular = np.flatnonzero(~regular)
+    if len(irregular):
+        # Thiếu / sai kiểu / dạng hiếm (chuỗi số, epoch số thực, ...): validate đúng các dòng này bằng SpendingItem
+        # để giá trị nhận được và lỗi 422 giống hệt đường Pydantic
+        rows = items()
+        validated = _validate_items(rows, irregular)
+        ids, type_names = ids.copy(), type_names.copy()
+        ids[irregular] = [v.id for v in validated]
+        type_names[irregular] = [v.type_name for v in validated]
+        money[irregular] = [v.money for v in validated]
+        types[irregular] = [v.type for v in validated]
+        try:
+            date_time = date_time.copy()
+            date_time.iloc[irregular] = normalize_datetimes(pd.Series([v.date_time for v in validated], dtype=object)).to_numpy()
+        except (ValueError, TypeError, OverflowError):
+            # Thời điểm ngoài khoảng của cột datetime64
+            return _decode_with_pydantic(rows)
+
+    return pd.DataFrame({
+        'id': ids,
+        'money': money,
+        'type': types,
+        'type_name': type_names,
+        'date_time': date_time.to_numpy()
+    })
+
+
+def _validate_items(items: List[Dict[str, Any]], indices: Iterable[int]) -> List[SpendingItem]:
+    """Validate các dòng `indices` bằng SpendingItem; lỗi -> FrameValidationError (tối đa MAX_REPORTED_ERRORS)."""
+    validated, errors = [], []
+    for index in indices:
+        try:
+            validated.append(SpendingItem.model_validate(items[index]))
+        except ValidationError as e:
+            errors.extend(
+                {**err, "loc": ["body", "transactions", int(index), *err["loc"]]}
+                for err in e.errors(include_url=False, include_context=False, include_input=False)
+            )
+            if len(errors) >= MAX_REPORTED_ERRORS:
+                break
+    if errors:
+        raise FrameValidationError(errors[:MAX_REPORTED_ERRORS])
+    return validated
+
+
+def _decode_with_pydantic(items: List[Dict[str, Any]]) -> pd.DataFrame:
+    return build_transaction_frame(_validate_items(items, range(len(items))))
@@ -0,0 +1,146 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.config import settings
+from app.schemas.spending import SpendingItem
+
+
+class VersionConflictError(Exception):
+    """baseVersion client gửi lên không khớp version trên server -> client cần đồng bộ lại toàn bộ."""
+
+    def __init__(self, user_id: str, expected: int, current: int):
+        super().__init__(f"Version conflict for user {user_id}: client has {expected}, server has {current}")
+        self.expected = expected
+        self.current = current
+
+
+class TransactionStore:
+    """
+    Lưu lịch sử giao dịch của từng user trên server (SQLite) để client chỉ gửi phần thay đổi.
+    Mỗi lần ghi làm tăng version của user; version này là watermark client giữ lại cho lần sync sau.
+    """
+
+    COLUMNS = ("id", "money", "type", "type_name", "note", "date_time", "image", "location")
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS transactions (
+                user_id TEXT NOT NULL,
+                id TEXT NOT NULL,
+                money INTEGER NOT NULL,
+                type INTEGER NOT NULL,
+                type_name TEXT NOT NULL,
+                note TEXT,
+                date_time TEXT NOT NULL,
+                image TEXT,
+                location TEXT,
+                PRIMARY KEY (user_id, id)
+            );
+            CREATE TABLE IF NOT EXISTS user_versions (
+                user_id TEXT PRIMARY KEY,
+                version INTEGER NOT NULL
+            );
+        """)
+        self._db.commit()
+
+    # --------------------------------------------------------------------------
+    # ĐỌC
+    # --------------------------------------------------------------------------
+    def _version(self, user_id: str) -> int:
+        row = self._db.execute("SELECT version FROM user_versions WHERE user_id = ?", (user_id,)).fetchone()
+        return row[0] if row else 0
+
+    def get_version(self, user_id: str) -> Dict[str, Any]:
+        with self._lock:
+            total = self._db.execute("SELECT COUNT(*) FROM transactions WHERE user_id = ?", (user_id,)).fetchone()[0]
+            return {"userId": user_id, "version": self._version(user_id), "totalTransactions": total}
+
+    def load(self, user_id: str) -> List[SpendingItem]:
+        """Toàn bộ lịch sử của user, sắp theo thời gian (rỗng nếu user chưa đồng bộ)."""
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM transactions WHERE user_id = ? ORDER BY date_time, id",
+                (user_id,)
+            ).fetchall()
+        return [
+            SpendingItem(
+                id=r[0], money=r[1], type=r[2], typeName=r[3], note=r[4],
+                dateTime=datetime.fromisoformat(r[5]), image=r[6], location=r[7]
+            )
+            for r in rows
+        ]
+
+    # --------------------------------------------------------------------------
+    # GHI
+    # --------------------------------------------------------------------------
+    @staticmethod
+    def _to_row(user_id: str, t: SpendingItem) -> tuple:
+        return (user_id, t.id, t.money, t.type, t.type_name, t.note, t.date_time.isoformat(), t.image, t.location)
+
+    def apply_delta(
+        self,
+        user_id: str,
+        upserts: Iterable[SpendingItem] = (),
+        deletes: Iterable[str] = (),
+        base_version: Optional[int] = None,
+        replace: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Ghi thay đổi trong 1 transaction SQLite rồi tăng version.
+        - replace=True: xóa toàn bộ lịch sử cũ trước khi ghi (đồng bộ đầy đủ lần đầu / sau conflict)
+        - base_version khác version hiện tại -> VersionConflictError (bỏ qua kiểm tra khi replace)
+        """
+        rows = [self._to_row(user_id, t) for t in upserts]
+        delete_ids = [(user_id, tx_id) for tx_id in deletes]
+
+        with self._lock:
+            current = self._version(user_id)
+            if not replace and base_version is not None and base_version != current:
+                raise VersionConflictError(user_id, base_version, current)
+
+            with self._db:
+                if replace:
+                    self._db.execute("DELETE FROM transactions WHERE user_id = ?", (user_id,))
+                deleted = 0
+                if delete_ids:
+                    deleted = self._db.executemany(
+                        "DELETE FROM transactions WHERE user_id = ? AND id = ?", delete_ids
+                    ).rowcount
+                if rows:
+                    self._db.executemany(
+                        f"INSERT OR REPLACE INTO transactions (user_id, {', '.join(self.COLUMNS)}) "
+                        f"VALUES ({', '.join('?' * (len(self.COLUMNS) + 1))})",
+                        rows
+                    )
+                version = current + 1
+                self._db.execute(
+                    "INSERT OR REPLACE INTO user_versions (user_id, version) VALUES (?, ?)", (user_id, version)
+                )
+            total = self._db.execute("SELECT COUNT(*) FROM transactions WHERE user_id = ?", (user_id,)).fetchone()[0]
+
+        return {
+            "userId": user_id,
+            "version": version,
+            "upserted": len(rows),
+            "deleted": deleted,
+            "totalTransactions": total
+        }
+
+    def delete_user(self, user_id: str):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM transactions WHERE user_id = ?", (user_id,))
+            self._db.execute("DELETE FROM user_versions WHERE user_id = ?", (user_id,))
+
+
+transaction_store = TransactionStore(settings.TRANSACTION_STORE_PATH)
@@ -0,0 +1,201 @@
+import json
+import zlib
+from typing import Any, Dict, Optional
+
+from fastapi.responses import JSONResponse
+
+from app.config import settings
+from app.services.transaction_frame import ORJSON_AVAILABLE, loads_json
+
+if ORJSON_AVAILABLE:
+    import orjson
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc  # noqa: F401
+    ARROW_AVAILABLE = True
+except ImportError:
+    ARROW_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+MEDIA_JSON = "application/json"
+MEDIA_MSGPACK = "application/msgpack"
+MEDIA_ARROW = "application/vnd.apache.arrow.stream"
+
+# Các tên media type client hay gửi -> dạng chuẩn ở trên
+MEDIA_ALIASES = {
+    "application/json": MEDIA_JSON,
+    "application/msgpack": MEDIA_MSGPACK,
+    "application/x-msgpack": MEDIA_MSGPACK,
+    "application/vnd.msgpack": MEDIA_MSGPACK,
+    "application/vnd.apache.arrow.stream": MEDIA_ARROW,
+    "application/vnd.apache.arrow.file": MEDIA_ARROW,
+}
+
+# Key trong metadata schema Arrow chứa tham số request (userId, predictionDays, ...) dạng JSON
+ARROW_PARAMS_KEY = b"params"
+
+
+class TransportError(ValueError):
+    """Body không đọc được theo Content-Type / Content-Encoding; `status_code` là mã HTTP nên trả."""
+
+    def __init__(self, status_code: int, message: str, error_type: str = "value_error"):
+        super().__init__(message)
+        self.status_code = status_code
+        self.error_type = error_type
+
+
+def _media_type(header: Optional[str]) -> str:
+    return (header or "").split(";", 1)[0].strip().lower()
+
+
+def available_formats() -> Dict[str, Any]:
+    return {
+        "requestTypes": [MEDIA_JSON] + ([MEDIA_MSGPACK] if MSGPACK_AVAILABLE else []) + ([MEDIA_ARROW] if ARROW_AVAILABLE else []),
+        "responseTypes": [MEDIA_JSON] + ([MEDIA_MSGPACK] if MSGPACK_AVAILABLE else []),
+        "contentEncodings": ["identity", "gzip", "deflate"] + (["zstd"] if ZSTD_AVAILABLE else []),
+    }
+
+
+# ==============================================================================
+# GIẢI NÉN BODY (Content-Encoding)
+# ==============================================================================
+def decompress_body(body: bytes, content_encoding: Optional[str], max_bytes: Optional[int] = None) -> bytes:
+    """
+    Giải nén body theo Content-Encoding (gzip / deflate / zstd, có thể nhiều lớp "gzip, zstd").
+    Giới hạn kích thước sau giải nén để một body nén nhỏ không bung ra hết RAM.
+    """
+    if max_bytes is None:
+        max_bytes = int(settings.TRANSPORT_MAX_BODY_MB * 1024 * 1024)
+
+    encodings = [e.strip().lower() for e in (content_encoding or "").split(",") if e.strip()]
+    # Encoding áp dụng sau cùng đứng cuối header -> gỡ theo thứ tự ngược lại
+    for encoding in reversed(encodings):
+        if encoding == "identity":
+            continue
+        try:
+            if encoding in ("gzip", "x-gzip", "deflate"):
+                wbits = 16 + zlib.MAX_WBITS if encoding != "deflate" else zlib.MAX_WBITS
+                # Đọc tối đa max_bytes + 1 byte: vượt giới hạn thì kiểm tra bên dưới báo lỗi
+                body = zlib.decompressobj(wbits).decompress(body, max_bytes + 1)
+            elif encoding == "zstd":
+                if not ZSTD_AVAILABLE:
+                    raise TransportError(415, "zstd request bodies require the 'zstandard' package")
+                reader = zstandard.ZstdDecompressor().stream_reader(body)
+                body = reader.read(max_bytes + 1)
+            else:
+                raise TransportError(415, f"Unsupported Content-Encoding: {encoding}")
+        except TransportError:
+            raise
+        except Exception as e:
+            # zlib.error, zstandard.ZstdError, ...
+            raise TransportError(400, f"Cannot decompress {encoding} body: {e}")
+
+        if len(body) > max_bytes:
+            raise TransportError(413, f"Decompressed body exceeds {max_bytes} bytes")
+    return body
+
+
+# ==============================================================================
+# GIẢI MÃ BODY (Content-Type)
+# ==============================================================================
+def decode_payload(body: bytes, content_type: Optional[str]) -> Any:
+    """
+    Giải mã body thành dict tham số. `transactions` giữ nguyên dạng client gửi:
+    list object (JSON/MessagePack) hoặc dict cột (MessagePack dạng cột, Arrow).
+    """
+    # Content-Type lạ (kể cả form mặc định của curl -d) vẫn đọc như JSON giống các endpoint cũ
+    media = MEDIA_ALIASES.get(_media_type(content_type), MEDIA_JSON)
+
+    if media == MEDIA_JSON:
+        try:
+            return loads_json(body)
+        except ValueError:
+            raise TransportError(422, "JSON decode error", "json_invalid")
+
+    if media == MEDIA_MSGPACK:
+        if not MSGPACK_AVAILABLE:
+            raise TransportError(415, "MessagePack bodies require the 'msgpack' package")
+        try:
+            # timestamp=3: kiểu Timestamp của MessagePack -> datetime (UTC)
+            return msgpack.unpackb(body, raw=False, timestamp=3, strict_map_key=False)
+        except Exception as e:
+            raise TransportError(422, f"MessagePack decode error: {e}")
+
+    if not ARROW_AVAILABLE:
+        raise TransportError(415, "Arrow bodies require the 'pyarrow' package")
+    return _decode_arrow(body)
+
+
+def _decode_arrow(body: bytes) -> Dict[str, Any]:
+    # Mỗi dòng của bảng là 1 giao dịch; tham số request nằm trong metadata của schema
+    try:
+        try:
+            table = pa.ipc.open_stream(body).read_all()
+        except pa.ArrowInvalid:
+            table = pa.ipc.open_file(body).read_all()
+        metadata = table.schema.metadata or {}
+        params = json.loads(metadata[ARROW_PARAMS_KEY]) if ARROW_PARAMS_KEY in metadata else {}
+    except Exception as e:
+        raise TransportError(422, f"Arrow decode error: {e}")
+
+    if not isinstance(params, dict):
+        raise TransportError(422, "Arrow schema metadata 'params' must be a JSON object")
+    params["transactions"] = {
+        name: table.column(name).to_pandas() for name in table.column_names
+    }
+    return params
+
+
+# ==============================================================================
+# MÃ HÓA RESPONSE (Accept)
+# ==============================================================================
+def negotiate_response_type(accept: Optional[str]) -> str:
+    """Chọn định dạng response theo Accept (có xét q=); không khớp gì thì trả JSON."""
+    best, best_q = MEDIA_JSON, 0.0
+    for part in (accept or "").split(","):
+        fields = part.split(";")
+        media = MEDIA_ALIASES.get(fields[0].strip().lower())
+        if media is None or media == MEDIA_ARROW or (media == MEDIA_MSGPACK and not MSGPACK_AVAILABLE):
+            continue
+        q = 1.0
+        for param in fields[1:]:
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > best_q:
+            best, best_q = media, q
+    return best
+
+
+def encode_payload(content: Any, media: str) -> bytes:
+    """Mã hóa nội dung đã jsonable (dict/list/str/số) sang media type nhị phân đã chọn."""
+    if media == MEDIA_MSGPACK:
+        return msgpack.packb(content, use_bin_type=True)
+    raise ValueError(f"No binary encoder for {media}")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse mã hóa bằng orjson (nhanh hơn nhiều với list id dài); thiếu orjson thì như JSONResponse.
+    Trả thẳng class này với nội dung đã jsonable (model_dump(mode="json")) để bỏ qua jsonable_encoder.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if ORJSON_AVAILABLE:
+            return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+        return super().render(content)
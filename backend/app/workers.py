@@ -0,0 +1,203 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException
+
+from app.config import settings
+from app.services.metrics import metrics
+
+
+# ==============================================================================
+# JOB CHẠY TRONG PROCESS CON (phải là hàm top-level để pickle được)
+# ==============================================================================
+def _run_predict_trend(user_id: str, transactions: Optional[list], prediction_days: int, frame=None, engine=None):
+    from app.services.lstm_service import lstm_service
+    from app.services.metrics import metrics
+
+    # Trả kèm phần chênh lệch thống kê registry + metrics ghi trong job để process chính cộng dồn
+    before = lstm_service.registry.snapshot_counters() if lstm_service.registry else {}
+    result = lstm_service.predict_trend(
+        user_id=user_id,
+        transactions=transactions,
+        prediction_days=prediction_days,
+        frame=frame,
+        engine=engine
+    )
+    after = lstm_service.registry.snapshot_counters() if lstm_service.registry else {}
+    delta = {k: after[k] - before.get(k, 0) for k in after}
+    return result, delta, metrics.drain()
+
+
+def _preload_tensorflow() -> bool:
+    from app.services.lstm_service import load_tensorflow
+
+    return load_tensorflow()
+
+
+class MLExecutor:
+    """
+    Lớp thực thi cho các tác vụ ML nặng CPU, tách khỏi event loop của asyncio.
+    - Thread pool: sklearn / pandas (nhả GIL phần lớn thời gian tính toán)
+    - Process pool: train TensorFlow (tránh giữ GIL và chặn các request khác)
+    Giới hạn số job đang chờ + đang chạy; vượt giới hạn trả 503, quá thời gian trả 504.
+    """
+
+    def __init__(
+        self,
+        thread_workers: int = 4,
+        process_workers: int = 2,
+        max_pending_jobs: int = 32,
+        job_timeout: float = 60.0,
+        preload_tensorflow: bool = False
+    ):
+        self.thread_workers = thread_workers
+        self.process_workers = process_workers
+        self.max_pending_jobs = max_pending_jobs
+        self.job_timeout = job_timeout
+        self.preload_tensorflow = preload_tensorflow
+
+        self._lock = threading.Lock()
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+        self._stats = {"submitted": 0, "completed": 0, "rejected": 0, "timedOut": 0, "failed": 0}
+
+    # --------------------------------------------------------------------------
+    # VÒNG ĐỜI
+    # --------------------------------------------------------------------------
+    def start(self):
+        thread_pool = self._get_thread_pool()
+        if self.process_workers > 0:
+            process_pool = self._get_process_pool()
+            if self.preload_tensorflow:
+                # Process con được spawn khi có job -> gửi mỗi worker 1 job nạp TF ngay lúc khởi động
+                for _ in range(self.process_workers):
+                    process_pool.submit(_preload_tensorflow)
+        elif self.preload_tensorflow:
+            # LSTM chạy trong thread pool: nạp TF nền, không chặn startup
+            thread_pool.submit(_preload_tensorflow)
+
+    def shutdown(self):
+        with self._lock:
+            thread_pool, self._thread_pool = self._thread_pool, None
+            process_pool, self._process_pool = self._process_pool, None
+        if thread_pool is not None:
+            thread_pool.shutdown(wait=False, cancel_futures=True)
+        if process_pool is not None:
+            process_pool.shutdown(wait=False, cancel_futures=True)
+
+    def _get_thread_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._thread_pool is None:
+                self._thread_pool = ThreadPoolExecutor(
+                    max_workers=self.thread_workers, thread_name_prefix="ml-worker"
+                )
+            return self._thread_pool
+
+    def _get_process_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._process_pool is None:
+                # spawn: không fork process đã nạp TensorFlow (fork sau khi TF tạo thread là không an toàn)
+                self._process_pool = ProcessPoolExecutor(
+                    max_workers=self.process_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._process_pool
+
+    # --------------------------------------------------------------------------
+    # SUBMIT JOB
+    # --------------------------------------------------------------------------
+    def _reserve_slot(self):
+        with self._lock:
+            if self._pending >= self.max_pending_jobs:
+                self._stats["rejected"] += 1
+                raise HTTPException(
+                    status_code=503,
+                    detail="Server is busy processing ML jobs, please retry later",
+                    headers={"Retry-After": "5"}
+                )
+            self._pending += 1
+            self._stats["submitted"] += 1
+
+    def _release_slot(self, future):
+        with self._lock:
+            self._pending -= 1
+            if future.cancelled():
+                return
+            if future.exception() is not None:
+                self._stats["failed"] += 1
+            else:
+                self._stats["completed"] += 1
+
+    async def _submit(self, pool: Executor, fn: Callable, *args, **kwargs) -> Any:
+        self._reserve_slot()
+        try:
+            future = pool.submit(partial(fn, *args, **kwargs))
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+        # Slot chỉ được trả khi job thực sự kết thúc (kể cả sau khi request đã timeout)
+        future.add_done_callback(self._release_slot)
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.job_timeout)
+        except asyncio.TimeoutError:
+            future.cancel()
+            with self._lock:
+                self._stats["timedOut"] += 1
+            raise HTTPException(status_code=504, detail=f"ML job exceeded {self.job_timeout:.0f}s timeout")
+
+    async def run_in_thread(self, fn: Callable, *args, **kwargs) -> Any:
+        return await self._submit(self._get_thread_pool(), fn, *args, **kwargs)
+
+    async def run_predict_trend(
+        self, user_id: str, transactions: Optional[list], prediction_days: int, frame=None, engine: Optional[str] = None
+    ):
+        """
+        `frame`: frame giao dịch dựng sẵn (transaction_frame) - gửi sang process con rẻ hơn list SpendingItem.
+        `engine`: engine dự báo (forecast_engines), None = settings.FORECAST_ENGINE.
+        Chỉ engine LSTM (TensorFlow) mới gửi sang process pool; holt / ridge_ar chạy trong thread
+        để khỏi tốn chi phí pickle + IPC cho vài phép tính numpy.
+        """
+        from app.services.forecast_engines import LSTMEngine
+        from app.services.lstm_service import lstm_service
+
+        if self.process_workers <= 0 or not isinstance(lstm_service.get_engine(engine), LSTMEngine):
+            return await self.run_in_thread(
+                lstm_service.predict_trend,
+                user_id=user_id, transactions=transactions, prediction_days=prediction_days, frame=frame, engine=engine
+            )
+
+        result, registry_delta, metrics_delta = await self._submit(
+            self._get_process_pool(), _run_predict_trend, user_id, transactions, prediction_days, frame, engine
+        )
+        if lstm_service.registry is not None and registry_delta:
+            lstm_service.registry.merge_counters(registry_delta)
+        metrics.merge(metrics_delta)
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                "pending": self._pending,
+                "maxPendingJobs": self.max_pending_jobs,
+                "threadWorkers": self.thread_workers,
+                "processWorkers": self.process_workers,
+                "jobTimeoutSeconds": self.job_timeout,
+                "preloadTensorflow": self.preload_tensorflow
+            }
+
+
+ml_executor = MLExecutor(
+    thread_workers=settings.ML_THREAD_WORKERS,
+    process_workers=settings.ML_PROCESS_WORKERS,
+    max_pending_jobs=settings.ML_MAX_PENDING_JOBS,
+    job_timeout=settings.ML_JOB_TIMEOUT_SECONDS,
+    preload_tensorflow=settings.LSTM_PRELOAD_TENSORFLOW
+)
@@ -0,0 +1,2 @@
+# Benchmark scripts cho ML backend. Chạy từ thư mục backend/, ví dụ:
+#   python -m benchmarks.bench_lstm_inference
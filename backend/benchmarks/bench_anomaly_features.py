@@ -0,0 +1,90 @@
+"""
+So sánh IsolationForestService._extract_features (theo cột) với bản cũ (list dict từng dòng,
+.apply, vòng lặp expanding theo từng danh mục) trên lịch sử 10k / 100k / 1M giao dịch,
+đồng thời kiểm tra hai bản cho ra DataFrame giống nhau.
+
+    python -m benchmarks.bench_anomaly_features --sizes 10000 100000 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.services.isolation_forest_service import IsolationForestService
+from benchmarks.synthetic import generate_transactions
+
+
+def legacy_extract_features(service: IsolationForestService, transactions) -> pd.DataFrame:
+    """Bản _extract_features trước khi vector hóa, giữ lại làm mốc so sánh."""
+    data = []
+    for t in transactions:
+        vn_type_name = service._get_vietnamese_type_name(t.type_name)
+        data.append({
+            'id': t.id, 'money': t.money, 'amount': abs(t.money),
+            'type': t.type, 'type_name': vn_type_name,
+            'date_time': t.date_time,
+            'hour': t.date_time.hour,
+            'weekday': t.date_time.weekday(),
+            'day_of_month': t.date_time.day,
+            'is_expense': t.money < 0
+        })
+
+    if not data: return pd.DataFrame()
+
+    df = pd.DataFrame(data)
+    df = df.sort_values('date_time').reset_index(drop=True)
+
+    df['log_amount'] = np.log1p(df['amount'])
+    df['rolling_mean_7d'] = df['amount'].rolling(window=7, min_periods=1).mean()
+    df['rolling_std_7d'] = df['amount'].rolling(window=7, min_periods=1).std().fillna(1)
+    df['is_month_start'] = df['day_of_month'].apply(lambda x: 1 if x <= 5 else 0)
+
+    for type_name_vn in df['type_name'].unique():
+        mask = df['type_name'] == type_name_vn
+        type_amounts = df.loc[mask, 'amount']
+        df.loc[mask, 'type_mean'] = type_amounts.expanding().mean()
+        df.loc[mask, 'type_std'] = type_amounts.expanding().std().fillna(0)
+
+    df['type_mean'] = df['type_mean'].fillna(df['amount'].mean())
+    df['type_std'] = df['type_std'].fillna(df['amount'].std())
+    df['amount_zscore'] = np.where(df['type_std'] > 0, (df['amount'] - df['type_mean']) / df['type_std'], 0)
+
+    global_mean, global_std = df['amount'].mean(), df['amount'].std()
+    df['global_zscore'] = (df['amount'] - global_mean) / global_std if global_std > 0 else 0
+
+    df['is_unusual_hour'] = df['hour'].apply(lambda x: 1 if x < 6 or x > 23 else 0)
+    df['is_weekend'] = df['weekday'].isin([5, 6]).astype(int)
+    df['daily_count'] = df.groupby(df['date_time'].dt.date)['id'].transform('count')
+    df['daily_total'] = df.groupby(df['date_time'].dt.date)['amount'].transform('sum')
+    return df
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    service = IsolationForestService()
+    print(f"{'n':>9} {'legacy s':>10} {'vector s':>10} {'speedup':>8}  equal")
+    for n in args.sizes:
+        transactions = generate_transactions(n, n_days=max(30, n // 25))
+        legacy_df, legacy_time = _timed(legacy_extract_features, service, transactions)
+        new_df, new_time = _timed(service._extract_features, transactions)
+
+        try:
+            pd.testing.assert_frame_equal(legacy_df, new_df, check_dtype=False, rtol=1e-9)
+            equal = "yes"
+        except AssertionError as e:
+            equal = f"NO ({str(e).splitlines()[0]})"
+        print(f"{n:>9} {legacy_time:>10.2f} {new_time:>10.2f} {legacy_time / new_time:>7.1f}x  {equal}")
+
+
+if __name__ == "__main__":
+    main()
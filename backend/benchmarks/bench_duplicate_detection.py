@@ -0,0 +1,85 @@
+"""
+So sánh phát hiện giao dịch trùng lặp bằng iterrows (bản cũ) và bản vector hóa
+trên khung dữ liệu 10k -> 1M dòng có chèn sẵn bản ghi trùng; in thời gian/1 triệu dòng
+để thấy bản mới tăng tuyến tính, và kiểm tra hai bản trả về cùng kết quả.
+
+    python -m benchmarks.bench_duplicate_detection --sizes 10000 100000 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.services.isolation_forest_service import IsolationForestService
+
+CATEGORIES = ["Ăn uống", "Di chuyển", "Mua sắm", "Thuê nhà", "Vui chơi", "Học phí"]
+
+
+def legacy_detect(df: pd.DataFrame, window_seconds: float = 300):
+    anomalies = []
+    df_sorted = df.sort_values(['type_name', 'amount', 'date_time'])
+    df_sorted['prev_time'] = df_sorted['date_time'].shift(1)
+    df_sorted['prev_amount'] = df_sorted['amount'].shift(1)
+    df_sorted['prev_type'] = df_sorted['type_name'].shift(1)
+
+    for index, row in df_sorted.iterrows():
+        if (row['amount'] == row['prev_amount'] and row['type_name'] == row['prev_type'] and row['amount'] > 0):
+            if pd.notnull(row['prev_time']):
+                diff = (row['date_time'] - row['prev_time']).total_seconds()
+                if diff < window_seconds:
+                    anomalies.append({
+                        'id': row['id'],
+                        'reason': f"Nghi vấn trùng lặp: Giống hệt giao dịch lúc {row['prev_time'].strftime('%H:%M')}",
+                        'score': 1.0,
+                        'severity': 'high'
+                    })
+    return anomalies
+
+
+def make_frame(n: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    start = np.datetime64("2024-01-01T00:00:00")
+    seconds = np.sort(rng.integers(0, max(n, 1) * 600, size=n))
+    df = pd.DataFrame({
+        'id': [f"tx{i}" for i in range(n)],
+        'type_name': np.array(CATEGORIES)[rng.integers(0, len(CATEGORIES), size=n)],
+        'amount': (rng.integers(1, 500, size=n) * 1000).astype(float),
+        'date_time': start + seconds.astype("timedelta64[s]")
+    })
+    # ~1% bản ghi bị nhân đôi cách bản gốc vài chục giây
+    dup_idx = rng.choice(n, size=max(1, n // 100), replace=False)
+    dups = df.iloc[dup_idx].copy()
+    dups['id'] = dups['id'] + "_dup"
+    dups['date_time'] = dups['date_time'] + pd.to_timedelta(rng.integers(1, 120, size=len(dups)), unit="s")
+    return pd.concat([df, dups], ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--legacy-max", type=int, default=200_000, help="Bỏ qua bản cũ khi n lớn hơn giá trị này")
+    args = parser.parse_args()
+
+    service = IsolationForestService()
+    print(f"{'n':>9} {'legacy s':>10} {'vector s':>10} {'vector s/1M':>12} {'dups':>7}  equal")
+    for n in args.sizes:
+        df = make_frame(n)
+
+        start = time.perf_counter()
+        result = service._detect_logical_anomalies(df, window_seconds=300)
+        vector_time = time.perf_counter() - start
+
+        if n <= args.legacy_max:
+            start = time.perf_counter()
+            expected = legacy_detect(df, window_seconds=300)
+            legacy_time = f"{time.perf_counter() - start:>10.2f}"
+            equal = "yes" if expected == result else "NO"
+        else:
+            legacy_time, equal = f"{'-':>10}", "-"
+
+        print(f"{n:>9} {legacy_time} {vector_time:>10.3f} {vector_time / len(df) * 1e6:>12.3f} {len(result):>7}  {equal}")
+
+
+if __name__ == "__main__":
+    main()
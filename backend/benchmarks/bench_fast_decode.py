@@ -0,0 +1,60 @@
+"""
+So sánh 2 đường nhận request: Pydantic (PredictionRequest -> List[SpendingItem] -> frame)
+và đường /fast (orjson/json -> cột -> frame, kiểm tra theo cột), kiểm tra hai frame giống nhau.
+
+    python -m benchmarks.bench_fast_decode --sizes 10000 100000
+"""
+import argparse
+import json
+import time
+
+from app.schemas.spending import PredictionRequest
+from app.services.transaction_frame import (
+    ORJSON_AVAILABLE, build_transaction_frame, decode_transaction_frame, loads_json
+)
+from benchmarks.synthetic import generate_transactions
+
+
+def pydantic_path(body: bytes):
+    request = PredictionRequest.model_validate_json(body)
+    return build_transaction_frame(request.transactions)
+
+
+def fast_path(body: bytes):
+    payload = loads_json(body)
+    return decode_transaction_frame(payload["transactions"])
+
+
+def best_of(fn, body: bytes, repeat: int):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(body)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"JSON decoder: {'orjson' if ORJSON_AVAILABLE else 'json (stdlib)'}")
+    print(f"{'n':>8} {'body MB':>8} {'pydantic ms':>12} {'fast ms':>9} {'speedup':>8}  equal")
+    for n in args.sizes:
+        transactions = generate_transactions(n, n_days=max(30, n // 50), seed=1)
+        body = json.dumps({
+            "userId": "bench",
+            "transactions": [t.model_dump(mode="json", by_alias=True) for t in transactions],
+            "predictionDays": 7
+        }).encode("utf-8")
+
+        expected, slow = best_of(pydantic_path, body, args.repeat)
+        actual, fast = best_of(fast_path, body, args.repeat)
+        equal = expected.equals(actual)
+        print(f"{n:>8} {len(body) / 1e6:>8.1f} {slow * 1000:>12.1f} {fast * 1000:>9.1f} {slow / fast:>7.1f}x  {'yes' if equal else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
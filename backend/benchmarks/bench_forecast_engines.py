@@ -0,0 +1,72 @@
+"""
+So sánh các engine dự báo trên series theo ngày giả lập (chi tiêu có chu kỳ tuần + xu hướng + ngày
+không chi, thu nhập có lương theo tháng + khoản lẻ): giữ lại `horizon` ngày cuối làm tập kiểm tra,
+đo sai số tuyệt đối trung bình chia cho mức trung bình lịch sử (scaled MAE) và thời gian fit + dự báo.
+Engine trả rỗng (lịch sử quá ngắn) được tính theo fallback Holt như trong LSTMService.
+
+    python -m benchmarks.bench_forecast_engines --series 200 --horizon 14
+    python -m benchmarks.bench_forecast_engines --engines holt ridge_ar lstm --series 20
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.services.forecast_engines import available_engines, holt_forecast
+from app.services.lstm_service import LSTMService
+
+WEEKLY_PROFILE = np.array([1.0, 0.9, 0.95, 1.0, 1.3, 1.8, 1.6])
+
+
+def make_series(rng: np.random.Generator, n_days: int):
+    t = np.arange(n_days)
+    weekly = WEEKLY_PROFILE[(t + rng.integers(7)) % 7]
+    level = rng.uniform(1e5, 5e5) * (1 + rng.uniform(-0.3, 0.5) * t / n_days)
+    expense = level * weekly * rng.lognormal(0, 0.5, n_days) * (rng.random(n_days) > 0.1)
+
+    income = np.zeros(n_days)
+    income[t % 30 == rng.integers(1, 28)] = rng.uniform(8e6, 2e7)
+    income += (rng.random(n_days) < 0.05) * rng.uniform(1e5, 2e6, n_days)
+    return {"expense": expense, "income": income}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engines", nargs="+", default=["holt", "ridge_ar"], choices=available_engines())
+    parser.add_argument("--series", type=int, default=200, help="số user giả lập (mỗi user 2 series)")
+    parser.add_argument("--horizon", type=int, default=14)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    service = LSTMService()
+    service.registry = None
+    rng = np.random.default_rng(args.seed)
+    dataset = [make_series(rng, int(rng.integers(40, 400))) for _ in range(args.series)]
+
+    errors = {(e, kind): [] for e in args.engines for kind in ("expense", "income")}
+    elapsed = {e: 0.0 for e in args.engines}
+    fallbacks = {e: 0 for e in args.engines}
+    for user in dataset:
+        for kind, values in user.items():
+            train, actual = values[:-args.horizon], values[-args.horizon:]
+            scale = np.mean(train) + 1.0
+            for name in args.engines:
+                engine = service.get_engine(name)
+                start = time.perf_counter()
+                preds, _ = engine.forecast(train, args.horizon)
+                elapsed[name] += time.perf_counter() - start
+                if not preds:
+                    fallbacks[name] += 1
+                    preds, _ = holt_forecast(train, args.horizon)
+                errors[(name, kind)].append(np.mean(np.abs(np.asarray(preds) - actual)) / scale)
+
+    total = 2 * len(dataset)
+    print(f"{total} series, horizon {args.horizon} days (scaled MAE, lower is better)")
+    print(f"{'engine':>10} {'expense':>9} {'income':>9} {'ms/series':>10} {'fallback':>9}")
+    for name in args.engines:
+        print(f"{name:>10} {np.mean(errors[(name, 'expense')]):>9.3f} {np.mean(errors[(name, 'income')]):>9.3f} "
+              f"{elapsed[name] / total * 1000:>10.2f} {fallbacks[name]:>9}")
+
+
+if __name__ == "__main__":
+    main()
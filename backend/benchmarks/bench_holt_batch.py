@@ -0,0 +1,52 @@
+"""
+Dự báo Holt cho nhiều series: vòng lặp holt_forecast từng series (Python thuần theo từng ngày)
+so với holt_forecast_batch (một mảng số series x số ngày, vector hóa theo series).
+Độ dài lịch sử ngẫu nhiên 30..365 ngày, có ngày không phát sinh; kiểm tra hai cách cho cùng kết quả.
+
+    python -m benchmarks.bench_holt_batch --series 1000 10000 --days 7
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.services.forecast_engines import holt_forecast, holt_forecast_batch, pad_series
+
+
+def make_series(n_series: int, seed: int = 1):
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(30, 366, size=n_series)
+    return [rng.lognormal(11.5, 0.9, n) * (rng.random(n) > 0.3) for n in lengths]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--series", type=int, nargs="+", default=[1_000, 10_000])
+    parser.add_argument("--days", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"{'series':>8} {'loop ms':>9} {'batch ms':>9} {'(pad ms)':>9} {'speedup':>8}  equal")
+    for n in args.series:
+        series = make_series(n)
+
+        start = time.perf_counter()
+        expected = [holt_forecast(s, args.days) for s in series]
+        loop = time.perf_counter() - start
+
+        start = time.perf_counter()
+        values, lengths = pad_series(series)
+        padded = time.perf_counter() - start
+        preds, confidences = holt_forecast_batch(values, lengths, args.days)
+        batch = time.perf_counter() - start
+
+        equal = all(
+            np.allclose(p, preds[i], rtol=1e-9) and c == confidences[i] for i, (p, c) in enumerate(expected)
+        )
+        print(f"{n:>8} {loop * 1000:>9.1f} {batch * 1000:>9.1f} {padded * 1000:>9.1f} {loop / batch:>7.1f}x  "
+              f"{'yes' if equal else 'NO'}")
+        if not equal:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
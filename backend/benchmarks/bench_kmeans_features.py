@@ -0,0 +1,66 @@
+"""
+So sánh KMeansService._extract_features bản cũ (lặp từng giao dịch, gắn cờ nhóm bằng df.apply(check_group)
+3 lần) với bản mới (theo cột trên transaction frame, cờ nhóm tra theo mã factorize).
+Đồng thời kiểm tra hồi quy: mọi cột đặc trưng và kết quả phân cụm (transactionIds từng cụm) phải giống hệt
+bản cũ, cả với lịch sử lẫn lộn offset múi giờ (cột "tz"). Thoát với mã 1 nếu có khác biệt.
+
+    python -m benchmarks.bench_kmeans_features --sizes 10000 100000 1000000
+"""
+import argparse
+import sys
+import time
+
+from app.services.kmeans_service import KMeansService
+from tests.helpers import LegacyKMeansService, assert_features_equal, make_transactions
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--legacy-max", type=int, default=200_000, help="Bỏ qua bản cũ khi n lớn hơn giá trị này")
+    parser.add_argument("--cluster-max", type=int, default=20_000, help="Chỉ so sánh phân cụm đầy đủ khi n <= giá trị này")
+    args = parser.parse_args()
+
+    service, legacy = KMeansService(), LegacyKMeansService()
+    failed = False
+
+    print(f"{'n':>9} {'tz':>5} {'legacy s':>10} {'new s':>8} {'speedup':>8}  features  clusters")
+    for n in args.sizes:
+        for mixed_tz in (False, True):
+            transactions = make_transactions(n, mixed_tz=mixed_tz)
+            new_df, new_time = timed(service._extract_features, transactions)
+
+            legacy_time, speedup, features_ok = "-", "-", "-"
+            if n <= args.legacy_max:
+                legacy_df, t = timed(legacy._extract_features, transactions)
+                legacy_time, speedup = f"{t:.2f}", f"{t / new_time:.1f}x"
+                try:
+                    assert_features_equal(legacy_df, new_df)
+                    features_ok = "yes"
+                except AssertionError as e:
+                    features_ok = "NO"
+                    print(e)
+
+            clusters_ok = "-"
+            if n <= args.cluster_max:
+                expected = legacy.cluster_spending("bench", transactions).model_dump(by_alias=True)
+                actual = service.cluster_spending("bench", transactions).model_dump(by_alias=True)
+                clusters_ok = "yes" if expected == actual else "NO"
+
+            failed |= "NO" in (features_ok, clusters_ok)
+            tz = "mixed" if mixed_tz else "naive"
+            print(f"{n:>9} {tz:>5} {legacy_time:>10} {new_time:>8.2f} {speedup:>8}  {features_ok:>8}  {clusters_ok:>8}")
+
+    if failed:
+        print("Kết quả khác bản cũ!")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
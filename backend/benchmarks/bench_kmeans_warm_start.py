@@ -0,0 +1,65 @@
+"""
+Đo lợi ích warm-start K-Means: user gửi lại toàn bộ lịch sử mỗi lần, chỉ thêm vài giao dịch mới.
+So sánh fit từ đầu (n_init=10) với warm-start từ tâm cụm cache (n_init=1) qua nhiều vòng,
+kèm độ tương đồng nhãn (Adjusted Rand Index) và tỉ lệ inertia giữa hai cách.
+
+    python -m benchmarks.bench_kmeans_warm_start --history 1000 10000 100000 --rounds 10 --new 20
+"""
+import argparse
+import time
+
+import numpy as np
+from sklearn.metrics import adjusted_rand_score
+
+from app.services.kmeans_service import KMeansService
+from benchmarks.synthetic import generate_transactions
+
+
+def inertia(service: KMeansService, df, labels) -> float:
+    X = df[service.FEATURE_COLUMNS].values.astype(float)
+    X = (X - X.mean(axis=0)) / np.where(X.std(axis=0) > 0, X.std(axis=0), 1.0)
+    return float(sum(((X[labels == c] - X[labels == c].mean(axis=0)) ** 2).sum() for c in np.unique(labels)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--history", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--new", type=int, default=20, help="Số giao dịch mới thêm vào mỗi vòng")
+    args = parser.parse_args()
+
+    print(f"{'history':>8} {'cold ms':>9} {'warm ms':>9} {'speedup':>8} {'ARI':>6} {'inertia w/c':>12}")
+    for n in args.history:
+        transactions = generate_transactions(n + args.rounds * args.new, n_days=max(30, n // 20), seed=7)
+
+        cold, warm = KMeansService(), KMeansService()
+        cold.warm_start = False
+        warm.warm_start = True
+
+        # Vòng 0: warm service fit từ đầu và lưu tâm cụm
+        df = warm._extract_features(transactions[:n])
+        n_clusters = max(3, min(6, len(df) // 5))
+        warm._fit_clusters("bench", df, n_clusters)
+
+        cold_times, warm_times, aris, ratios = [], [], [], []
+        for r in range(1, args.rounds + 1):
+            df = warm._extract_features(transactions[:n + r * args.new])
+
+            start = time.perf_counter()
+            cold_labels = cold._fit_clusters("bench", df, n_clusters)
+            cold_times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            warm_labels = warm._fit_clusters("bench", df, n_clusters)
+            warm_times.append(time.perf_counter() - start)
+
+            aris.append(adjusted_rand_score(cold_labels, warm_labels))
+            ratios.append(inertia(warm, df, warm_labels) / inertia(cold, df, cold_labels))
+
+        cold_ms, warm_ms = np.median(cold_times) * 1000, np.median(warm_times) * 1000
+        print(f"{n:>8} {cold_ms:>9.1f} {warm_ms:>9.1f} {cold_ms / warm_ms:>7.1f}x {np.mean(aris):>6.3f} {np.mean(ratios):>12.4f}")
+        print(f"{'':>8} cache: {warm.centroid_cache.get_stats()}")
+
+
+if __name__ == "__main__":
+    main()
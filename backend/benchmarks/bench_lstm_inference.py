@@ -0,0 +1,65 @@
+"""
+So sánh độ trễ mỗi request /predict/trend giữa các chế độ suy luận LSTM
+(model.predict từng ngày vs gọi model trực tiếp vs vòng lặp biên dịch bằng tf.function).
+
+Model được train 1 lần vào registry tạm nên thời gian đo chỉ gồm suy luận + dựng response.
+
+    python -m benchmarks.bench_lstm_inference --days 7 30 --repeat 5
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from app.services.lstm_service import LSTMService, TF_AVAILABLE
+from app.services.model_registry import LSTMModelRegistry
+from benchmarks.synthetic import generate_transactions
+
+MODES = ["predict", "call", "graph"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, nargs="+", default=[7, 30])
+    parser.add_argument("--transactions", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if not TF_AVAILABLE:
+        print("TensorFlow chưa được cài đặt - bỏ qua benchmark.")
+        return
+
+    transactions = generate_transactions(args.transactions, n_days=180)
+
+    with tempfile.TemporaryDirectory() as model_dir:
+        service = LSTMService()
+        service.registry = LSTMModelRegistry(root_dir=model_dir)
+
+        # Train sẵn model cho cả 2 series
+        service.predict_trend("bench", transactions, max(args.days))
+
+        print(f"{'mode':>8} {'days':>5} {'mean ms':>10} {'min ms':>10}")
+        reference = {}
+        for days in args.days:
+            for mode in MODES:
+                service.inference_mode = mode
+                result = service.predict_trend("bench", transactions, days)  # warm-up / trace
+                timings = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    service.predict_trend("bench", transactions, days)
+                    timings.append((time.perf_counter() - start) * 1000)
+                print(f"{mode:>8} {days:>5} {np.mean(timings):>10.1f} {np.min(timings):>10.1f}")
+
+                expenses = np.array([p.predicted_expense for p in result.predictions])
+                if days not in reference:
+                    reference[days] = expenses
+                elif not np.allclose(reference[days], expenses, rtol=1e-3, atol=1.0):
+                    print(f"  [WARN] {mode} lệch so với 'predict' (max diff {np.max(np.abs(reference[days] - expenses)):.1f})")
+
+        print(f"registry: {service.get_registry_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+So sánh cách đọc giao dịch thô của các endpoint /quick: vòng lặp cũ (thử 3 định dạng strptime +
+tạo SpendingItem từng dòng, nuốt lỗi) với parse_raw_transactions (đọc theo cột, báo dòng bị loại).
+Dữ liệu trộn 3 định dạng ngày giờ và ~1% dòng lỗi; kiểm tra hai cách giữ lại cùng một frame.
+
+    python -m benchmarks.bench_raw_parsing --sizes 10000 100000
+"""
+import argparse
+import time
+from datetime import datetime
+
+import numpy as np
+
+from app.schemas.spending import SpendingItem
+from app.services.raw_transactions import parse_raw_transactions
+from app.services.transaction_frame import build_transaction_frame
+from benchmarks.synthetic import generate_transactions
+
+
+def legacy_parse(transactions):
+    """Vòng lặp của quick_predict / quick_cluster trước khi dùng parse_raw_transactions."""
+    spending_items = []
+    for t in transactions:
+        try:
+            dt = t.get('dateTime') or t.get('date_time')
+            if isinstance(dt, str):
+                for fmt in ['%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d']:
+                    try:
+                        dt = datetime.strptime(dt, fmt)
+                        break
+                    except ValueError:
+                        continue
+
+            spending_items.append(SpendingItem(
+                id=t.get('id', ''),
+                money=int(t.get('money', 0)),
+                type=int(t.get('type', 0)),
+                typeName=t.get('typeName') or t.get('type_name', 'Other'),
+                note=t.get('note'),
+                dateTime=dt,
+                image=t.get('image'),
+                location=t.get('location')
+            ))
+        except Exception:
+            continue
+    return build_transaction_frame(spending_items)
+
+
+def make_raw_rows(n: int, seed: int = 1):
+    rng = np.random.default_rng(seed)
+    rows = [t.model_dump(mode="json", by_alias=True) for t in generate_transactions(n, n_days=max(30, n // 50), seed=seed)]
+    for i, fmt in enumerate(rng.integers(0, 3, size=n)):
+        dt = datetime.fromisoformat(rows[i]['dateTime'])
+        rows[i]['dateTime'] = dt.strftime(('%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d')[fmt])
+    for i in rng.choice(n, size=max(1, n // 100), replace=False):
+        rows[i] = {**rows[i], **(({'money': 'n/a'}, {'dateTime': '31/12/2024'}, {'dateTime': None})[i % 3])}
+    return rows
+
+
+def best_of(fn, rows, repeat: int):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(rows)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'n':>8} {'legacy ms':>10} {'columnar ms':>12} {'speedup':>8} {'rejected':>9}  equal")
+    for n in args.sizes:
+        rows = make_raw_rows(n)
+        expected, slow = best_of(legacy_parse, rows, args.repeat)
+        (actual, report), fast = best_of(parse_raw_transactions, rows, args.repeat)
+        equal = expected.reset_index(drop=True).equals(actual)
+        print(f"{n:>8} {slow * 1000:>10.1f} {fast * 1000:>12.1f} {slow / fast:>7.1f}x {report['rejected']:>9}  {'yes' if equal else 'NO'}")
+        if not equal:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Đo thời gian mã hóa response phân cụm (ClusteringResponse có transactionIds của mọi giao dịch):
+- cách cũ: trả model -> jsonable_encoder -> JSONResponse (json chuẩn)
+- FastJSONResponse: model_dump(mode="json") -> orjson, không qua jsonable_encoder
+- các chế độ transactionIdsMode: omit / ranges / page
+Kiểm tra cách mới cho ra cùng nội dung JSON với cách cũ.
+
+    python -m benchmarks.bench_response_serialization --sizes 100000
+"""
+import argparse
+import json
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.services.cluster_ids import shape_transaction_ids
+from app.services.kmeans_service import KMeansService
+from app.services.transaction_frame import ORJSON_AVAILABLE
+from app.services.transport import FastJSONResponse
+from benchmarks.synthetic import generate_transactions
+
+
+def best_of(fn, repeat: int):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"JSON encoder: {'orjson' if ORJSON_AVAILABLE else 'json (stdlib)'}")
+    service = KMeansService()
+    service.warm_start = False
+    for n in args.sizes:
+        transactions = generate_transactions(n, n_days=max(30, n // 50), seed=1)
+        request_ids = [t.id for t in transactions]
+        result = service.cluster_spending("bench", transactions)
+
+        legacy, legacy_time = best_of(lambda: JSONResponse(jsonable_encoder(result)).body, args.repeat)
+        cases = {
+            "full": lambda: FastJSONResponse(result.model_dump(mode="json", by_alias=True)).body,
+        }
+        for mode in ("omit", "ranges", "page"):
+            cases[mode] = lambda mode=mode: FastJSONResponse(shape_transaction_ids(
+                result.model_dump(mode="json", by_alias=True), mode, request_ids
+            )).body
+
+        print(f"\nn = {n} ({sum(len(c.transaction_ids) for c in result.clusters)} transactionIds)")
+        print(f"{'variant':>16} {'ms':>8} {'speedup':>8} {'KB':>9}")
+        print(f"{'legacy (json)':>16} {legacy_time * 1000:>8.1f} {'1.0x':>8} {len(legacy) / 1024:>9.1f}")
+        for name, fn in cases.items():
+            body, elapsed = best_of(fn, args.repeat)
+            print(f"{name:>16} {elapsed * 1000:>8.1f} {legacy_time / elapsed:>7.1f}x {len(body) / 1024:>9.1f}")
+            if name == "full" and json.loads(body) != json.loads(legacy):
+                print("  !! full response differs from legacy serialization")
+                raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
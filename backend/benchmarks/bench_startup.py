@@ -0,0 +1,66 @@
+"""
+Đo chi phí khởi động service: thời gian `import main` và RSS đỉnh của process, mỗi lần đo là một
+process Python mới (cache import không ảnh hưởng nhau).
+- lazy:  mặc định, TensorFlow chưa được import cho tới job LSTM đầu tiên
+- eager: import main rồi nạp TensorFlow ngay (tương đương hành vi cũ / LSTM_PRELOAD_TENSORFLOW=true)
+
+    python -m benchmarks.bench_startup --repeat 3
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import main
+if sys.argv[1] == "eager":
+    from app.services.lstm_service import load_tensorflow
+    load_tensorflow()
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    "seconds": elapsed,
+    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "tensorflow_loaded": "tensorflow" in sys.modules
+}))
+"""
+
+
+def measure(mode: str) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", PROBE, mode],
+        capture_output=True, text=True, check=True, env={**os.environ, "TF_CPP_MIN_LOG_LEVEL": "3"}
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'mode':>6} {'import s':>9} {'peak RSS MB':>12}  tensorflow loaded")
+    results = {}
+    for mode in ("lazy", "eager"):
+        runs = [measure(mode) for _ in range(args.repeat)]
+        results[mode] = {
+            "seconds": statistics.median(r["seconds"] for r in runs),
+            "rss": statistics.median(r["peak_rss_mb"] for r in runs),
+            "tf": runs[-1]["tensorflow_loaded"]
+        }
+        r = results[mode]
+        print(f"{mode:>6} {r['seconds']:>9.2f} {r['rss']:>12.1f}  {'yes' if r['tf'] else 'no'}")
+
+    lazy, eager = results["lazy"], results["eager"]
+    print(f"\nlazy import: {eager['seconds'] / lazy['seconds']:.1f}x faster startup, "
+          f"{eager['rss'] - lazy['rss']:.0f} MB less peak RSS")
+    if lazy["tf"]:
+        print("  !! `import main` still imports tensorflow")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+So sánh kích thước body và thời gian server giải mã (giải nén + decode + frame) giữa các định dạng upload
+của endpoint /fast: JSON theo dòng, JSON gzip, MessagePack theo cột (+ zstd), Arrow IPC.
+Các định dạng thiếu thư viện (msgpack / pyarrow / zstandard) được bỏ qua.
+
+    python -m benchmarks.bench_transport --sizes 10000 100000
+"""
+import argparse
+import gzip
+import json
+import time
+
+from app.services.transaction_frame import decode_transaction_columns, decode_transaction_frame
+from app.services import transport
+from app.services.transport import (
+    MEDIA_ARROW, MEDIA_JSON, MEDIA_MSGPACK, decode_payload, decompress_body
+)
+from benchmarks.synthetic import generate_transactions
+
+COLUMNS = ["id", "money", "type", "typeName", "dateTime"]
+
+
+def build_bodies(rows, params):
+    """(tên, body, Content-Type, Content-Encoding) cho từng định dạng có thể dựng được."""
+    columns = {key: [row[key] for row in rows] for key in COLUMNS}
+    json_body = json.dumps({**params, "transactions": rows}).encode("utf-8")
+    bodies = [
+        ("json", json_body, MEDIA_JSON, None),
+        ("json+gzip", gzip.compress(json_body, compresslevel=6), MEDIA_JSON, "gzip"),
+    ]
+    if transport.MSGPACK_AVAILABLE:
+        packed = transport.msgpack.packb({**params, "transactions": columns}, use_bin_type=True)
+        bodies.append(("msgpack-cols", packed, MEDIA_MSGPACK, None))
+        bodies.append(("msgpack-cols+gzip", gzip.compress(packed, compresslevel=6), MEDIA_MSGPACK, "gzip"))
+        if transport.ZSTD_AVAILABLE:
+            bodies.append(("msgpack-cols+zstd", transport.zstandard.ZstdCompressor().compress(packed), MEDIA_MSGPACK, "zstd"))
+    if transport.ARROW_AVAILABLE:
+        pa = transport.pa
+        table = pa.table(columns).replace_schema_metadata({transport.ARROW_PARAMS_KEY: json.dumps(params)})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        bodies.append(("arrow", sink.getvalue().to_pybytes(), MEDIA_ARROW, None))
+    return bodies
+
+
+def server_decode(body, content_type, content_encoding):
+    payload = decode_payload(decompress_body(body, content_encoding), content_type)
+    items = payload["transactions"]
+    return decode_transaction_columns(items) if isinstance(items, dict) else decode_transaction_frame(items)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    params = {"userId": "bench", "predictionDays": 7}
+    for n in args.sizes:
+        transactions = generate_transactions(n, n_days=max(30, n // 50), seed=1)
+        rows = [t.model_dump(mode="json", by_alias=True) for t in transactions]
+        bodies = build_bodies(rows, params)
+        expected = server_decode(*bodies[0][1:])
+
+        print(f"\nn = {n}")
+        print(f"{'format':>18} {'body KB':>9} {'vs json':>8} {'decode ms':>10}  equal")
+        json_size = len(bodies[0][1])
+        for name, body, content_type, content_encoding in bodies:
+            best = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                frame = server_decode(body, content_type, content_encoding)
+                best = min(best, time.perf_counter() - start)
+            equal = frame.equals(expected)
+            print(
+                f"{name:>18} {len(body) / 1024:>9.1f} {len(body) / json_size:>7.0%} "
+                f"{best * 1000:>10.1f}  {'yes' if equal else 'NO'}"
+            )
+
+
+if __name__ == "__main__":
+    main()
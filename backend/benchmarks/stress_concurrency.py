@@ -0,0 +1,44 @@
+"""
+Stress test đồng thời cho các service singleton: bắn hàng trăm lời gọi song song
+(predict_trend, cluster_spending, detect_anomalies) và so sánh với kết quả chạy tuần tự.
+Thoát với mã 1 nếu có bất kỳ kết quả nào khác.
+
+Warm-start K-Means vẫn BẬT ở lượt song song (lượt đầu mỗi user fit nguội, các lượt sau warm-start từ tâm
+lượt trước, tùy thứ tự thread). Kết quả tham chiếu tuần tự chạy với warm start TẮT; warm start chỉ được
+đổi thứ tự / số hiệu cụm nên chỉ so sánh các trường không phụ thuộc thứ tự (order_independent).
+Cũng chạy như test: tests/test_concurrency.py (make_jobs / run_stress ở tests/helpers.py).
+
+Lịch sử mặc định ngắn (< min_samples_for_dl ngày) để LSTMService đi nhánh thống kê;
+dùng --days lớn hơn để ép nhánh LSTM (chậm hơn nhiều).
+
+    python -m benchmarks.stress_concurrency --calls 300 --threads 32
+"""
+import argparse
+import sys
+
+from app.services.kmeans_service import kmeans_service
+from tests.helpers import make_jobs, run_stress
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=300)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--datasets", type=int, default=12)
+    parser.add_argument("--days", type=int, default=30)
+    args = parser.parse_args()
+
+    kmeans_service.warm_start = True
+    jobs = make_jobs(args.calls, args.datasets, args.days)
+    mismatches, n_expected, serial_time, parallel_time = run_stress(jobs, args.threads)
+
+    print(f"{len(jobs)} lời gọi song song / {args.threads} thread: {parallel_time:.2f}s "
+          f"(tuần tự {n_expected} job khác nhau: {serial_time:.2f}s)")
+    if mismatches:
+        print(f"FAIL: {len(mismatches)} kết quả khác với chạy tuần tự, ví dụ: {mismatches[:5]}")
+        sys.exit(1)
+    print("OK: mọi kết quả song song trùng khớp với chạy tuần tự")
+
+
+if __name__ == "__main__":
+    main()
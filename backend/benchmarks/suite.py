@@ -0,0 +1,172 @@
+"""
+Bộ benchmark chung cho cả 3 service trên lịch sử giao dịch giả lập "thật" (generate_realistic_frame:
+nhóm danh mục theo CATEGORY_GROUPS, chu kỳ ngày / tuần / tháng, có giao dịch trùng và outlier):
+predict_trend (LSTMService), cluster_spending (KMeansService), detect_anomalies (IsolationForestService)
+ở nhiều cỡ dữ liệu. Mỗi ca đo thời gian (tốt nhất của --repeat lần, cỡ >= 100k chỉ chạy 1 lần) và bộ nhớ đỉnh
+(tracemalloc: cấp phát Python + NumPy trong lần gọi, không tính TensorFlow) ở 1 lần chạy riêng.
+
+Lưu kết quả làm baseline rồi so sánh ở lần chạy sau; ca chậm hơn / tốn bộ nhớ hơn quá --tolerance
+bị đánh dấu REGRESSION và lệnh trả mã thoát 1 (dùng được trong CI). Baseline phụ thuộc máy, không commit.
+
+    python -m benchmarks.suite --sizes 100 1000 10000 --engine ridge_ar --save-baseline /tmp/baseline.json
+    python -m benchmarks.suite --sizes 100 1000 10000 --engine ridge_ar --baseline /tmp/baseline.json
+    python -m benchmarks.suite --services kmeans anomaly --sizes 1000000 --input frame
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import sklearn
+
+from app.services.forecast_engines import available_engines
+from app.services.isolation_forest_service import IsolationForestService
+from app.services.kmeans_service import KMeansService
+from app.services.lstm_service import LSTMService
+from app.services.raw_transactions import frame_to_items
+from benchmarks.synthetic import generate_realistic_frame
+
+DEFAULT_SIZES = [100, 1_000, 10_000, 100_000, 1_000_000]
+SERVICES = ("lstm", "kmeans", "anomaly")
+SINGLE_RUN_FROM = 100_000
+
+
+# ==============================================================================
+# 1. CÁC CA ĐO
+# ==============================================================================
+def make_runners(engine):
+    """Service mới, không cache / warm start / registry LSTM để mọi lần chạy đo cùng một việc."""
+    lstm = LSTMService()
+    lstm.registry = None
+    kmeans = KMeansService()
+    kmeans.warm_start = False
+    forest = IsolationForestService()
+
+    def run_lstm(frame, items):
+        result = lstm.predict_trend("bench", items, prediction_days=7, frame=frame, engine=engine)
+        return result.summary.get("forecastEngine", {}).get("expense", "-")
+
+    def run_kmeans(frame, items):
+        return f"{len(kmeans.cluster_spending('bench', items, frame=frame).clusters)} clusters"
+
+    def run_anomaly(frame, items):
+        if frame is not None:
+            frame = frame[frame['money'] < 0]
+        else:
+            items = [t for t in items if t.money < 0]
+        return f"{forest.detect_anomalies('bench', items, frame=frame).anomalies_detected} anomalies"
+
+    return {"lstm": run_lstm, "kmeans": run_kmeans, "anomaly": run_anomaly}
+
+
+def measure(run, frame, items, repeat: int, track_memory: bool):
+    """1 lần chạy nháp (lazy import, cache) -> bấm giờ -> cuối cùng mới đo bộ nhớ, vì tracemalloc làm lệch các lần chạy sau nó."""
+    if repeat > 1:
+        run(frame, items)
+    best, detail = np.inf, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        detail = run(frame, items)
+        best = min(best, time.perf_counter() - start)
+
+    peak_mb = None
+    if track_memory:
+        tracemalloc.start()
+        try:
+            run(frame, items)
+            peak_mb = tracemalloc.get_traced_memory()[1] / 1e6
+        finally:
+            tracemalloc.stop()
+    return best, peak_mb, detail
+
+
+# ==============================================================================
+# 2. BASELINE
+# ==============================================================================
+def environment(args) -> dict:
+    return {
+        "engine": args.engine, "input": args.input, "seed": args.seed,
+        "python": platform.python_version(), "numpy": np.__version__, "sklearn": sklearn.__version__,
+        "machine": platform.machine(), "processor": platform.processor() or platform.machine()
+    }
+
+
+def compare(result: dict, base: dict, tolerance: float, min_seconds: float, min_mb: float):
+    """Tỷ lệ so với baseline + danh sách chỉ số vượt ngưỡng (bỏ qua chênh lệch tuyệt đối quá nhỏ / nhiễu)."""
+    ratios, regressions = {}, []
+    for key, floor in (("seconds", min_seconds), ("peakMb", min_mb)):
+        new, old = result.get(key), base.get(key)
+        if new is None or not old:
+            continue
+        ratios[key] = new / old
+        if new > old * (1 + tolerance) and new - old > floor:
+            regressions.append(key)
+    return ratios, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--services", nargs="+", default=list(SERVICES), choices=SERVICES)
+    parser.add_argument("--engine", default=None, choices=available_engines(), help="engine dự báo cho lstm (mặc định FORECAST_ENGINE)")
+    parser.add_argument("--input", default="frame", choices=["frame", "objects"],
+                        help="frame: đường /fast, batch; objects: list SpendingItem như API JSON")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-memory", action="store_true", help="bỏ lần chạy đo bộ nhớ (tracemalloc làm chậm 2-3 lần)")
+    parser.add_argument("--save-baseline", metavar="PATH", help="ghi kết quả lần chạy này ra file JSON")
+    parser.add_argument("--baseline", metavar="PATH", help="so sánh với baseline đã lưu")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="ngưỡng chậm hơn / tốn hơn cho phép (0.25 = 25%%)")
+    parser.add_argument("--min-seconds", type=float, default=0.01, help="bỏ qua chênh lệch thời gian nhỏ hơn mức này")
+    parser.add_argument("--min-mb", type=float, default=1.0, help="bỏ qua chênh lệch bộ nhớ nhỏ hơn mức này")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        for key in ("engine", "input", "seed"):
+            if baseline["environment"].get(key) != getattr(args, key):
+                print(f"warning: baseline {key}={baseline['environment'].get(key)!r}, this run {getattr(args, key)!r}")
+
+    runners = make_runners(args.engine)
+    results, regressions = {}, []
+    print(f"{'service':>8} {'n':>9} {'seconds':>9} {'peak MB':>9} {'vs base':>15}  detail")
+    for n in args.sizes:
+        frame = generate_realistic_frame(n, seed=args.seed)
+        items = frame_to_items(frame) if args.input == "objects" else None
+        run_frame = frame if args.input == "frame" else None
+        for service in args.services:
+            key = f"{service}/{n}"
+            repeat = 1 if n >= SINGLE_RUN_FROM else args.repeat
+            seconds, peak_mb, detail = measure(runners[service], run_frame, items, repeat, not args.no_memory)
+            results[key] = {"seconds": round(seconds, 6), "peakMb": None if peak_mb is None else round(peak_mb, 3)}
+
+            versus, flag = "", ""
+            base = (baseline or {}).get("results", {}).get(key)
+            if base:
+                ratios, failed = compare(results[key], base, args.tolerance, args.min_seconds, args.min_mb)
+                versus = " ".join(f"{'t' if k == 'seconds' else 'm'}x{v:.2f}" for k, v in ratios.items())
+                if failed:
+                    flag = "  REGRESSION (" + ", ".join(failed) + ")"
+                    regressions.append(key)
+            memory = "-" if peak_mb is None else f"{peak_mb:.1f}"
+            print(f"{service:>8} {n:>9} {seconds:>9.4f} {memory:>9} {versus:>15}  {detail}{flag}", flush=True)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump({"createdAt": datetime.now().isoformat(timespec="seconds"),
+                       "environment": environment(args), "results": results}, f, indent=2)
+        print(f"baseline saved to {args.save_baseline}")
+
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
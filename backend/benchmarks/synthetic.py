@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+from typing import List, Optional
+
+from app.schemas.spending import SpendingItem
+# Lịch sử giả lập đơn giản dùng chung với test (định nghĩa ở tests/helpers.py)
+from tests.helpers import generate_transactions  # noqa: F401
+
+
+# ==============================================================================
+# LỊCH SỬ GIAO DỊCH "THẬT" HƠN CHO BENCHMARK SUITE
+# ==============================================================================
+# Tỷ trọng số giao dịch chi theo nhóm danh mục của KMeansService.CATEGORY_GROUPS + phân phối số tiền (lognormal)
+EXPENSE_GROUP_MIX = {"essential": 0.62, "entertainment": 0.25, "investment": 0.04, "other": 0.09}
+GROUP_AMOUNT = {"essential": (11.0, 0.7), "entertainment": (11.8, 0.9), "investment": (14.5, 0.8), "other": (11.2, 1.0)}
+# Hóa đơn cố định đầu tháng: (danh mục, ngày trong tháng, số tiền trung bình)
+MONTHLY_BILLS = [("rent_house", 1, 4_500_000), ("electricity_bill", 3, 600_000),
+                 ("water_money", 3, 150_000), ("internet_money", 5, 250_000)]
+# Hệ số theo thứ (thứ 2 .. CN) và theo giờ trong ngày (3 bữa chính + tối)
+WEEKDAY_PROFILE = np.array([0.9, 0.85, 0.9, 0.95, 1.15, 1.45, 1.3])
+HOUR_PROFILE = np.array([0.1, 0.05, 0.02, 0.02, 0.05, 0.3, 0.8, 1.6, 1.4, 0.8, 0.9, 1.7,
+                         1.9, 1.0, 0.7, 0.8, 0.9, 1.2, 1.9, 2.0, 1.6, 1.1, 0.6, 0.3])
+
+
+def _group_categories(group: str) -> List[str]:
+    from app.services.kmeans_service import KMeansService
+
+    fixed = {category for category, _, _ in MONTHLY_BILLS}
+    return [c for c in KMeansService.CATEGORY_GROUPS[group] if isinstance(c, str) and c.isascii() and c not in fixed]
+
+
+def _type_ids(categories: np.ndarray) -> np.ndarray:
+    from app.services.kmeans_service import KMeansService
+
+    key_to_id = {key: type_id for type_id, key in KMeansService.ID_TO_KEY_MAPPING.items()}
+    return pd.Series(categories).map(key_to_id).fillna(14).to_numpy(dtype=np.int64)
+
+
+def generate_realistic_frame(
+    n_transactions: int,
+    n_days: Optional[int] = None,
+    seed: int = 42,
+    duplicate_rate: float = 0.01,
+    outlier_rate: float = 0.005
+) -> pd.DataFrame:
+    """
+    Frame giao dịch (FRAME_COLUMNS, sắp theo thời gian) có seed cố định, sinh theo cột:
+    - chi tiêu hằng ngày: nhóm danh mục theo EXPENSE_GROUP_MIX, nhiều hơn cuối tuần và sau ngày lương,
+      giờ giao dịch theo HOUR_PROFILE, mức chi tăng dần theo thời gian
+    - theo tháng: lương ngày 5, hóa đơn cố định (thuê nhà, điện, nước, internet), thu nhập phụ rải rác
+    - bơm thêm giao dịch trùng (cùng danh mục + số tiền, cách nhau < 5 phút) và outlier (số tiền x20..x50, lúc 1-4h sáng)
+    Số lượng bơm vào ghi trong frame.attrs["injected"].
+    """
+    rng = np.random.default_rng(seed)
+    n_days = n_days or int(min(730, max(30, n_transactions // 10)))
+    start = np.datetime64("2024-01-01T00:00:00")
+    days = np.arange(n_days)
+    calendar = start + days.astype("timedelta64[D]")
+    day_of_month = (calendar - calendar.astype("datetime64[M]")).astype(int) + 1
+    weekday = days % 7  # 2024-01-01 là thứ 2
+
+    # --- Theo tháng: lương, hóa đơn cố định ---
+    fixed_rows = []
+    for category, dom, mean in [("salary", 5, 18_000_000)] + MONTHLY_BILLS:
+        bill_days = days[day_of_month == dom]
+        amounts = np.round(mean * rng.normal(1.0, 0.03 if category != "salary" else 0.08, len(bill_days)), -3)
+        sign = 1 if category == "salary" else -1
+        fixed_rows.append((bill_days, np.full(len(bill_days), category), sign * amounts.astype(np.int64)))
+    fixed_days = np.concatenate([r[0] for r in fixed_rows])
+    n_fixed = min(len(fixed_days), n_transactions // 4)
+    keep_fixed = np.sort(rng.permutation(len(fixed_days))[:n_fixed])
+
+    n_duplicates = int(n_transactions * duplicate_rate) if n_transactions >= 50 else 0
+    n_side_income = int(n_transactions * 0.02)
+    n_regular = n_transactions - n_fixed - n_duplicates - n_side_income
+
+    # --- Chi tiêu hằng ngày ---
+    payday_boost = 1 + 0.4 * np.exp(-((day_of_month - 5) % 31) / 3)
+    day_weight = WEEKDAY_PROFILE[weekday] * payday_boost * (1 + 0.3 * days / n_days)
+    day_weight /= day_weight.sum()
+    regular_days = rng.choice(n_days, size=n_regular, p=day_weight)
+
+    groups = np.array(list(EXPENSE_GROUP_MIX))
+    group_idx = rng.choice(len(groups), size=n_regular, p=list(EXPENSE_GROUP_MIX.values()))
+    categories = np.empty(n_regular, dtype=object)
+    amounts = np.empty(n_regular)
+    for g, group in enumerate(groups):
+        mask = group_idx == g
+        pool = _group_categories(group)
+        weights = rng.dirichlet(np.ones(len(pool)) * 2)
+        categories[mask] = np.array(pool, dtype=object)[rng.choice(len(pool), size=mask.sum(), p=weights)]
+        mu, sigma = GROUP_AMOUNT[group]
+        amounts[mask] = rng.lognormal(mu, sigma, size=mask.sum())
+    amounts *= 1 + 0.2 * regular_days / n_days
+    regular_money = -(np.round(amounts, -3).astype(np.int64) + 1000)
+
+    side_days = rng.integers(0, n_days, size=n_side_income)
+    side_money = np.round(rng.lognormal(13.5, 0.8, size=n_side_income), -3).astype(np.int64) + 1000
+
+    all_days = np.concatenate([regular_days, side_days, fixed_days[keep_fixed]])
+    all_categories = np.concatenate([categories, np.full(n_side_income, "other_income", dtype=object),
+                                     np.concatenate([r[1] for r in fixed_rows]).astype(object)[keep_fixed]])
+    all_money = np.concatenate([regular_money, side_money, np.concatenate([r[2] for r in fixed_rows])[keep_fixed]])
+
+    hours = rng.choice(24, size=len(all_days), p=HOUR_PROFILE / HOUR_PROFILE.sum())
+    seconds = hours * 3600 + rng.integers(0, 3600, size=len(all_days))
+    fixed_mask = np.arange(len(all_days)) >= n_regular + n_side_income
+    seconds[fixed_mask] = 9 * 3600 + rng.integers(0, 3600, size=fixed_mask.sum())
+    date_time = start + all_days.astype("timedelta64[D]") + seconds.astype("timedelta64[s]")
+
+    # --- Outlier: chi tiêu bình thường bị đổi thành số tiền rất lớn lúc nửa đêm ---
+    n_outliers = int(n_regular * outlier_rate)
+    outliers = rng.choice(n_regular, size=n_outliers, replace=False)
+    all_money[outliers] = all_money[outliers] * rng.integers(20, 51, size=n_outliers)
+    date_time[outliers] = (date_time[outliers].astype("datetime64[D]")
+                           + (rng.integers(1, 5, size=n_outliers) * 3600).astype("timedelta64[s]"))
+
+    # --- Giao dịch trùng: lặp lại 1 khoản chi sau 5 giây .. 4 phút ---
+    source = rng.choice(n_regular, size=n_duplicates, replace=n_duplicates > n_regular)
+    dup_time = date_time[source] + rng.integers(5, 240, size=n_duplicates).astype("timedelta64[s]")
+    all_money = np.concatenate([all_money, all_money[source]])
+    all_categories = np.concatenate([all_categories, all_categories[source]])
+    date_time = np.concatenate([date_time, dup_time])
+
+    order = np.argsort(date_time, kind="stable")
+    frame = pd.DataFrame({
+        'id': [f"tx{i}" for i in range(len(order))],
+        'money': all_money[order],
+        'type': _type_ids(all_categories[order]),
+        'type_name': all_categories[order],
+        'date_time': pd.to_datetime(date_time[order])
+    })
+    frame.attrs["injected"] = {"duplicates": n_duplicates, "outliers": n_outliers}
+    return frame
+
+
+def generate_realistic_transactions(n_transactions: int, n_days: Optional[int] = None, seed: int = 42, **kwargs) -> List[SpendingItem]:
+    """Như generate_realistic_frame nhưng trả list SpendingItem (cho API / service nhận object)."""
+    from app.services.raw_transactions import frame_to_items
+
+    return frame_to_items(generate_realistic_frame(n_transactions, n_days, seed, **kwargs))
@@ -3,13 +3,17 @@ os.environ['LOKY_MAX_CPU_COUNT'] = '4'
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager
 import traceback
 
 from app.config import settings
-from app.routers import prediction_router, clustering_router, anomaly_router
+from app.routers import prediction_router, clustering_router, anomaly_router, sync_router, analysis_router
 from app.schemas.response import HealthResponse
+from app.services.metrics import MetricsMiddleware, metrics
+from app.services.result_cache import result_cache
+from app.services.transport import FastJSONResponse, available_formats
+from app.workers import ml_executor
 
 
 @asynccontextmanager
@@ -18,7 +22,16 @@ async def lifespan(app: FastAPI):
     print(f"LSTM Sequence Length: {settings.LSTM_SEQUENCE_LENGTH}")
     print(f"K-Means Clusters: {settings.KMEANS_N_CLUSTERS}")
     print(f"Isolation Forest Contamination: {settings.ISOLATION_FOREST_CONTAMINATION}")
+    print(f"ML Workers: threads={settings.ML_THREAD_WORKERS}, processes={settings.ML_PROCESS_WORKERS}, "
+          f"max pending={settings.ML_MAX_PENDING_JOBS}")
+    print(f"Result Cache: enabled={result_cache.enabled}, ttl={result_cache.ttl_seconds}s, "
+          f"disk={result_cache.disk_path or 'off'}")
+    print(f"Transport (/fast): {available_formats()}")
+    print(f"Forecast engine: {settings.FORECAST_ENGINE}")
+    print(f"TensorFlow: {'preload' if settings.LSTM_PRELOAD_TENSORFLOW else 'lazy (import on first LSTM job)'}")
+    ml_executor.start()
     yield
+    ml_executor.shutdown()
     print("=== Shutting down LuxFinance ML Backend ===")
 
 
@@ -28,6 +41,8 @@ app = FastAPI(
     version=settings.VERSION,
     docs_url="/docs",
     redoc_url="/redoc",
+    # Mọi endpoint mã hóa JSON bằng orjson (nếu đã cài) thay vì json chuẩn
+    default_response_class=FastJSONResponse,
     lifespan=lifespan
 )
 
@@ -38,6 +53,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Thêm sau CORS -> bọc ngoài cùng, đo cả thời gian xử lý CORS
+app.add_middleware(MetricsMiddleware)
 
 
 @app.exception_handler(Exception)
@@ -53,6 +70,8 @@ async def global_exception_handler(request: Request, exc: Exception):
 app.include_router(prediction_router, prefix=settings.API_V1_PREFIX)
 app.include_router(clustering_router, prefix=settings.API_V1_PREFIX)
 app.include_router(anomaly_router, prefix=settings.API_V1_PREFIX)
+app.include_router(sync_router, prefix=settings.API_V1_PREFIX)
+app.include_router(analysis_router, prefix=settings.API_V1_PREFIX)
 
 
 @app.get("/", tags=["Root"])
@@ -85,6 +104,22 @@ async def health_check():
     )
 
 
+@app.get("/metrics", response_class=PlainTextResponse, tags=["Health"])
+async def prometheus_metrics():
+    """Số request + độ trễ theo endpoint, thời gian từng bước trong service, engine dự báo, kích thước đầu vào."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/api/v1/workers/stats", tags=["Info"])
+async def worker_stats():
+    return ml_executor.get_stats()
+
+
+@app.get("/api/v1/cache/stats", tags=["Info"])
+async def result_cache_stats():
+    return result_cache.get_stats()
+
+
 @app.get("/api/v1/info", tags=["Info"])
 async def api_info():
     return {
@@ -104,7 +139,9 @@ async def api_info():
                 "endpoint": "/api/v1/detect/anomaly",
                 "method": "POST"
             }
-        ]
+        ],
+        # Content-Type / Accept / Content-Encoding mà các endpoint /fast chấp nhận trên server này
+        "transport": available_formats()
     }
 
 
@@ -0,0 +1,11 @@
+import os
+import tempfile
+
+# Cấu hình cho test phải có trước khi import app.config: không process pool, không ghi vào data/
+_TMP = tempfile.mkdtemp(prefix="luxfinance-tests-")
+os.environ.setdefault("ML_PROCESS_WORKERS", "0")
+os.environ.setdefault("RESULT_CACHE_ENABLED", "false")
+os.environ.setdefault("LSTM_REGISTRY_ENABLED", "false")
+os.environ.setdefault("LSTM_MODEL_DIR", os.path.join(_TMP, "lstm_models"))
+os.environ.setdefault("TRANSACTION_STORE_PATH", os.path.join(_TMP, "transactions.db"))
+os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "3")
@@ -0,0 +1,217 @@
+"""
+Dữ liệu giả lập và bản tham chiếu dùng chung cho test (benchmarks import lại từ đây, test không phụ thuộc benchmarks).
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.schemas.spending import SpendingItem
+from app.services.kmeans_service import KMeansService, kmeans_service
+
+
+# ==============================================================================
+# LỊCH SỬ GIAO DỊCH GIẢ LẬP
+# ==============================================================================
+EXPENSE_KEYS = ["eating", "move", "shopping", "rent_house", "electricity_bill", "fun_play", "education", "invest"]
+INCOME_KEYS = ["salary", "other_income"]
+
+
+def generate_transactions(n_transactions: int, n_days: int = 120, seed: int = 42) -> List[SpendingItem]:
+    """Sinh lịch sử giao dịch giả lập có seed cố định (chi tiêu hàng ngày + lương định kỳ)."""
+    rng = np.random.default_rng(seed)
+    start = datetime(2024, 1, 1)
+
+    day_offsets = np.sort(rng.integers(0, n_days, size=n_transactions))
+    seconds = rng.integers(6 * 3600, 23 * 3600, size=n_transactions)
+    is_income = rng.random(n_transactions) < 0.08
+    expense_idx = rng.integers(0, len(EXPENSE_KEYS), size=n_transactions)
+    income_idx = rng.integers(0, len(INCOME_KEYS), size=n_transactions)
+    amounts = np.round(rng.lognormal(mean=11.5, sigma=0.9, size=n_transactions), -3).astype(int) + 1000
+
+    items = []
+    for i in range(n_transactions):
+        if is_income[i]:
+            key = INCOME_KEYS[income_idx[i]]
+            money = int(amounts[i] * 10)
+        else:
+            key = EXPENSE_KEYS[expense_idx[i]]
+            money = -int(amounts[i])
+        items.append(SpendingItem(
+            id=f"tx{i}",
+            money=money,
+            type=int(expense_idx[i]),
+            typeName=key,
+            dateTime=start + timedelta(days=int(day_offsets[i]), seconds=int(seconds[i]))
+        ))
+    return items
+
+
+# ==============================================================================
+# K-MEANS: BẢN TRÍCH ĐẶC TRƯNG CŨ LÀM MỐC SO SÁNH
+# ==============================================================================
+class LegacyKMeansService(KMeansService):
+    """Giữ nguyên _extract_features trước khi vector hóa (lặp từng giao dịch + df.apply) làm mốc so sánh."""
+
+    def _resolve_category_name(self, type_id: int, type_name: Optional[str]) -> str:
+        raw_name = str(type_name).strip() if type_name else ""
+
+        if raw_name in self.CATEGORY_TRANSLATIONS:
+            return self.CATEGORY_TRANSLATIONS[raw_name]
+
+        if type_id in self.CATEGORY_TRANSLATIONS:
+            return self.CATEGORY_TRANSLATIONS[type_id]
+
+        if raw_name:
+            return raw_name.replace("_", " ").title()
+
+        return "Danh mục Khác"
+
+    def _extract_features(self, transactions, frame=None):
+        data = []
+        for t in transactions:
+            if t.money >= 0 or t.money == 0: continue
+            if not t.date_time: continue
+
+            display_name = self._resolve_category_name(t.type, t.type_name)
+
+            original_key = t.type_name if t.type_name else self.ID_TO_KEY_MAPPING.get(t.type, "other")
+
+            dt = t.date_time
+            day_of_month = dt.day
+
+            data.append({
+                'id': t.id,
+                'amount': abs(t.money),
+                'type': t.type,
+                'type_name': display_name,
+                'original_key': original_key,
+                'date': dt.date(),
+                'hour': dt.hour,
+                'day_of_month': day_of_month,
+                'weekday': dt.weekday(),
+                'is_start_month': 1 if day_of_month <= 5 else 0,
+                'is_end_month': 1 if day_of_month >= 25 else 0
+            })
+
+        if not data: return pd.DataFrame()
+
+        df = pd.DataFrame(data)
+
+        df['is_weekend'] = df['weekday'].isin([5, 6]).astype(int)
+
+        def check_group(row, group_key):
+            group_list = self.CATEGORY_GROUPS.get(group_key, [])
+            cond1 = row['original_key'] in group_list
+            cond2 = row['type'] in group_list
+            return 1 if (cond1 or cond2) else 0
+
+        df['is_essential'] = df.apply(lambda x: check_group(x, 'essential'), axis=1)
+        df['is_entertainment'] = df.apply(lambda x: check_group(x, 'entertainment'), axis=1)
+        df['is_investment'] = df.apply(lambda x: check_group(x, 'investment'), axis=1)
+
+        df['log_amount'] = np.log1p(df['amount'])
+
+        return df
+
+
+# Offset múi giờ gán ngẫu nhiên cho ca mixed_tz (giờ địa phương mỗi giao dịch giữ nguyên)
+MIXED_OFFSETS = [timezone(timedelta(hours=h)) for h in (7, 0, -5, 9)]
+
+
+def make_transactions(n: int, seed: int = 0, mixed_tz: bool = False):
+    """
+    Lịch sử giả lập, ~30% giao dịch không có typeName để đi nhánh tra theo type id.
+    mixed_tz: 2/3 giao dịch mang offset múi giờ khác nhau, 1/3 không có múi giờ (cùng 1 request).
+    """
+    rng = np.random.default_rng(seed)
+    transactions = generate_transactions(n, n_days=max(30, n // 50), seed=seed)
+    type_ids = rng.integers(0, 16, size=n)
+    blank = rng.random(n) < 0.3
+    offsets = rng.integers(0, len(MIXED_OFFSETS) + 2, size=n)
+    result = []
+    for i, t in enumerate(transactions):
+        update = {"type": int(type_ids[i]), "type_name": "" if blank[i] else t.type_name}
+        if mixed_tz and offsets[i] < len(MIXED_OFFSETS):
+            update["date_time"] = t.date_time.replace(tzinfo=MIXED_OFFSETS[offsets[i]])
+        result.append(t.model_copy(update=update))
+    return result
+
+
+def assert_features_equal(legacy_df: pd.DataFrame, new_df: pd.DataFrame):
+    """Toàn bộ cột đặc trưng (không chỉ cờ nhóm) phải giống bản cũ; kiểu số nguyên có thể khác độ rộng."""
+    assert list(legacy_df.columns) == list(new_df.columns), (list(legacy_df.columns), list(new_df.columns))
+    pd.testing.assert_frame_equal(
+        legacy_df.reset_index(drop=True), new_df.reset_index(drop=True), check_dtype=False
+    )
+
+
+# ==============================================================================
+# STRESS ĐỒNG THỜI: GỌI SONG SONG CÁC SERVICE SINGLETON, SO VỚI CHẠY TUẦN TỰ
+# ==============================================================================
+def _run(job):
+    from app.services.isolation_forest_service import isolation_forest_service
+    from app.services.lstm_service import lstm_service
+
+    kind, user_id, transactions = job
+    if kind == "predict":
+        result = lstm_service.predict_trend(user_id, transactions, 7)
+    elif kind == "cluster":
+        result = kmeans_service.cluster_spending(user_id, transactions)
+    else:
+        result = isolation_forest_service.detect_anomalies(
+            user_id, [t for t in transactions if t.money < 0], 0.1
+        )
+    return result.model_dump(by_alias=True)
+
+
+def order_independent(result: dict) -> dict:
+    """Bỏ clusterId và thứ tự cụm (warm start có thể hoán vị nhãn K-Means); phần còn lại giữ nguyên."""
+    if "clusters" not in result:
+        return result
+    clusters = [{k: v for k, v in c.items() if k != "clusterId"} for c in result["clusters"]]
+    clusters.sort(key=lambda c: (c["clusterName"], c["transactionIds"]))
+    return {**result, "clusters": clusters}
+
+
+def make_jobs(calls: int, n_datasets: int, days: int):
+    # Mỗi dataset có kích thước + phân phối khác nhau để scaler của các request khác nhau rõ rệt
+    datasets = [
+        (f"user{i}", generate_transactions(40 + 25 * i, n_days=days, seed=i))
+        for i in range(n_datasets)
+    ]
+    kinds = ["predict", "cluster", "anomaly"]
+    return [
+        (kinds[i % len(kinds)], *datasets[(i // len(kinds)) % len(datasets)])
+        for i in range(calls)
+    ]
+
+
+def run_stress(jobs, threads: int):
+    """Chạy tuần tự (warm start tắt) rồi song song (warm start bật); trả (job lệch, thời gian tuần tự, song song)."""
+    warm_start = kmeans_service.warm_start
+    start = time.perf_counter()
+    expected = {}
+    kmeans_service.warm_start = False
+    try:
+        for job in jobs:
+            key = (job[0], job[1])
+            if key not in expected:
+                expected[key] = order_independent(_run(job))
+    finally:
+        kmeans_service.warm_start = warm_start
+    serial_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(_run, jobs))
+    parallel_time = time.perf_counter() - start
+
+    mismatches = [
+        job[:2] for job, result in zip(jobs, results)
+        if order_independent(result) != expected[(job[0], job[1])]
+    ]
+    return mismatches, len(expected), serial_time, parallel_time
@@ -0,0 +1,142 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.schemas.spending import SpendingItem
+from app.services.isolation_forest_service import IsolationForestService
+from app.services.raw_transactions import history_fingerprint, row_digest
+
+
+def _item(i: int, money: int, when: datetime, type_name: str = "eating", tx_id: str = None) -> SpendingItem:
+    return SpendingItem(id=tx_id if tx_id is not None else f"h{i}", money=money, type=0, typeName=type_name, dateTime=when)
+
+
+@pytest.fixture
+def service():
+    service = IsolationForestService()
+    start = datetime(2024, 3, 1, 12, 0)
+    history = [_item(i, -(50_000 + (i % 7) * 10_000), start + timedelta(hours=10 * i)) for i in range(40)]
+    assert service.fit_user_model("u1", history)
+    return service
+
+
+def test_rescoring_same_transaction_is_idempotent(service):
+    model = service.model_cache.peek("u1")
+    history_len, stats = len(model.history), list(model.global_stats)
+    tx = _item(0, -65_000, datetime(2024, 3, 20, 12, 0), tx_id="new-1")
+
+    first = service.score_single("u1", tx)
+    second = service.score_single("u1", tx)
+    third = service.score_single("u1", tx)
+
+    assert second["anomaly"] == first["anomaly"]
+    assert third["anomaly"] == first["anomaly"]
+    assert len(model.history) == history_len + 1
+    assert model.new_since_fit == 1
+    assert model.global_stats[0] == stats[0] + 1
+
+
+def test_rescoring_without_id_uses_content_key(service):
+    model = service.model_cache.peek("u1")
+    tx = _item(0, -65_000, datetime(2024, 3, 20, 12, 0), tx_id="")
+
+    first = service.score_single("u1", tx)
+    second = service.score_single("u1", tx.model_copy())
+
+    assert second["anomaly"] == first["anomaly"]
+    assert model.new_since_fit == 1
+
+
+def test_history_transaction_is_not_counted_twice(service):
+    model = service.model_cache.peek("u1")
+    history_len = len(model.history)
+
+    result = service.score_single("u1", model.history[-1])
+
+    assert result["anomaly"] is None or "trùng lặp" not in result["anomaly"].anomaly_reason
+    assert len(model.history) == history_len
+    assert model.new_since_fit == 0
+
+
+def test_distinct_transaction_within_window_is_duplicate(service):
+    when = datetime(2024, 3, 20, 12, 0)
+    service.score_single("u1", _item(0, -65_000, when, tx_id="a"))
+
+    result = service.score_single("u1", _item(0, -65_000, when + timedelta(seconds=30), tx_id="b"))
+
+    assert result["anomaly"] is not None
+    assert result["anomaly"].severity == "high"
+    assert "trùng lặp" in result["anomaly"].anomaly_reason
+
+
+def test_changed_history_fingerprint_invalidates_model():
+    service = IsolationForestService()
+    rows = [{"id": f"h{i}", "money": -(50_000 + (i % 7) * 10_000), "dateTime": f"2024-03-{1 + i // 3:02d}T12:00:00"} for i in range(40)]
+    history = [_item(i, r["money"], datetime.fromisoformat(r["dateTime"])) for i, r in enumerate(rows)]
+    assert service.fit_user_model("u1", history, fingerprint=history_fingerprint(rows))
+
+    raw = {"id": "new-1", "money": -65_000, "dateTime": "2024-03-20T12:00:00"}
+    tx = _item(0, raw["money"], datetime(2024, 3, 20, 12, 0), tx_id=raw["id"])
+    assert service.score_single("u1", tx, history_fingerprint=history_fingerprint(rows), digest=row_digest(raw)) is not None
+
+    # Client gửi lịch sử cũ + giao dịch vừa chấm: vẫn dùng model đã cache
+    tx2 = _item(0, -70_000, datetime(2024, 3, 21, 12, 0), tx_id="new-2")
+    assert service.score_single("u1", tx2, history_fingerprint=history_fingerprint(rows + [raw])) is not None
+
+    # Lịch sử đã sửa: model bị bỏ để router fit lại từ lịch sử mới
+    corrected = [{**rows[0], "money": -1_000_000}] + rows[1:]
+    tx3 = _item(0, -80_000, datetime(2024, 3, 22, 12, 0), tx_id="new-3")
+    assert service.score_single("u1", tx3, history_fingerprint=history_fingerprint(corrected)) is None
+    assert service.model_cache.peek("u1") is None
+    assert service.model_cache.get_stats()["invalidations"] == 1
+
+
+def test_transaction_scored_during_refit_is_kept(service, monkeypatch):
+    old = service.model_cache.peek("u1")
+    fitted = _item(0, -60_000, datetime(2024, 3, 19, 12, 0), tx_id="before-refit")
+    service.score_single("u1", fitted)
+    late = _item(0, -65_000, datetime(2024, 3, 20, 12, 0), tx_id="during-refit")
+    results = []
+
+    build = service._build_user_model
+
+    def build_while_scoring(*args, **kwargs):
+        # Refit đã chụp lịch sử và đang fit (không giữ lock): request check-single chấm trên model cũ
+        refitted = build(*args, **kwargs)
+        results.append(service.score_single("u1", late))
+        return refitted
+
+    monkeypatch.setattr(service, "_build_user_model", build_while_scoring)
+    assert service.refit_user_model("u1")
+
+    model = service.model_cache.peek("u1")
+    assert model is not old and old.retired
+    assert old.history[-1] is late and model.history[-1] is late
+    assert {"before-refit", "during-refit"} <= {t.id for t in model.history}
+    assert model.new_since_fit == 1
+    assert model.global_stats[0] == len(model.history)
+    assert "id:during-refit" in model.seen_keys
+
+    # Gửi lại giao dịch chấm trong lúc refit: kết quả lần đầu, không cộng thống kê lần 2
+    count = model.global_stats[0]
+    again = service.score_single("u1", late)
+    assert again["anomaly"] == results[0]["anomaly"]
+    assert model.global_stats[0] == count
+    assert model.new_since_fit == 1
+
+
+def test_refit_does_not_replace_newer_model(service, monkeypatch):
+    build = service._build_user_model
+    start = datetime(2024, 4, 1, 12, 0)
+    fresh_history = [_item(i, -(80_000 + (i % 5) * 5_000), start + timedelta(hours=8 * i)) for i in range(30)]
+
+    def build_then_refit_from_client(*args, **kwargs):
+        refitted = build(*args, **kwargs)
+        # Trong lúc refit nền, client gửi lịch sử khác -> router fit lại model mới
+        monkeypatch.setattr(service, "_build_user_model", build)
+        service.fit_user_model("u1", fresh_history)
+        return refitted
+
+    monkeypatch.setattr(service, "_build_user_model", build_then_refit_from_client)
+    assert not service.refit_user_model("u1")
+    assert service.model_cache.peek("u1").history == fresh_history
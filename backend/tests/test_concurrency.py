@@ -0,0 +1,14 @@
+from app.services.kmeans_service import kmeans_service
+from tests.helpers import make_jobs, run_stress
+
+
+def test_parallel_calls_match_serial_with_warm_start(monkeypatch):
+    """Singleton service dùng chung giữa các thread, warm-start K-Means bật ở lượt song song."""
+    monkeypatch.setattr(kmeans_service, "warm_start", True)
+    warm_before = kmeans_service.centroid_cache.get_stats()["warmStarts"]
+
+    mismatches, _, _, _ = run_stress(make_jobs(calls=48, n_datasets=4, days=30), threads=8)
+
+    assert mismatches == []
+    # 16 lời gọi phân cụm trên 4 user: ít nhất 12 lời gọi phải đi nhánh warm-start
+    assert kmeans_service.centroid_cache.get_stats()["warmStarts"] - warm_before >= 12
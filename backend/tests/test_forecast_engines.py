@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from app.services.forecast_engines import (
+    ForecastEngine, _ENGINE_FACTORIES, available_engines, create_engine, register_engine
+)
+
+
+def test_builtin_engines_registered():
+    assert {"holt", "lstm", "ridge_ar"} <= set(available_engines())
+    preds, confidence = create_engine("holt").forecast(np.arange(10, dtype=float), 3)
+    assert len(preds) == 3 and 0 <= confidence <= 1
+
+
+def test_engine_without_forecast_rejected_at_registration():
+    class Incomplete(ForecastEngine):
+        name = "incomplete"
+
+    with pytest.raises(TypeError, match="forecast"):
+        register_engine(Incomplete, lambda service: Incomplete())
+    assert "incomplete" not in available_engines()
+
+
+def test_register_custom_engine():
+    class Flat(ForecastEngine):
+        name = "flat_test"
+
+        def forecast(self, values, days, user_id=None, series=None):
+            return [float(values[-1])] * days, 1.0
+
+    register_engine(Flat, lambda service: Flat())
+    try:
+        assert create_engine("flat_test").forecast(np.array([1.0, 2.0]), 2) == ([2.0, 2.0], 1.0)
+    finally:
+        _ENGINE_FACTORIES.pop("flat_test", None)
@@ -0,0 +1,14 @@
+import pytest
+
+from app.services.kmeans_service import KMeansService
+from tests.helpers import LegacyKMeansService, assert_features_equal, make_transactions
+
+
+@pytest.mark.parametrize("mixed_tz", [False, True])
+def test_extract_features_matches_legacy(mixed_tz):
+    transactions = make_transactions(2000, seed=3, mixed_tz=mixed_tz)
+    if mixed_tz:
+        assert len({t.date_time.utcoffset() for t in transactions}) > 2
+
+    assert_features_equal(LegacyKMeansService()._extract_features(transactions),
+                          KMeansService()._extract_features(transactions))
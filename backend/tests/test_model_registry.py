@@ -0,0 +1,97 @@
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+from sklearn.preprocessing import MinMaxScaler
+
+from app.services.model_registry import LSTMModelRegistry, fcntl
+
+SIGNATURE = {"sequence_length": 5, "channels": 1}
+
+
+class FakeModel:
+    """Thay model Keras: trọng số là 1 số ghi ra file."""
+
+    def __init__(self, weight: float = 0.0):
+        self.weight = weight
+
+    def save_weights(self, path: str):
+        assert path.endswith(".weights.h5")
+        with open(path, "w") as f:
+            f.write(str(self.weight))
+
+    def load_weights(self, path: str):
+        with open(path) as f:
+            self.weight = float(f.read())
+
+
+def _values():
+    return np.linspace(1.0, 100.0, 60).reshape(-1, 1)
+
+
+def _put(registry: LSTMModelRegistry, weight: float):
+    scaler = MinMaxScaler().fit(_values())
+    with registry.lock_for("u1", "expense"):
+        registry.put("u1", "expense", FakeModel(weight), scaler, _values(), SIGNATURE)
+
+
+def _get(registry: LSTMModelRegistry):
+    with registry.lock_for("u1", "expense"):
+        return registry.get("u1", "expense", _values(), SIGNATURE, FakeModel)
+
+
+def test_put_publishes_weights_atomically(tmp_path):
+    registry = LSTMModelRegistry(str(tmp_path))
+    _put(registry, 1.0)
+    _put(registry, 2.0)
+
+    user_dir = os.path.join(tmp_path, os.listdir(tmp_path)[0])
+    files = sorted(os.listdir(user_dir))
+    with open(os.path.join(user_dir, "expense.json")) as f:
+        meta = json.load(f)
+    # Chỉ còn trọng số của lần train mới nhất (meta trỏ tới), không còn file tạm
+    assert files == sorted(["expense.json", "expense.lock", f"expense.{meta['model_id']}.weights.h5"])
+
+
+def test_get_reloads_when_another_process_wrote_newer_model(tmp_path):
+    worker_a = LSTMModelRegistry(str(tmp_path))
+    worker_b = LSTMModelRegistry(str(tmp_path))
+
+    _put(worker_a, 1.0)
+    assert _get(worker_a)[0].weight == 1.0
+
+    _put(worker_b, 2.0)
+    model, _ = _get(worker_a)
+    assert model.weight == 2.0
+    assert worker_a.snapshot_counters()["loads"] == 1
+
+
+@pytest.mark.skipif(fcntl is None, reason="flock chỉ có trên POSIX")
+def test_lock_for_excludes_other_registry_instances(tmp_path):
+    holder, contender = LSTMModelRegistry(str(tmp_path)), LSTMModelRegistry(str(tmp_path))
+    acquired = threading.Event()
+
+    def contend():
+        with contender.lock_for("u1", "expense"):
+            acquired.set()
+
+    with holder.lock_for("u1", "expense"):
+        thread = threading.Thread(target=contend)
+        thread.start()
+        time.sleep(0.2)
+        assert not acquired.is_set()
+    thread.join(timeout=2)
+    assert acquired.is_set()
+
+
+def test_lock_for_uses_fixed_number_of_thread_locks(tmp_path):
+    registry = LSTMModelRegistry(str(tmp_path))
+    for i in range(3 * registry.LOCK_STRIPES):
+        with registry.lock_for(f"user{i}", "expense"):
+            pass
+
+    assert len(registry._key_locks) == registry.LOCK_STRIPES
+    assert not any(lock.locked() for lock in registry._key_locks)
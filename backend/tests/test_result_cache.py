@@ -0,0 +1,71 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.schemas.spending import SpendingItem
+from app.services.result_cache import ResultCache, result_cache
+
+
+def _items(n: int = 30):
+    start = datetime(2024, 3, 1, 9, 0)
+    return [
+        SpendingItem(id=f"t{i}", money=-(10_000 + i * 500), type=i % 4, typeName=["eating", "move", "pet", "travel"][i % 4],
+                     dateTime=start + timedelta(hours=7 * i))
+        for i in range(n)
+    ]
+
+
+def test_lookup_disabled_skips_hashing():
+    cache = ResultCache(enabled=False)
+    assert cache.lookup("cluster/behavior", "u1", iter(()), n_clusters=3) == (None, None)
+    cache.put(None, {"a": 1})
+
+
+def test_lookup_roundtrip_with_disk(tmp_path):
+    cache = ResultCache(disk_path=str(tmp_path / "cache.db"))
+    key, cached = cache.lookup("cluster/behavior", "u1", _items(), n_clusters=3)
+    assert cached is None
+    cache.put(key, {"clusters": [1, 2]})
+
+    assert cache.lookup("cluster/behavior", "u1", _items(), n_clusters=3) == (key, {"clusters": [1, 2]})
+    # Process mới (RAM trống) vẫn đọc được từ SQLite
+    assert ResultCache(disk_path=str(tmp_path / "cache.db")).get(key) == {"clusters": [1, 2]}
+
+
+def test_memory_hits_do_not_wait_for_disk_writes(tmp_path):
+    cache = ResultCache(disk_path=str(tmp_path / "cache.db"))
+    cache.put("k", {"v": 1})
+
+    result = {}
+    with cache._disk_lock:
+        # Giả lập một lần ghi SQLite đang chạy: đọc entry trong RAM không bị chặn
+        reader = threading.Thread(target=lambda: result.setdefault("v", cache.get("k")))
+        reader.start()
+        reader.join(timeout=2)
+        assert not reader.is_alive()
+    assert result["v"] == {"v": 1}
+
+
+@pytest.fixture
+def enabled_result_cache():
+    result_cache.enabled = True
+    result_cache.clear()
+    yield result_cache
+    result_cache.clear()
+    result_cache.enabled = False
+
+
+def test_cluster_endpoint_populates_cache_after_response(enabled_result_cache):
+    from main import app
+
+    body = {"userId": "u1", "transactions": [t.model_dump(mode="json", by_alias=True) for t in _items()]}
+    with TestClient(app) as client:
+        first = client.post("/api/v1/cluster/behavior", json=body)
+        second = client.post("/api/v1/cluster/behavior", json=body)
+
+    assert first.status_code == second.status_code == 200
+    assert second.json() == first.json()
+    stats = enabled_result_cache.get_stats()
+    assert (stats["puts"], stats["hits"]) == (1, 1)
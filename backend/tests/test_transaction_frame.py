@@ -0,0 +1,149 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+from pydantic import ValidationError
+
+from app.schemas.spending import SpendingItem
+from app.services.isolation_forest_service import IsolationForestService
+from app.services.kmeans_service import KMeansService
+from app.services.raw_transactions import parse_raw_transactions
+from app.services.transaction_frame import (
+    _ISO_DATETIME, FrameValidationError, _iso_datetime_mask, build_transaction_frame,
+    decode_transaction_columns, decode_transaction_frame
+)
+
+CATEGORIES = ["eating", "move", "shopping", "pet", "travel"]
+
+
+def _mixed_offset_rows(n: int = 60):
+    """Nửa giao dịch theo UTC ("Z"), nửa theo +07:00 - như client đồng bộ từ nhiều thiết bị."""
+    return [
+        {
+            "id": f"t{i}", "money": -(10_000 + i * 1_000), "type": i % 5, "typeName": CATEGORIES[i % 5],
+            "dateTime": f"2024-03-{1 + i % 28:02d}T{8 + i % 12:02d}:00:00" + ("Z" if i % 2 else "+07:00")
+        }
+        for i in range(n)
+    ]
+
+
+def _assert_wall_clock(frame: pd.DataFrame, rows):
+    assert pd.api.types.is_datetime64_dtype(frame['date_time'])
+    assert frame['date_time'].dt.tz is None
+    expected = [datetime.fromisoformat(r["dateTime"].replace("Z", "+00:00")).replace(tzinfo=None) for r in rows]
+    assert frame['date_time'].tolist() == expected
+
+
+@pytest.mark.parametrize("offsets", [("Z", "+07:00"), ("+07:00", "+07:00")])
+def test_build_transaction_frame_normalizes_offsets(offsets):
+    rows = _mixed_offset_rows(4)
+    for i, row in enumerate(rows):
+        row["dateTime"] = row["dateTime"][:19] + offsets[i % 2]
+    frame = build_transaction_frame([SpendingItem.model_validate(r) for r in rows])
+    _assert_wall_clock(frame, rows)
+
+
+def test_decoders_normalize_mixed_offsets():
+    rows = _mixed_offset_rows(10)
+    _assert_wall_clock(decode_transaction_frame(rows), rows)
+    frame, report = parse_raw_transactions(rows)
+    assert report["rejected"] == 0
+    _assert_wall_clock(frame, rows)
+
+
+def test_services_accept_mixed_offsets():
+    items = [SpendingItem.model_validate(r) for r in _mixed_offset_rows()]
+    kmeans = KMeansService()
+    kmeans.warm_start = False
+
+    assert kmeans.cluster_spending("u1", items).clusters
+    assert IsolationForestService().detect_anomalies("u1", items).total_transactions == len(items)
+
+
+def test_cluster_endpoint_mixed_offsets():
+    from main import app
+
+    with TestClient(app) as client:
+        response = client.post("/api/v1/cluster/behavior", json={"userId": "u1", "transactions": _mixed_offset_rows()})
+    assert response.status_code == 200, response.text
+    assert response.json()["clusters"]
+
+
+# ==============================================================================
+# ĐƯỜNG /fast PHẢI CHO CÙNG KẾT QUẢ VỚI SpendingItem TRÊN CÙNG DỮ LIỆU
+# ==============================================================================
+BASE_ROW = {"id": "t0", "money": -50_000, "type": 1, "typeName": "eating", "dateTime": "2024-03-01T10:00:00"}
+
+EDGE_VALUES = [
+    ("money", 10 ** 20), ("money", -10 ** 20), ("money", 2 ** 63), ("money", 10 ** 400), ("money", 2 ** 53 + 1),
+    ("money", 1e20), ("money", 1.5), ("money", True), ("money", "12"), ("money", "1e3"), ("money", "1_000"),
+    ("money", None), ("type", 2 ** 63),
+    ("id", 123), ("id", None), ("typeName", {"x": 1}), ("typeName", 5),
+    ("dateTime", 1_700_000_000), ("dateTime", 1_700_000_000_123), ("dateTime", 1_700_000_000.5),
+    ("dateTime", "1700000000"), ("dateTime", -5), ("dateTime", 10 ** 15), ("dateTime", True),
+    ("dateTime", "20240101"), ("dateTime", "2024-1-1"), ("dateTime", "2024-03-01T10"),
+    ("dateTime", "2024-03-01T10:00:00+07"), ("dateTime", "2024-03-01t10:00:00z"),
+    ("dateTime", "2024-03-01T10:00:00.1234567"), ("dateTime", "2024-02-30"), ("dateTime", None),
+]
+
+
+def _decode_or_errors(decode, payload):
+    try:
+        return decode(payload)
+    except FrameValidationError as e:
+        return [(err["type"], err["loc"]) for err in e.errors]
+
+
+def _pydantic_reference(rows):
+    """Đường thường: SpendingItem từng giao dịch -> build_transaction_frame."""
+    items, errors = [], []
+    for index, row in enumerate(rows):
+        try:
+            items.append(SpendingItem.model_validate(row))
+        except ValidationError as e:
+            errors.extend((err["type"], ["body", "transactions", index, *err["loc"]]) for err in e.errors())
+    return errors or build_transaction_frame(items)
+
+
+def _assert_same(actual, expected):
+    if isinstance(expected, pd.DataFrame):
+        assert isinstance(actual, pd.DataFrame), actual
+        pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+    else:
+        assert actual == expected
+
+
+@pytest.mark.parametrize("field, value", EDGE_VALUES)
+def test_fast_decoders_match_pydantic(field, value):
+    rows = [BASE_ROW, {**BASE_ROW, "id": "t1", field: value}]
+    expected = _pydantic_reference(rows)
+
+    _assert_same(_decode_or_errors(decode_transaction_frame, rows), expected)
+    columns = {key: [row[key] for row in rows] for key in BASE_ROW}
+    _assert_same(_decode_or_errors(decode_transaction_columns, columns), expected)
+
+
+def test_fast_decoder_epoch_and_iso_columns():
+    rows = [{**BASE_ROW, "id": f"t{i}", "dateTime": value}
+            for i, value in enumerate([1_709_287_200, 1_709_287_200_000, "2024-03-01T10:00:00Z"])]
+    frame = decode_transaction_frame(rows)
+    assert frame['date_time'].tolist() == [pd.Timestamp("2024-03-01 10:00:00")] * 3
+    _assert_same(frame, _pydantic_reference(rows))
+
+
+def test_iso_datetime_mask_matches_regex():
+    rng = np.random.default_rng(0)
+    alphabet = list("0123456789-:T Z+.tz,")
+    seeds = ["2024-03-01", "2024-03-01T10:00", "2024-03-01 10:00:00.123456Z", "2024-03-01T10:00:00+07:00",
+             "2024-03-01T10:00-0700", "2024-03-01\x00", "x" * 50, "2024-03-01Ä"]
+    strings = list(seeds)
+    for _ in range(5000):
+        chars = list(seeds[rng.integers(0, 5)])
+        position = int(rng.integers(0, len(chars)))
+        chars[position:position + int(rng.integers(0, 2))] = [str(rng.choice(alphabet))]
+        strings.append("".join(chars))
+
+    expected = [_ISO_DATETIME.fullmatch(s) is not None for s in strings]
+    assert _iso_datetime_mask(np.array(strings, dtype=object)).tolist() == expected
@@ -0,0 +1,33 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from app.schemas.spending import SpendingItem
+from app.workers import MLExecutor
+
+
+def _transactions(n: int = 30):
+    start = datetime(2024, 3, 1, 12, 0)
+    return [
+        SpendingItem(id=f"t{i}", money=-(40_000 + (i % 5) * 15_000), type=0, typeName="eating", dateTime=start + timedelta(days=i))
+        for i in range(n)
+    ]
+
+
+def test_only_lstm_engine_goes_to_process_pool(monkeypatch):
+    executor = MLExecutor(thread_workers=2, process_workers=2)
+    pool = ThreadPoolExecutor(max_workers=1)  # đứng thay process pool, chỉ để đếm job được gửi sang
+    submitted = []
+    monkeypatch.setattr(executor, "_get_process_pool", lambda: submitted.append(1) or pool)
+
+    try:
+        for engine in ("holt", "ridge_ar"):
+            result = asyncio.run(executor.run_predict_trend("u1", _transactions(), 7, engine=engine))
+            assert result.success
+        assert submitted == []
+
+        asyncio.run(executor.run_predict_trend("u1", _transactions(), 7, engine="lstm"))
+        assert submitted == [1]
+    finally:
+        pool.shutdown()
+        executor.shutdown()